@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+"""
+Times the hot paths of heatmapper on seeded random datasets (see `generate_random_dataset`) of
+several sizes: saving and loading (JSON and columnar), building tables with every merge function,
+interpolating, rendering, parsing WiFi scans, and starting the `heatmapper` command. Results are written as JSON and can be compared
+to a baseline from an earlier run to catch regressions.
+
+```sh
+python3 scripts/benchmark.py                                  # 1k, 10k and 100k measurements
+python3 scripts/benchmark.py --sizes 1000 10000000 --output results.json
+python3 scripts/benchmark.py --baseline results.json          # exits with 1 on regressions
+python3 scripts/benchmark.py --only load table                # benchmarks whose name starts with these
+```
+
+Every benchmark runs `--repeat` times; the fastest run is compared, since it is the least
+affected by other load on the machine. Baselines are only meaningful on the same machine.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from benchmark_parsers import CELLS_PER_SCAN, FIXTURES, repeat_cells
+from lib.dataset import Dataset, Instrument, MergeFunction, ValueType, generate_random_dataset
+from lib.instruments.parsers import PARSERS
+from lib.interpolate import interpolate
+from lib.render import RenderJob, render
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25  # slowdown (as a fraction of the baseline) reported as a regression
+SEED = 0
+EMITTER_COUNT = 10
+# interpolation compares every grid cell with every point, so it only runs on the smaller sizes
+INTERPOLATE_MAX_SIZE = 100_000
+INTERPOLATE_RESOLUTION = 2.0  # m, 50 x 50 cells
+MIN_RUN_SECONDS = 0.05
+STARTUP_DATASET_SIZE = 1_000
+HEATMAPPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "heatmapper.py")
+
+RSSI = ValueType("RSSI", "dBm", -30, -90)
+MERGERS = {
+    "max": MergeFunction.max,
+    "min": MergeFunction.min,
+    "accumulate": MergeFunction.accumulate,
+    "average": MergeFunction.average,
+    "count": MergeFunction.count,
+    "median": MergeFunction.median,
+    "percentile_90": MergeFunction.percentile(90),
+    "average_mw": MergeFunction.average_mw,
+    "static": MergeFunction.static(1),
+}
+
+
+def path_loss(distance: np.ndarray) -> np.ndarray:
+    """
+    Free-space-like RSSI in dBm at `distance` meters from an emitter.
+    """
+    return np.round(-30 - 20 * np.log10(np.maximum(distance, 1)), 1)
+
+
+def time_runs(f, repeat: int) -> list:
+    """
+    Returns the seconds per call of `repeat` runs of `f`. After a warm-up call, fast functions
+    are called several times per run, so every run takes at least `MIN_RUN_SECONDS`.
+    """
+    start = time.perf_counter()
+    f()
+    calls = max(1, int(MIN_RUN_SECONDS / max(time.perf_counter() - start, 1e-9)))
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            f()
+        runs.append((time.perf_counter() - start) / calls)
+    return runs
+
+
+def dataset_benchmarks(size: int, directory: str):
+    """
+    Yields the (name, function, number of items processed) of every benchmark on a dataset of
+    `size` measurements.
+    """
+    ds = generate_random_dataset(size, EMITTER_COUNT, (path_loss, RSSI), seed=SEED)
+    instrument = ds.get_instrument("random_data")
+    # `table_*` time building tables; `table_cached` times a cache hit (see `measurements_as_table`)
+    instrument.table_cache_size = 0
+    for format in ("json", "columns"):
+        path = os.path.join(directory, f"benchmark-{size}.{format}")
+        yield f"save_{format}", lambda path=path: ds.save(path), size
+        yield f"load_{format}", lambda path=path: Dataset.load(path), size
+    for name, merger in MERGERS.items():
+        yield f"table_{name}", lambda merger=merger: instrument.measurements_as_table(["e0"], merger), size
+    cached = Instrument("cached", {}, list(instrument.value_types.values()), None)
+    cached.store = instrument.store
+    yield "table_cached", lambda: cached.measurements_as_table(["e0"]), size
+    table = instrument.measurements_as_table(["e0"])
+    if size <= INTERPOLATE_MAX_SIZE:
+        for method in ("idw", "nearest"):
+            yield f"interpolate_{method}", \
+                lambda method=method: interpolate(table, method, "z", INTERPOLATE_RESOLUTION), size
+    for projection in ("z", "3d"):
+        job = RenderJob("benchmark", table, projection, os.path.join(directory, f"benchmark-{projection}.png"))
+        yield f"render_{projection}", lambda job=job: render(job), size
+
+
+def parser_benchmarks():
+    """
+    Yields a benchmark for every recorded scan output in the parser fixtures, repeated to
+    `CELLS_PER_SCAN` cells.
+    """
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        name = os.path.basename(path).removesuffix(".txt")
+        backend = name.split("_")[0]
+        with open(path, encoding="utf-8") as file:
+            output = repeat_cells(backend, file.read(), CELLS_PER_SCAN)
+        parse = PARSERS[backend]
+        yield f"parse_{name}", lambda parse=parse, output=output: parse(output), len(parse(output))
+
+
+def startup_benchmarks(directory: str):
+    """
+    Yields a benchmark for the startup of the `heatmapper` command: printing the help and
+    inspecting a small dataset, each in a new interpreter.
+    """
+    path = os.path.join(directory, "startup.json")
+    generate_random_dataset(STARTUP_DATASET_SIZE, EMITTER_COUNT, (path_loss, RSSI), seed=SEED).save(path)
+    for name, args in (("help", ["--help"]), ("inspect", ["inspect", path])):
+        yield f"startup_{name}", \
+            lambda args=args: subprocess.run([sys.executable, HEATMAPPER, *args], check=True, capture_output=True), 1
+
+
+def run(sizes: list, repeat: int, only: list) -> dict:
+    results = {}
+
+    def record(key: str, f, items: int):
+        if len(only) > 0 and not any(key.startswith(prefix) for prefix in only):
+            return
+        runs = time_runs(f, repeat)
+        results[key] = {
+            "seconds": min(runs),
+            "median_seconds": statistics.median(runs),
+            "items": items,
+            "items_per_second": items / min(runs) if min(runs) > 0 else None,
+        }
+        print(f"{key:<32} {min(runs):10.4f} s {results[key]['items_per_second'] or 0:14.0f} /s",
+              file=sys.stderr)
+
+    for name, f, items in parser_benchmarks():
+        record(name, f, items)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, f, items in startup_benchmarks(directory):
+            record(name, f, items)
+        for size in sizes:
+            for name, f, items in dataset_benchmarks(size, directory):
+                record(f"{name}/{size}", f, items)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+        },
+        "seed": SEED,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Prints the change of every benchmark that is in both `results` and `baseline` and returns
+    the names of those that got slower by more than `tolerance`.
+    """
+    regressions = []
+    print("benchmark,baseline_s,current_s,ratio")
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["seconds"]
+        ratio = result["seconds"] / before if before > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = ",REGRESSION"
+        print(f"{name},{before:.4f},{result['seconds']:.4f},{ratio:.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the hot paths of heatmapper.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="numbers of measurements of the generated datasets")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", nargs="+", default=[], metavar="PREFIX",
+                        help="only run the benchmarks whose names start with one of these")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare to the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown reported as a regression (default: 0.25, i.e., 25%%)")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, args.only)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            file.write(json.dumps(results, indent=2, sort_keys=True))
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            regressions = compare(results, json.loads(file.read()), args.tolerance)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+    elif args.output is None:
+        print(json.dumps(results, indent=2, sort_keys=True))
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+"""
+Measures the memory used per measurement by WiFi-like measurements (10 values out of 200 access
+points each) in the representations heatmapper uses:
+
+- `Measurement` objects (with `Value` and `Coordinates` objects and interned keys), as built by
+  `Measurement.from_dict` and `Dataset.iter_measurements`,
+- a `MeasurementStore` with its ids kept as Python strings,
+- a `MeasurementStore` with binary UUIDs (the default).
+
+```sh
+python3 scripts/benchmark_memory.py          # 100k measurements
+python3 scripts/benchmark_memory.py 1000000
+```
+"""
+import random
+import sys
+import tracemalloc
+import uuid
+from lib.dataset import Measurement
+from lib.store import MeasurementStore
+
+DEFAULT_COUNT = 100_000
+VALUES_PER_MEASUREMENT = 10
+KEY_COUNT = 200
+
+
+def measurement_dicts(count: int):
+    random.seed(0)
+    keys = [f"SSID:network {i % 20};MAC:{i:012x};FREQUENCY:5.18;CHANNEL:36" for i in range(KEY_COUNT)]
+    for _ in range(count):
+        yield {
+            "coordinates": {"x": random.random() * 100, "y": random.random() * 100, "z": 1.5},
+            "id": str(uuid.UUID(int=random.getrandbits(128), version=4)),
+            "note": None,
+            # fresh strings, like those of a JSON parser
+            "values": dict(("".join(k), {"type": "".join("RSSI"), "value": float(random.randint(-90, -20))})
+                           for k in random.sample(keys, VALUES_PER_MEASUREMENT)),
+        }
+
+
+def objects(count: int):
+    return [Measurement.from_dict(d) for d in measurement_dicts(count)]
+
+
+def store(count: int, binary_ids: bool = True):
+    s = MeasurementStore()
+    if not binary_ids:
+        s.ids = []
+    for d in measurement_dicts(count):
+        c = d["coordinates"]
+        s.append(d["id"], c["x"], c["y"], c["z"],
+                 ((k, v["type"], v["value"]) for k, v in d["values"].items()), d["note"])
+    return s
+
+
+def measure(build, count: int) -> float:
+    """
+    Returns the bytes allocated per measurement by the object `build(count)` returns.
+    """
+    tracemalloc.start()
+    result = build(count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size / count
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+    print("representation,bytes_per_measurement,measurements_per_gb")
+    for name, build in [
+        ("measurement_objects", objects),
+        ("store_with_string_ids", lambda count: store(count, binary_ids=False)),
+        ("store_with_binary_ids", store),
+    ]:
+        size = measure(build, count)
+        print(f"{name},{size:.0f},{1e9 / size:.0f}")
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""
+Measures the throughput of the WiFi scan parsers (see `lib/instruments/parsers.py`) on the recorded
+scan outputs in `lib/instruments/fixtures`, repeated into scans of many access points, or on
+archived raw scan outputs.
+
+```sh
+python3 scripts/benchmark_parsers.py                        # recorded outputs, 1000 cells per scan
+python3 scripts/benchmark_parsers.py iw scans/*.txt         # archived `iw` outputs
+```
+"""
+import glob
+import os
+import re
+import sys
+import time
+from lib.instruments.parsers import PARSERS
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "lib", "instruments", "fixtures")
+CELLS_PER_SCAN = 1000
+MIN_SECONDS = 1.0
+# the lines that start a cell, per backend
+CELL_STARTS = {"iwlist": r"^ *Cell \d+ - ", "iw": r"^BSS ", "airport": r"^(?! *SSID BSSID)"}
+
+
+def repeat_cells(backend: str, output: str, cells: int) -> str:
+    """
+    Repeats the cells of a scan output until it holds `cells` cells, giving every copy a
+    different MAC address.
+    """
+    lines = output.splitlines(keepends=True)
+    start = re.compile(CELL_STARTS[backend])
+    first = next(n for n, line in enumerate(lines) if start.match(line) and line.strip() != "")
+    header, body = "".join(lines[:first]), "".join(lines[first:])
+    count = max(1, len([line for line in lines[first:] if start.match(line) and line.strip() != ""]))
+    copies = [re.sub(r"([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}", f"{n >> 8 & 255:02x}:{n & 255:02x}:00:00:00:01", body)
+              for n in range(cells // count + 1)]
+    return header + "".join(copies)
+
+
+def measure(backend: str, outputs: list) -> tuple:
+    parse = PARSERS[backend]
+    runs, access_points, start = 0, 0, time.perf_counter()
+    while time.perf_counter() - start < MIN_SECONDS:
+        for output in outputs:
+            access_points += len(parse(output))
+        runs += 1
+    seconds = time.perf_counter() - start
+    megabytes = runs * sum(len(output.encode("utf-8")) for output in outputs) / 1e6
+    return access_points / seconds, megabytes / seconds
+
+
+if __name__ == "__main__":
+    print("backend,input,access_points_per_s,mb_per_s")
+    if len(sys.argv) > 2:
+        backend, paths = sys.argv[1], sys.argv[2:]
+        outputs = [open(path, encoding="utf-8", errors="replace").read() for path in paths]
+        rate, throughput = measure(backend, outputs)
+        print(f"{backend},{len(paths)} files,{rate:.0f},{throughput:.1f}")
+        sys.exit()
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        backend = os.path.basename(path).split("_")[0].removesuffix(".txt")
+        with open(path, encoding="utf-8") as file:
+            output = repeat_cells(backend, file.read(), CELLS_PER_SCAN)
+        rate, throughput = measure(backend, [output])
+        print(f"{backend},{os.path.basename(path)},{rate:.0f},{throughput:.1f}")
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+"""
+Compares the time it takes to serialize datasets of different sizes with the legacy
+`ObjectEncoder` and with `Dataset.iter_json` (used by `Dataset.save`).
+
+```sh
+python3 scripts/benchmark_serializer.py                   # 10k and 100k measurements
+python3 scripts/benchmark_serializer.py 10000 50000      # custom sizes
+```
+
+The legacy encoder builds the whole document in memory, which takes several GB at 1M measurements.
+Sizes above `MAX_LEGACY_SIZE` therefore only time `Dataset.iter_json`:
+
+```sh
+python3 scripts/benchmark_serializer.py 10000 1000000 --legacy   # time the legacy encoder anyway
+```
+"""
+import sys
+import json
+import random
+import time
+from lib.dataset import Dataset, Instrument, ValueType, ObjectEncoder
+
+DEFAULT_SIZES = [10_000, 100_000]
+MAX_LEGACY_SIZE = 100_000
+VALUES_PER_MEASUREMENT = 10
+KEY_COUNT = 200
+
+RSSI = ValueType("RSSI", "dBm", -20, -90)
+
+
+def make_dataset(measurement_count: int) -> Dataset:
+    random.seed(0)
+    ins = Instrument("WiFi", {}, [RSSI], None)
+    keys = [f"SSID:network {i % 20};MAC:{i:012x}" for i in range(KEY_COUNT)]
+    for i in range(measurement_count):
+        ins.store.append(
+            f"{i:032x}", random.random() * 100, random.random() * 100, 1.5,
+            ((k, "RSSI", float(random.randint(-90, -20)))
+             for k in random.sample(keys, VALUES_PER_MEASUREMENT)),
+            None)
+    ds = Dataset("Serializer Benchmark").add_instrument(ins)
+    ds.modified = ds.created
+    return ds
+
+
+def measure(f) -> float:
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    always_legacy = "--legacy" in sys.argv[1:]
+    sizes = [int(arg) for arg in sys.argv[1:] if arg != "--legacy"] or DEFAULT_SIZES
+    print("measurements,object_encoder_s,iter_json_s,speedup")
+    for size in sizes:
+        ds = make_dataset(size)
+        current = measure(lambda: sum(len(chunk) for chunk in ds.iter_json()))
+        if size > MAX_LEGACY_SIZE and not always_legacy:
+            print(f"{size},,{current:.3f},")
+            continue
+        legacy = measure(lambda: json.dumps(
+            ds, cls=ObjectEncoder, indent=2, sort_keys=True))
+        print(f"{size},{legacy:.3f},{current:.3f},{legacy / current:.1f}")
@@ -0,0 +1,15 @@
+#!/usr/bin/python3
+"""
+Converts a dataset between the JSON and the columnar format, e.g.
+
+```sh
+python3 scripts/convert_dataset.py recording.json recording.columns
+python3 scripts/convert_dataset.py recording.columns recording.json
+```
+"""
+import sys
+from lib.dataset import Dataset
+
+source, destination = sys.argv[1], sys.argv[2]
+Dataset.load(source).save(destination)
+print(f"Converted {source} to {destination}.")
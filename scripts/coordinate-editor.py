@@ -7,11 +7,12 @@ filename = sys.argv[1]
 ds = Dataset.load(filename)
 instrument = ds.get_instrument("WiFi")
 
-for m in instrument.measurements:
-    # m.coordinates.y = 2 * m.coordinates.y
-    # m.coordinates.x = 2 * m.coordinates.x
-    # m.coordinates.z = 1.5
-    pass
+# every transform moves all (or the selected) measurements at once and can be undone
+# instrument.scale((2, 2, 1))
+# instrument.translate(dz=1.5, indices=instrument.select(note="^floor 2"))
+# instrument.rotate(90, "z", origin=(10, 10, 0))
+# instrument.respace_path({0: (0, 0, 0), 12: (0, 24, 0), 20: (16, 24, 0)})
+# instrument.undo_transform()
 
 show_plot_2d(instrument.measurements_as_table(), Axis.Z)
 
@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+"""
+One command for recording, inspecting, exporting and rendering datasets:
+
+```sh
+python3 scripts/heatmapper.py record --interface wlan0 --output floor-1.json
+python3 scripts/heatmapper.py inspect floor-1.json
+python3 scripts/heatmapper.py table floor-1.json --where 'ssid="My Network"' --merge average_mw
+python3 scripts/heatmapper.py csv floor-1.json --filter "MAC:ab:12:34:56:78:cd" --output ap.csv
+python3 scripts/heatmapper.py render floor-1.json report --by MAC --projections z y
+```
+
+Only the standard library is imported at startup. Every subcommand imports what it needs when it
+runs: `inspect` reads the file without numpy (unless only the journal of a recording exists yet,
+which is replayed with `Dataset.load`), `record`, `table` and `csv` need numpy but not
+matplotlib, and only `render` loads matplotlib.
+"""
+import argparse
+import json
+import os
+import sys
+
+DEFAULT_INSTRUMENT = "WiFi"
+DEFAULT_TABLE_ROWS = 20
+# the `MergeFunction`s that can be used as they are, besides "percentile:Q" (0 <= Q <= 100)
+MERGE_FUNCTIONS = ("max", "min", "accumulate", "average", "average_mw", "count", "median")
+
+
+def record(args: argparse.Namespace):
+    from lib.dataset import Coordinates, Dataset
+    from lib.instruments.wifi import NoScanDataException, WifiInstrument
+    from lib.journal import journal_path
+
+    INS = WifiInstrument(args.interface, backend=args.backend)
+    path = args.output or Dataset.make_safe_file_name(args.name) + ".json"
+    if os.path.exists(path) or os.path.exists(journal_path(path)):
+        # continue the recording, including what a crashed session left in the journal
+        DS = Dataset.load(path).replace_instrument(INS)
+    else:
+        DS = Dataset(args.name).add_instrument(INS)
+    # every measurement is appended to a journal right away; on exit the journal is compacted
+    DS.enable_journal(path)
+    DS.enable_save_on_terminate()
+    if args.background:
+        INS.start_background_scanning()
+    print(f"Recording to {path} ({len(INS.measurements)} measurements so far). Press Ctrl+C to save and quit.")
+
+    i = len(INS.measurements)
+    while True:
+        line = input(
+            "Enter \"x y z\" and/or a note and press <enter> to take a measurement (defaults to the next point along x): ")
+        parts = line.split()
+        try:
+            x, y, z = (float(p) for p in parts[:3])
+            coordinates, note = Coordinates(x, y, z), " ".join(parts[3:])
+        except ValueError:
+            coordinates, note = Coordinates(i, 0, 0), line.strip()
+        try:
+            measurement = INS.take_measurement(coordinates, note or None)
+            print(measurement)
+            i += 1
+        except NoScanDataException:
+            print("The scan command did not yield any output.")
+
+
+def __count_json_measurements(path: str) -> dict:
+    """
+    Reads everything but the measurements of a JSON dataset, which are only counted.
+    """
+    from lib.compression import open_text
+    from lib.jsonstream import JsonStream
+
+    with open_text(path) as file:
+        stream = JsonStream(file)
+        d = {}
+        for key in stream.iter_object():
+            if key != "instruments":
+                d[key] = stream.read_value()
+                continue
+            d["instruments"] = {}
+            for name in stream.iter_object():
+                instrument = d["instruments"][name] = {"count": 0}
+                for field in stream.iter_object():
+                    if field != "measurements":
+                        instrument[field] = stream.read_value()
+                        continue
+                    for _ in stream.iter_array():
+                        stream.skip_value()
+                        instrument["count"] += 1
+        return d
+
+
+def __count_journaled_measurements(path: str) -> dict:
+    """
+    Loads a recording that was only journaled so far (see `Dataset.enable_journal`), replaying
+    the journal, and describes it like `__count_json_measurements`.
+    """
+    from lib.dataset import Dataset
+
+    ds = Dataset.load(path)
+    return {
+        "name": ds.name,
+        "description": ds.description,
+        "created": ds.created,
+        "instruments": dict((name, {
+            "count": len(instrument.measurements),
+            "meta": instrument.meta,
+            "value_types": dict((k, v.to_dict()) for k, v in instrument.value_types.items()),
+        }) for name, instrument in ds.instruments.items()),
+    }
+
+
+def inspect(args: argparse.Namespace):
+    from lib.journal import journal_path
+
+    if not os.path.exists(args.dataset) and os.path.exists(journal_path(args.dataset)):
+        # a recording that has not been compacted yet
+        d = __count_journaled_measurements(args.dataset)
+    elif os.path.isdir(args.dataset):
+        # columnar datasets (see `lib.dataset.COLUMNAR_HEADER`) count their measurements in the header
+        with open(os.path.join(args.dataset, "dataset.json"), "r") as file:
+            d = json.loads(file.read())
+    else:
+        d = __count_json_measurements(args.dataset)
+    print(f"{d['name']}: {d.get('description', '')}")
+    print(f"created {d.get('created')}" + (f", modified {d['modified']}" if "modified" in d else ""))
+    for name, instrument in d.get("instruments", {}).items():
+        print(f"\n{name}: {instrument['count']} measurements"
+              + (f", {len(instrument['keys'])} value keys" if "keys" in instrument else ""))
+        for type_name, value_type in instrument.get("value_types", {}).items():
+            print(f"  {type_name} in {value_type['unit']} "
+                  f"(best {value_type['best_possible_value']}, worst {value_type['worst_possible_value']})")
+        for key, value in instrument.get("meta", {}).items():
+            print(f"  {key}: {value}")
+    if os.path.exists(journal_path(args.dataset)):
+        print(f"\nThe journal {journal_path(args.dataset)} holds measurements that are not compacted yet.")
+
+
+def merge_function(text: str) -> str:
+    """
+    Checks the `--merge` argument, which is only turned into a merge function by `__merger` once a
+    subcommand runs.
+    """
+    name, colon, q = text.partition(":")
+    if name in MERGE_FUNCTIONS and not colon:
+        return text
+    if name == "percentile":
+        try:
+            if 0 <= float(q) <= 100:
+                return text
+        except ValueError:
+            pass
+        raise argparse.ArgumentTypeError(f"{text!r} is not a percentile like \"percentile:90\"")
+    raise argparse.ArgumentTypeError(
+        f"unknown merge function {text!r} (choose from {', '.join(MERGE_FUNCTIONS)} or percentile:Q)")
+
+
+def __merger(text: str):
+    from lib.dataset import MergeFunction
+
+    name, _, q = text.partition(":")
+    if name == "percentile":
+        return MergeFunction.percentile(float(q))
+    return getattr(MergeFunction, name)
+
+
+def __table(args: argparse.Namespace):
+    from lib.dataset import Dataset
+
+    instrument = Dataset.load(args.dataset, [args.instrument]).get_instrument(args.instrument)
+    merger = __merger(args.merge)
+    if args.where is not None:
+        return instrument.measurements_as_table_where(args.where, merger)
+    return instrument.measurements_as_table(args.filter or ["."], merger)
+
+
+def table(args: argparse.Namespace):
+    t = __table(args)
+    header = ["id", "x", "y", "z", t.value_type.name]
+    shown = [[str(v) for v in row] for row in t.rows[:args.rows]]
+    widths = [max(len(c) for c in column) for column in zip(header, *shown)]
+    for row in [header, *shown]:
+        print("  ".join(c.ljust(w) for c, w in zip(row, widths)))
+    if len(t.rows) > len(shown):
+        print(f"... {len(t.rows) - len(shown)} more rows ({len(t.rows)} in total)")
+
+
+def csv(args: argparse.Namespace):
+    text = __table(args).csv()
+    if args.output is None:
+        print(text)
+        return
+    with open(args.output, "w") as file:
+        file.write(text + "\n")
+
+
+def render(args: argparse.Namespace):
+    import matplotlib
+    matplotlib.use("Agg")
+    from lib.dataset import Dataset
+    from lib.render import render_tables
+
+    instrument = Dataset.load(args.dataset, [args.instrument]).get_instrument(args.instrument)
+    merger = __merger(args.merge)
+    filters = dict((fe, fe) for fe in args.filter)
+    if len(filters) == 0 and args.by is None:
+        filters["all"] = "."
+    queries = [([fe], merger) for fe in filters.values()]
+    tables = dict((label, table) for label, table in zip(filters, instrument.measurements_as_tables(queries))
+                  if table is not None)
+    if args.by is not None:
+        tables.update(instrument.measurements_as_tables_by(args.by, merger))
+    paths = render_tables(tables, args.directory, projections=args.projections, formats=args.formats,
+                          workers=args.workers, dpi=args.dpi)
+    print(f"Rendered {len(paths)} images of {len(tables)} tables to {args.directory}.")
+
+
+def parser() -> argparse.ArgumentParser:
+    # the choices and defaults below mirror `lib.instruments.parsers.PARSERS` and `lib.render`,
+    # which are not imported here to keep the startup fast
+    root = argparse.ArgumentParser(prog="heatmapper", description="Records, inspects and renders heat map datasets.")
+    commands = root.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("record", help="record WiFi measurements interactively")
+    p.add_argument("--interface", default="wlan0")
+    p.add_argument("--backend", default=None, choices=["iwlist", "iw", "airport"],
+                   help="scan command (default: iwlist on Linux, airport on macOS)")
+    p.add_argument("--name", default="Simple WiFi Recording", help="name of the dataset")
+    p.add_argument("--output", help="path of the dataset (default: derived from the name)")
+    p.add_argument("--background", action="store_true",
+                   help="scan continuously, so measurements use the freshest scan without waiting")
+    p.set_defaults(run=record)
+
+    p = commands.add_parser("inspect", help="show the metadata and measurement counts of a dataset")
+    p.add_argument("dataset")
+    p.set_defaults(run=inspect)
+
+    for name, run, help in (("table", table, "print the merged table of an instrument"),
+                            ("csv", csv, "export the merged table of an instrument as CSV")):
+        p = commands.add_parser(name, help=help)
+        p.add_argument("dataset")
+        p.add_argument("--instrument", default=DEFAULT_INSTRUMENT)
+        selection = p.add_mutually_exclusive_group()
+        selection.add_argument("--filter", action="append", metavar="REGEX",
+                               help="keep the values whose keys match every filter expression (repeatable)")
+        selection.add_argument("--where", metavar="QUERY",
+                               help="keep the values whose key fields match a query like 'ssid=\"My Network\", band=5'")
+        p.add_argument("--merge", default="max", type=merge_function, metavar="FUNCTION",
+                       help=f"merge function: {', '.join(MERGE_FUNCTIONS)} or percentile:Q (default: max)")
+        if name == "table":
+            p.add_argument("--rows", type=int, default=DEFAULT_TABLE_ROWS, help="number of rows to print")
+        else:
+            p.add_argument("-o", "--output", help="write to this file instead of the standard output")
+        p.set_defaults(run=run)
+
+    p = commands.add_parser("render", help="render plots of a dataset to image files")
+    p.add_argument("dataset")
+    p.add_argument("directory", help="directory to write the images to")
+    p.add_argument("--instrument", default=DEFAULT_INSTRUMENT)
+    p.add_argument("--by", metavar="FIELD",
+                   help="render one table per distinct value of this key field, e.g., SSID or MAC (or \"key\" for one per value key)")
+    p.add_argument("--filter", action="append", default=[], metavar="REGEX",
+                   help="render the table of this filter expression (repeatable)")
+    p.add_argument("--merge", default="max", type=merge_function, metavar="FUNCTION",
+                   help=f"merge function: {', '.join(MERGE_FUNCTIONS)} or percentile:Q (default: max)")
+    p.add_argument("--projections", nargs="+", default=["x", "y", "z"], choices=["3d", "x", "y", "z"],
+                   help="3d and/or the flattened axes of 2D plots (default: x y z)")
+    p.add_argument("--format", nargs="+", default=["png"], choices=["png", "svg"], dest="formats")
+    p.add_argument("--dpi", type=int, default=150)
+    p.add_argument("--workers", type=int, default=None,
+                   help="number of worker processes (default: one per CPU core, 0 renders in this process)")
+    p.set_defaults(run=render)
+    return root
+
+
+def main(argv: list = sys.argv[1:]):
+    args = parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
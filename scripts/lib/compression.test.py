@@ -0,0 +1,34 @@
+#!/usr/bin/python3
+import os
+import tempfile
+from lib.compression import compression_of, open_text
+from lib.dataset import Dataset, generate_random_dataset
+
+directory = tempfile.mkdtemp()
+assert compression_of("recording.json.gz") == ".gz"
+assert compression_of("recording.json.xz") == ".xz"
+assert compression_of("recording.json.bz2") == ".bz2"
+assert compression_of("recording.json") is None
+
+for extension in ("", ".gz", ".xz", ".bz2"):
+    path = os.path.join(directory, "text.json" + extension)
+    with open_text(path, "w") as file:
+        file.write("{\"ssid\": \"Café\"}")
+    with open_text(path) as file:
+        assert file.read() == "{\"ssid\": \"Café\"}"
+
+# datasets round trip through every codec and compress well
+ds = generate_random_dataset(500, 3, seed=1)
+plain = ds.save(os.path.join(directory, "random.json"))
+expected = "".join(Dataset.load(plain).iter_json())
+for extension in (".gz", ".xz", ".bz2"):
+    path = ds.save(plain + extension)
+    with open(path, "rb") as file:
+        assert not file.read(1) == b"{"
+    print(extension, os.path.getsize(plain) / os.path.getsize(path))
+    assert os.path.getsize(path) < os.path.getsize(plain) / 3
+    loaded = Dataset.load(path)
+    assert "".join(loaded.iter_json()) == expected
+    assert Dataset.load_meta(path).instruments["random_data"].to_dict(False) \
+        == loaded.instruments["random_data"].to_dict(False)
+    assert sum(len(chunk) for chunk in Dataset.iter_measurements(path, "random_data", 100)) == 500
@@ -12,8 +12,13 @@ Each vector is made up of the following:
 - (optional) id [uuid] of measurement
 """
 
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 import signal
+import os
+import shutil
+import sys
 import random
 import math
 from typing import *
@@ -22,15 +27,31 @@ import json
 import datetime
 import re
 import inspect
+import numpy as np
+from lib.compression import compression_of, open_text
+from lib.journal import Journal, journal_path, replay
+from lib.keyindex import Condition, KeyIndex
+from lib.jsonstream import JsonStream
+from lib import jsonwriter, metrics, transform
+from lib.spatial import SpatialIndex
+from lib.transform import Point, rotation, scaling, translation
+from lib.store import MeasurementStore, count_groups, fold_groups, quantile_groups, reduce_groups, restore_int, save_columns_of_stores, segment_starts
 
 
 class ObjectEncoder(json.JSONEncoder):
+    """
+    Encodes any object through its public attributes. `Dataset.save` no longer uses this encoder;
+    it writes datasets with the explicit `to_dict` methods and `Dataset.iter_json` instead.
+    """
+
     def default(self, obj):
-        if hasattr(obj, "__dict__"):
+        if isinstance(obj, MeasurementList):
+            return list(obj)
+        if hasattr(obj, "__dict__") or hasattr(obj, "__slots__"):
             d = dict(
                 (key, value)
                 for key, value in inspect.getmembers(obj)
-                if not key.startswith("__")
+                if not key.startswith("_")
                 and not inspect.isabstract(value)
                 and not inspect.isbuiltin(value)
                 and not inspect.isfunction(value)
@@ -40,6 +61,7 @@ class ObjectEncoder(json.JSONEncoder):
                 and not inspect.ismethoddescriptor(value)
                 and not inspect.isroutine(value)
                 and not key.startswith("_abc_impl")
+                and not isinstance(value, MeasurementStore)
             )
             return self.default(d)
         return obj
@@ -55,11 +77,36 @@ class ValueType:
     def from_dict(d: dict) -> Self:
         return ValueType(d["name"], d["unit"], d["best_possible_value"], d["worst_possible_value"])
 
+    def to_dict(self) -> dict:
+        return {
+            "best_possible_value": self.best_possible_value,
+            "name": self.name,
+            "unit": self.unit,
+            "worst_possible_value": self.worst_possible_value,
+        }
+
+
+def reconcile_value_types(a: ValueType, b: ValueType) -> ValueType:
+    """
+    Returns a value type that covers the values of both `a` and `b` (e.g., of the same instrument
+    recorded with different settings): the better of the best and the worse of the worst values.
+    """
+    if a.unit != b.unit:
+        raise Exception(f"ERROR: The value type \"{a.name}\" is measured in both {a.unit} and {b.unit}.")
+    higher_is_better = a.best_possible_value >= a.worst_possible_value
+    if higher_is_better != (b.best_possible_value >= b.worst_possible_value) \
+            and a.best_possible_value != a.worst_possible_value and b.best_possible_value != b.worst_possible_value:
+        raise Exception(f"ERROR: The value type \"{a.name}\" is higher-is-better in one dataset and lower-is-better in another.")
+    better, worse = (max, min) if higher_is_better else (min, max)
+    return ValueType(a.name, a.unit,
+                     better(a.best_possible_value, b.best_possible_value),
+                     worse(a.worst_possible_value, b.worst_possible_value))
+
 
 ValueTypes = Dict[str, ValueType]
 
 
-@dataclass
+@dataclass(slots=True)
 class Coordinates:
     x: float
     y: float
@@ -68,25 +115,32 @@ class Coordinates:
     def from_dict(d: dict) -> Self:
         return Coordinates(d["x"], d["y"], d["z"])
 
+    def to_dict(self) -> dict:
+        return {"x": self.x, "y": self.y, "z": self.z}
 
-@dataclass
+
+@dataclass(slots=True)
 class Value:
     type: str
     value: float
 
     def __init__(self, value_type: ValueType | str, value: float):
+        # the same few type names are repeated in every measurement
         self.type = value_type.name if isinstance(
-            value_type, ValueType) else value_type
+            value_type, ValueType) else sys.intern(value_type)
         self.value = value
 
     def from_dict(d: dict) -> Self:
         return Value(d["type"], d["value"])
 
+    def to_dict(self) -> dict:
+        return {"type": self.type, "value": self.value}
+
 
 Values = Dict[str, Value]
 
 
-@dataclass
+@dataclass(slots=True)
 class Measurement:
     id: str
     coordinates: Coordinates
@@ -99,27 +153,205 @@ class Measurement:
     def from_dict(d: dict) -> Self:
         id = d["id"]
         coordinates = Coordinates.from_dict(d["coordinates"])
-        values = dict((k, Value.from_dict(v)) for k, v in d["values"].items())
+        values = dict((sys.intern(k), Value.from_dict(v)) for k, v in d["values"].items())
         note = d["note"]
         return Measurement(id, coordinates, values, note)
 
+    def to_dict(self) -> dict:
+        return {
+            "coordinates": self.coordinates.to_dict(),
+            "id": self.id,
+            "note": self.note,
+            "values": dict((k, v.to_dict()) for k, v in self.values.items()),
+        }
+
+
+class StoredCoordinates(Coordinates):
+    """
+    `Coordinates` that read from and write through to a row of a `MeasurementStore`.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: MeasurementStore, index: int):
+        self._store = store
+        self._index = index
+
+    x = property(lambda self: self._store.get_coordinate(self._index, "x"),
+                 lambda self, value: self._store.set_coordinate(self._index, "x", value))
+    y = property(lambda self: self._store.get_coordinate(self._index, "y"),
+                 lambda self, value: self._store.set_coordinate(self._index, "y", value))
+    z = property(lambda self: self._store.get_coordinate(self._index, "z"),
+                 lambda self, value: self._store.set_coordinate(self._index, "z", value))
+
+    def __eq__(self, other):
+        if not isinstance(other, Coordinates):
+            return NotImplemented
+        return (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+    def __repr__(self):
+        return f"Coordinates(x={self.x!r}, y={self.y!r}, z={self.z!r})"
+
+
+class StoredMeasurement(Measurement):
+    """
+    A `Measurement` built on demand from a row of a `MeasurementStore`.
+
+    The `id`, `note` and `coordinates` write through to the store. `values` is a fresh
+    dictionary on every access, so changes to it are not stored.
+    """
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: MeasurementStore, index: int):
+        self._store = store
+        self._index = index
+
+    id = property(lambda self: self._store.ids[self._index],
+                  lambda self, id: self._store.set_id(self._index, id))
+    note = property(lambda self: self._store.notes[self._index],
+                    lambda self, note: self._store.set_note(self._index, note))
+
+    @property
+    def coordinates(self) -> Coordinates:
+        return StoredCoordinates(self._store, self._index)
+
+    @coordinates.setter
+    def coordinates(self, coordinates: Coordinates):
+        for axis in ("x", "y", "z"):
+            self._store.set_coordinate(
+                self._index, axis, getattr(coordinates, axis))
 
-Measurements = List[Measurement]
+    @property
+    def values(self) -> Values:
+        return dict((key, Value(type_name, value))
+                    for key, type_name, value in self._store.values(self._index))
+
+    def __eq__(self, other):
+        if not isinstance(other, Measurement):
+            return NotImplemented
+        return (self.id, self.coordinates, self.values, self.note) \
+            == (other.id, other.coordinates, other.values, other.note)
+
+    def __repr__(self):
+        return f"Measurement(id={self.id!r}, coordinates={self.coordinates!r}, " \
+            + f"values={self.values!r}, note={self.note!r})"
+
+
+class MeasurementList(Sequence):
+    """
+    List-like access to the measurements in a `MeasurementStore`.
+    """
+
+    def __init__(self, store: MeasurementStore):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index: int | slice) -> Measurement | List[Measurement]:
+        if isinstance(index, slice):
+            return [StoredMeasurement(self.store, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("measurement index out of range")
+        return StoredMeasurement(self.store, index)
+
+    def __iter__(self) -> Iterator[Measurement]:
+        for i in range(len(self)):
+            yield StoredMeasurement(self.store, i)
+
+    def append(self, measurement: Measurement):
+        c = measurement.coordinates
+        self.store.append(
+            measurement.id, c.x, c.y, c.z,
+            ((k, v.type, v.value) for k, v in measurement.values.items()),
+            measurement.note)
+
+    def extend(self, measurements: Iterable[Measurement]):
+        for measurement in measurements:
+            self.append(measurement)
+
+
+Measurements = Sequence[Measurement]
+
+
+GroupedReduction = Callable[[np.ndarray, np.ndarray, int], np.ndarray]
+
+
+class Reducer:
+    """
+    A merge function that declares a vectorized reduction alongside its scalar form.
+
+    Reducers can still be called like any other merge function, i.e. `merger(x, accumulator, all)`,
+    where `all` holds every value being merged. `measurements_as_table` instead calls
+    `reduce(values, groups, group_count)` once for all measurements, where `groups` is the sorted
+    row index of every value. It returns one merged value per row, or NaN for rows without values.
+
+    Plain functions and lambdas with the `(x, accumulator, all)` signature keep working as merge
+    functions, but are applied one value at a time.
+    """
+
+    def __init__(self, scalar: Callable[[float, float | None, list], float], reduce: GroupedReduction, key: Optional[Hashable] = None):
+        """
+        Reducers with the same `key` (e.g., `("percentile", 90)`) are equal, so the tables they
+        merge are found in the table cache of an `Instrument`.
+        """
+        self.scalar = scalar
+        self.reduce = reduce
+        self.key = key
+
+    def __call__(self, x: float, accumulator: float | None, all: list) -> float:
+        return self.scalar(x, accumulator, all)
+
+    def __eq__(self, other):
+        if self.key is None or not isinstance(other, Reducer):
+            return self is other
+        return self.key == other.key
+
+    def __hash__(self):
+        return id(self) if self.key is None else hash(self.key)
+
+    def vectorized(reduce: GroupedReduction):
+        """
+        Decorates a scalar merge function to make it a `Reducer` using the vectorized `reduce`.
+        """
+        return lambda scalar: Reducer(scalar, reduce)
+
+
+def _raw_values(all: list) -> List[float]:
+    return [v.value if isinstance(v, Value) else v for v in all]
+
+
+def _to_mw(dbm: np.ndarray | float) -> np.ndarray | float:
+    return 10 ** (np.asarray(dbm, dtype=np.float64) / 10)
+
+
+def _to_dbm(mw: np.ndarray | float) -> np.ndarray | float:
+    with np.errstate(divide="ignore"):
+        return 10 * np.log10(mw)
+
+
+def _average_groups(values: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    counts = np.bincount(groups, minlength=group_count)
+    return fold_groups(np.add, values / counts[groups], groups, group_count)
 
 
 class MergeFunction:
+    @Reducer.vectorized(lambda values, groups, group_count: reduce_groups(np.maximum, values, groups, group_count))
     def max(x: float, greatest: float | None, _all) -> bool:
         if greatest is None or x > greatest:
             return x
         else:
             return greatest
 
+    @Reducer.vectorized(lambda values, groups, group_count: reduce_groups(np.minimum, values, groups, group_count))
     def min(x: float, least: float | None, _all) -> bool:
         if least is None or x < least:
             return x
         else:
             return least
 
+    @Reducer.vectorized(lambda values, groups, group_count: fold_groups(np.add, values, groups, group_count))
     def accumulate(
             x: float, accumulator: float | None, _all) -> float:
         if accumulator is None:
@@ -127,13 +359,45 @@ class MergeFunction:
         else:
             return x + accumulator
 
+    @Reducer.vectorized(_average_groups)
     def average(x: float, accumulator: float | None, all: [float]):
         if accumulator is None:
             accumulator = 0
         return accumulator + x/len(all)
 
-    def static(val: float) -> Any:
-        return lambda _x, _val, _all: val
+    @Reducer.vectorized(lambda _values, groups, group_count: count_groups(groups, group_count))
+    def count(_x: float, accumulator: float | None, _all) -> float:
+        if accumulator is None:
+            return 1
+        else:
+            return accumulator + 1
+
+    @Reducer.vectorized(lambda values, groups, group_count: quantile_groups(values, groups, group_count, 0.5))
+    def median(_x: float, _accumulator: float | None, all: [float]) -> float:
+        return float(np.median(_raw_values(all)))
+
+    def percentile(q: float) -> Reducer:
+        """
+        Merges values into their `q`-th percentile (0 <= q <= 100).
+        """
+        return Reducer(
+            lambda _x, _val, all: float(np.percentile(_raw_values(all), q)),
+            lambda values, groups, group_count: quantile_groups(values, groups, group_count, q / 100),
+            ("percentile", q))
+
+    @Reducer.vectorized(lambda values, groups, group_count: _to_dbm(_average_groups(_to_mw(values), groups, group_count)))
+    def average_mw(_x: float, _accumulator: float | None, all: [float]) -> float:
+        """
+        Averages logarithmic power levels (e.g., RSSI in dBm) in the linear domain (mW) and converts
+        the result back to dBm.
+        """
+        return float(_to_dbm(np.mean(_to_mw(_raw_values(all)))))
+
+    def static(val: float) -> Reducer:
+        return Reducer(
+            lambda _x, _val, _all: val,
+            lambda _values, groups, group_count: np.where(count_groups(groups, group_count) > 0, val, np.nan),
+            ("static", val))
 
 
 MergedMeasurementTableRow = Tuple[str, float, float, float, float]
@@ -152,7 +416,28 @@ class MergedMeasurementTable:
         ])
 
 
+@dataclass
+class CachedTable:
+    store: MeasurementStore
+    version: int  # of the store when the table was built
+    entry_count: int  # store entries covered by the table
+    patterns: List[re.Pattern]
+    key_mask: np.ndarray  # keys matching every pattern, over the keys covered by the table
+    table: MergedMeasurementTable
+
+
+@dataclass
+class CoordinateSnapshot:
+    store: MeasurementStore
+    indices: np.ndarray | slice  # of the measurements that were moved
+    coordinates: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]  # x, y, z and integer flags before
+
+
 Meta = Dict[str, Any]
+# tables kept per instrument by `Instrument.measurements_as_table`
+TABLE_CACHE_SIZE = 16
+# transforms that `Instrument.undo_transform` can undo
+UNDO_LIMIT = 16
 
 
 @dataclass
@@ -160,7 +445,6 @@ class Instrument():
     name: str
     meta: Meta
     value_types: ValueTypes
-    measurements: Measurements
     do_measure_function: Any
 
     def __init__(self, name: str, meta: Meta, value_types: List[ValueType], do_measure_function: Any):
@@ -168,8 +452,124 @@ class Instrument():
         self.meta = meta
         self.value_types = dict((value_type.name, value_type)
                                 for value_type in value_types)
-        self.measurements = []
+        self.store = MeasurementStore()
         self.do_measure_function = do_measure_function
+        self._journal: Optional[Journal] = None
+        self._spatial_index: Optional[SpatialIndex] = None
+        self._key_index: Optional[KeyIndex] = None
+        self.table_cache_size = TABLE_CACHE_SIZE
+        self._table_cache: OrderedDict[Tuple[Tuple[str, ...], Any], CachedTable] = OrderedDict()
+        self._undo: Deque[CoordinateSnapshot] = deque(maxlen=UNDO_LIMIT)
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """
+        A KD tree based index over the coordinates of the measurements, for nearest neighbour,
+        radius and bounding box queries. It is built on first use and kept up to date as
+        measurements are taken or moved.
+        """
+        if self._spatial_index is None or self._spatial_index.store is not self.store:
+            self._spatial_index = SpatialIndex(self.store)
+        return self._spatial_index
+
+    @property
+    def key_index(self) -> KeyIndex:
+        """
+        An inverted index over the fields of the value keys (e.g., SSID, MAC, band and channel
+        of WiFi access points), for queries that do not scan the keys with regular expressions.
+        """
+        if self._key_index is None or self._key_index.store is not self.store:
+            self._key_index = KeyIndex(self.store)
+        return self._key_index
+
+    @property
+    def measurements(self) -> MeasurementList:
+        """
+        The measurements taken by this instrument. `Measurement` objects are only built on
+        access; the data itself lives in the columnar `store`.
+        """
+        return MeasurementList(self.store)
+
+    @measurements.setter
+    def measurements(self, measurements: Iterable[Measurement]):
+        self.store = MeasurementStore()
+        self._table_cache.clear()
+        self.measurements.extend(measurements)
+
+    def select(
+        self,
+        note: Optional[str] = None,
+        ids: Optional[Iterable[str]] = None,
+        predicate: Optional[Callable[[Optional[str], Optional[str]], bool]] = None
+    ) -> np.ndarray:
+        """
+        Returns the indices of the measurements whose note matches the regular expression `note`,
+        whose id is one of `ids` and/or for which `predicate(id, note)` is true, e.g., to restrict
+        a transform to them.
+        """
+        return self.store.select(note, ids, predicate)
+
+    @metrics.timed("instrument.transform")
+    def transform(self, matrix: np.ndarray, indices: Optional[np.ndarray] = None) -> int:
+        """
+        Applies the affine `matrix` (4 x 4 or 3 x 4, see `lib.transform`) to the coordinates of
+        the measurements at `indices` (all by default) at once. Returns the number of
+        measurements moved.
+        """
+        selection = slice(0, len(self.store)) if indices is None else np.asarray(indices, dtype=np.int64)
+        before = self.store.coordinate_arrays(selection)
+        moved = transform.apply(matrix, *before)
+        self._undo.append(CoordinateSnapshot(self.store, selection, before))
+        self.store.set_coordinate_arrays(selection, *moved)
+        return len(before[0])
+
+    def translate(self, dx: float = 0, dy: float = 0, dz: float = 0, indices: Optional[np.ndarray] = None) -> int:
+        return self.transform(translation(dx, dy, dz), indices)
+
+    def scale(self, factor: float | Point, origin: Point = (0, 0, 0), indices: Optional[np.ndarray] = None) -> int:
+        return self.transform(scaling(factor, origin), indices)
+
+    def rotate(self, degrees: float, axis: str = "z", origin: Point = (0, 0, 0), indices: Optional[np.ndarray] = None) -> int:
+        return self.transform(rotation(degrees, axis, origin), indices)
+
+    @metrics.timed("instrument.respace_path")
+    def respace_path(
+        self,
+        anchors: Dict[int, Coordinates | Point],
+        indices: Optional[np.ndarray] = None,
+        by_distance: bool = True
+    ) -> int:
+        """
+        Treats the measurements at `indices` (all by default) as a path walked in the order they
+        were taken and moves them onto straight lines between `anchors`, which map the indices
+        of some of them to their true coordinates (see `lib.transform.respace_path`). Returns the
+        number of measurements on the path.
+        """
+        path = np.arange(len(self.store)) if indices is None else np.asarray(indices, dtype=np.int64)
+        positions = np.searchsorted(path, list(anchors))
+        if np.any(positions >= len(path)) or np.any(path[np.minimum(positions, len(path) - 1)] != list(anchors)):
+            raise Exception("ERROR: Every anchor must be one of the measurements of the path.")
+        targets = dict((int(position), (c.x, c.y, c.z) if isinstance(c, Coordinates) else c)
+                       for position, c in zip(positions, anchors.values()))
+        before = self.store.coordinate_arrays(path)
+        x, y, z = transform.respace_path(*before[:3], targets, by_distance)
+        unchanged = (x == before[0]) & (y == before[1]) & (z == before[2])
+        self._undo.append(CoordinateSnapshot(self.store, path, before))
+        self.store.set_coordinate_arrays(path, x, y, z, np.where(unchanged, before[3], 0))
+        return len(path)
+
+    def undo_transform(self) -> bool:
+        """
+        Restores the coordinates from before the last transform or re-spacing (up to
+        `UNDO_LIMIT` steps back). Returns `False` if there is nothing to undo.
+        """
+        while len(self._undo) > 0:
+            snapshot = self._undo.pop()
+            # snapshots of a replaced store (see the `measurements` setter) no longer apply
+            if snapshot.store is self.store:
+                self.store.set_coordinate_arrays(snapshot.indices, *snapshot.coordinates)
+                return True
+        return False
 
     def from_dict(d: dict) -> Self:
         i = Instrument(
@@ -180,66 +580,296 @@ class Instrument():
             lambda: print(
                 "You'll need to overwrite the `do_measure_function` to measure new values because the measurement function cannot be stored as JSON.")
         )
-        i.measurements = list((Measurement.from_dict(v))
-                              for v in d["measurements"])
+        for m in d["measurements"]:
+            i.append_measurement_dict(m)
         return i
 
+    def to_dict(self, with_measurements: bool = True) -> dict:
+        """
+        Returns the JSON representation of the instrument. Use `Dataset.iter_json` to write
+        many measurements efficiently.
+        """
+        d = {
+            "meta": self.meta,
+            "name": self.name,
+            "value_types": dict((k, v.to_dict()) for k, v in self.value_types.items()),
+        }
+        if with_measurements:
+            d["measurements"] = [m.to_dict() for m in self.measurements]
+        return d
+
+    def read(stream: JsonStream, with_measurements: bool = True) -> Self:
+        """
+        Reads an instrument from the next object in `stream`, one measurement at a time.
+        """
+        store = MeasurementStore()
+        d = {"measurements": []}
+        for key in stream.iter_object():
+            if key == "measurements" and with_measurements:
+                for _ in stream.iter_array():
+                    Instrument.__append_measurement_dict(
+                        store, stream.read_value())
+            elif key == "measurements":
+                stream.skip_value()
+            else:
+                d[key] = stream.read_value()
+        i = Instrument.from_dict(d)
+        i.store = store
+        return i
+
+    def __append_measurement_dict(store: MeasurementStore, m: dict):
+        c = m["coordinates"]
+        store.append(
+            m["id"], c["x"], c["y"], c["z"],
+            ((k, v["type"], v["value"]) for k, v in m["values"].items()),
+            m["note"])
+
+    def append_measurement_dict(self, m: dict):
+        """
+        Appends a measurement given in its JSON representation.
+        """
+        Instrument.__append_measurement_dict(self.store, m)
+
     def get_value_type(self, name: str) -> ValueType:
         return self.value_types[name]
 
     def take_measurement(self, coordinates: Coordinates, note: str = None, *args) -> Optional[Measurement]:
-        try:
-            measurement = Measurement.new(
-                coordinates, self.do_measure_function(*args), note)
-            self.measurements.append(measurement)
-            return measurement
-        except Exception as e:
-            print(e)
-
-    def __merge_values(self, values_dict: Dict[str, Value], merger) -> float:
-        saved_value: float = None
-        values = [v for _, v in values_dict]
-        for value in values:
-            saved_value = float(merger(value.value, saved_value, values))
-        return saved_value
+        with metrics.span("instrument.take_measurement", self.name):
+            try:
+                with metrics.span("instrument.measure", self.name):
+                    values = self.do_measure_function(*args)
+                return self.append_measurement(Measurement.new(coordinates, values, note))
+            except Exception as e:
+                metrics.count("instrument.failures", 1, self.name)
+                print(e)
+
+    def append_measurement(self, measurement: Measurement) -> Measurement:
+        """
+        Appends a measurement taken elsewhere (e.g., by `lib.sampler.Sampler`) and journals it.
+        """
+        self.measurements.append(measurement)
+        if self._journal is not None:
+            self._journal.append(
+                {"record": "measurement", "instrument": self.name, "measurement": measurement.to_dict()})
+        return self.measurements[-1]
 
+    def __merge_groups(self, merger, values: np.ndarray, is_int: np.ndarray, type_name: str, groups: np.ndarray, group_count: int) -> np.ndarray:
+        """
+        Merges every group of values with the vectorized reduction of a `Reducer`, or by folding
+        them through any other merge function one value at a time.
+        """
+        if isinstance(merger, Reducer):
+            return merger.reduce(values, groups, group_count)
+        merged = np.full(group_count, np.nan)
+        starts = segment_starts(groups)
+        for start, stop in zip(starts.tolist(), [*starts[1:].tolist(), len(values)]):
+            group_values = [Value(type_name, restore_int(v, i)) for v, i in zip(
+                values[start:stop].tolist(), is_int[start:stop].tolist())]
+            saved_value: float = None
+            for value in group_values:
+                saved_value = float(
+                    merger(value.value, saved_value, group_values))
+            merged[groups[start]] = saved_value
+        return merged
+
+    @metrics.timed("instrument.table")
     def measurements_as_table(
         self,
         filter_expressions: [str] = ["."],
         merger=MergeFunction.max
     ) -> MergedMeasurementTable:
+        """
+        Merges the values whose keys match every filter expression into one value per measurement.
+
+        Each filter expression is run once per distinct value key. The values are then merged per
+        measurement with a vectorized reduction (or value by value for custom merge functions).
+
+        The last `table_cache_size` tables are cached by filter expressions and merger. A cached
+        table is extended with the rows of the measurements taken since it was built, and
+        rebuilt once any measurement was changed in place (e.g., moved). Every call returns a
+        new table with its own list of the (immutable) rows, so tables handed out earlier never
+        change.
+        """
+        store = self.store
+        cache_key = (tuple(filter_expressions), merger)
+        cached = self._table_cache.pop(cache_key, None)
+        if self.table_cache_size > 0 and cached is not None \
+                and cached.store is store and cached.version == store.version:
+            self._table_cache[cache_key] = cached
+            self.__extend_cached_table(cached, merger)
+            return _copy_table(cached.table)
+
         pats = [re.compile(fe) for fe in filter_expressions]
-        rows = []
-        none_matched = True
-        value_type_name = None
-
-        def matches(k_v: Tuple[str, str]):
-            for p in pats:
-                if p.search(k_v[0]) is None:
-                    return False
-            return True
-
-        for measurement in self.measurements:
-            matching_values = list(
-                filter(matches, measurement.values.items()))
-            if len(matching_values) >= 1:
-                # infer value data type from first matching value
-                if value_type_name is None:
-                    first_row = matching_values[0]
-                    value_type_name = first_row[1].type
-                commonly_typed_values = list(filter(
-                    (lambda k_v: k_v[1].type == value_type_name), matching_values))
-                none_matched = False
-                c = measurement.coordinates
-                rows.append(
-                    [measurement.id, c.x, c.y, c.z, self.__merge_values(commonly_typed_values, merger)])
-        if none_matched:
+        key_matches = _match_keys(pats, store.keys)
+        table = self.__table_from_key_mask(filter_expressions, key_matches, merger)
+        if self.table_cache_size <= 0:
+            return table
+        self._table_cache[cache_key] = CachedTable(
+            store, store.version, store.entry_count, pats, key_matches, table)
+        while len(self._table_cache) > self.table_cache_size:
+            self._table_cache.popitem(last=False)
+        return _copy_table(table)
+
+    def __extend_cached_table(self, cached: CachedTable, merger):
+        """
+        Appends the rows of the measurements appended to the store since `cached` was updated.
+        """
+        store = self.store
+        if cached.entry_count < store.entry_count:
+            if len(cached.key_mask) < len(store.keys):
+                cached.key_mask = np.concatenate(
+                    [cached.key_mask, _match_keys(cached.patterns, store.keys[len(cached.key_mask):])])
+            matching = cached.entry_count + np.flatnonzero(
+                cached.key_mask[store.entry_key.array[cached.entry_count:]])
+            if len(matching) > 0:
+                cached.table.rows.extend(self.__rows_from_entries(
+                    matching, merger, store.type_ids[cached.table.value_type.name]))
+        cached.entry_count = store.entry_count
+
+    @metrics.timed("instrument.table_where")
+    def measurements_as_table_where(
+        self,
+        query: str | List[Condition] = "",
+        merger=MergeFunction.max,
+        **equal: str
+    ) -> MergedMeasurementTable:
+        """
+        Like `measurements_as_table`, but selects the values by the fields of their keys instead
+        of regular expressions, e.g., `measurements_as_table_where('ssid="My Network", channel>=36')`
+        (see `lib.keyindex`).
+        """
+        key_mask = self.key_index.key_mask(query, **equal)
+        filter_expressions = [query] if isinstance(query, str) and query != "" else [
+            f"{field}{op}{value}" for field, op, value in query]
+        filter_expressions += [f"{field.upper()}={value}" for field, value in equal.items()]
+        return self.__table_from_key_mask(filter_expressions, key_mask, merger)
+
+    @metrics.timed("instrument.tables")
+    def measurements_as_tables(self, queries: Iterable[List[str] | Tuple[List[str], Any]]) -> List[Optional[MergedMeasurementTable]]:
+        """
+        Builds the tables of many queries at once, where every query is a list of filter
+        expressions or a `(filter_expressions, merger)` tuple (see `measurements_as_table`).
+
+        Every distinct filter expression is run once per distinct value key, and the values of
+        every query are looked up by key instead of scanning all values again. Queries that match
+        no values give `None`.
+        """
+        expression_matches = {}
+
+        def matches(expression: str) -> np.ndarray:
+            if expression not in expression_matches:
+                expression_matches[expression] = _match_keys([re.compile(expression)], self.store.keys)
+            return expression_matches[expression]
+
+        tables = []
+        for query in queries:
+            filter_expressions, merger = (query[0], query[1]) if isinstance(query, tuple) \
+                else (query, MergeFunction.max)
+            key_mask = np.ones(len(self.store.keys), dtype=np.bool_)
+            for expression in filter_expressions:
+                key_mask &= matches(expression)
+            matching = self.key_index.entries(np.flatnonzero(key_mask))
+            tables.append(self.__table_from_entries(filter_expressions, matching, merger)
+                          if len(matching) > 0 else None)
+        return tables
+
+    @metrics.timed("instrument.tables_by")
+    def measurements_as_tables_by(self, field: str = "key", merger=MergeFunction.max) -> Dict[str, MergedMeasurementTable]:
+        """
+        Builds one table per distinct value key (for `field="key"`) or per distinct value of a
+        key field (e.g., `"ssid"` or `"mac"`, see `lib.keyindex`), in the order of the values.
+        """
+        index = self.key_index
+        if field.lower() == "key":
+            groups = sorted((key, [key_id]) for key_id, key in enumerate(self.store.keys))
+            label = "KEY"
+        else:
+            label = field.upper()
+            groups = [(value, index.select([(label, "=", value)])) for value in index.values(field)]
+        tables = {}
+        for value, key_ids in groups:
+            matching = index.entries(key_ids)
+            if len(matching) > 0:
+                tables[value] = self.__table_from_entries(
+                    [f"{label}={value}"], matching, merger)
+        return tables
+
+    def __table_from_key_mask(self, filter_expressions: [str], key_mask: np.ndarray, merger) -> MergedMeasurementTable:
+        matching = np.flatnonzero(key_mask[self.store.entry_key.array])
+        if len(matching) == 0:
             raise Exception("ERROR: No values matched your filter expression.")
-        return MergedMeasurementTable(filter_expressions, self.get_value_type(value_type_name), rows)
+        return self.__table_from_entries(filter_expressions, matching, merger)
+
+    def __table_from_entries(self, filter_expressions: [str], matching: np.ndarray, merger) -> MergedMeasurementTable:
+        """
+        Merges the values of the (sorted, non-empty) store entries `matching` into a table.
+        """
+        # infer value data type from first matching value
+        type_id = self.store.entry_type.array[matching[0]]
+        return MergedMeasurementTable(filter_expressions, self.get_value_type(self.store.type_names[type_id]),
+                                      self.__rows_from_entries(matching, merger, type_id))
+
+    def __rows_from_entries(self, matching: np.ndarray, merger, type_id: int) -> List[MergedMeasurementTableRow]:
+        """
+        Merges the values of type `type_id` among the sorted store entries `matching` into one
+        row per measurement.
+        """
+        store = self.store
+        entry_measurement = store.entry_measurement.array
+        entry_type = store.entry_type.array
+        value_type_name = store.type_names[type_id]
+
+        # `matching` is sorted by measurement, so every run of equal measurements becomes one row
+        matching_measurements = entry_measurement[matching]
+        row_starts = segment_starts(matching_measurements)
+        row_measurements = matching_measurements[row_starts]
+        row_of_matching = np.zeros(len(matching), dtype=np.int64)
+        row_of_matching[row_starts[1:]] = 1
+        row_of_matching = np.cumsum(row_of_matching)
+
+        commonly_typed = entry_type[matching] == type_id
+        merged = self.__merge_groups(
+            merger,
+            store.entry_value.array[matching[commonly_typed]],
+            store.entry_is_int.array[matching[commonly_typed]],
+            value_type_name,
+            row_of_matching[commonly_typed],
+            len(row_measurements))
+
+        ids = store.id_list(row_measurements)
+        xs, ys, zs = store.coordinate_lists(row_measurements)
+        merged_values = merged.tolist()
+        for i in np.flatnonzero(np.isnan(merged)).tolist():
+            merged_values[i] = None
+        # rows are tuples, so cached tables can share them with the copies they hand out
+        return list(zip(ids, xs, ys, zs, merged_values))
+
+
+def _copy_table(table: MergedMeasurementTable) -> MergedMeasurementTable:
+    return MergedMeasurementTable(list(table.filter_expressions), table.value_type, list(table.rows))
+
+
+def _match_keys(patterns: List[re.Pattern], keys: Sequence[str]) -> np.ndarray:
+    """
+    Returns a mask of the `keys` that match every pattern.
+    """
+    return np.fromiter(
+        (all(p.search(key) is not None for p in patterns) for key in keys),
+        dtype=np.bool_, count=len(keys))
 
 
 Instruments = Dict[str, Instrument]
 
+# Datasets saved to a path ending in `COLUMNAR_EXTENSION` are stored as a directory holding a
+# JSON header and one raw little-endian file per column (see `MeasurementStore.save_columns`).
+COLUMNAR_EXTENSION = ".columns"
+COLUMNAR_HEADER = "dataset.json"
+COLUMNAR_FORMAT = "heatmapper-columns-v1"
+
+
+def is_columnar_path(path: str) -> bool:
+    return os.path.isdir(path) or path.rstrip("/").endswith(COLUMNAR_EXTENSION)
+
 
 @dataclass
 class Dataset:
@@ -253,44 +883,358 @@ class Dataset:
         self.created = datetime.datetime.now().isoformat()
         self.description = description
         self.instruments = {}
+        self._path: Optional[str] = None
+        self._journal: Optional[Journal] = None
+        self._undo: Deque[List[Instrument]] = deque(maxlen=UNDO_LIMIT)
 
     def enable_save_on_terminate(self):
         def gracefully_die(*args):
-            self.save()
+            if self._journal is not None:
+                self.compact()
+            else:
+                self.save()
             exit(0)
         signal.signal(signal.SIGINT, gracefully_die)
         signal.signal(signal.SIGTERM, gracefully_die)
 
-    def load(path: str) -> Self:
+    @metrics.timed("dataset.load")
+    def load(path: str, instruments: Optional[Iterable[str]] = None) -> Self:
         """
         Reads a `dataset` from a file at a given `path`.
+
+        JSON files are parsed incrementally, one measurement at a time, and decompressed on the
+        fly if their path ends in `.gz`, `.xz` or `.bz2` (see `lib.compression`). Datasets in the
+        columnar format are memory-mapped instead. Pass the names of `instruments` to only load
+        those instruments.
+
+        Measurements that were journaled (see `enable_journal`) but not yet compacted into the
+        file are replayed as well.
+        """
+        journal_only = not os.path.exists(path) and os.path.exists(journal_path(path))
+        if journal_only:
+            ds = Dataset(Dataset.make_safe_file_name(os.path.basename(path)))
+        elif is_columnar_path(path):
+            ds = Dataset.__load_columns(path, instruments, True)
+        else:
+            with open_text(path) as file:
+                ds = Dataset.__read(JsonStream(file), instruments, True)
+        ds._path = path
+        ds.__replay_journal(instruments, journal_only)
+        return ds
+
+    def enable_journal(self, path: Optional[str] = None, fsync: bool = True) -> str:
+        """
+        Appends every measurement taken from now on to a journal next to the dataset file at
+        `path` (defaults to the path the dataset was loaded from or `save` would write to).
+        Call `compact` to fold the journal into the dataset file. Returns the dataset file path.
+
+        Raises if a dataset file or a non-empty journal already exists at `path` and this dataset
+        was not loaded from it, since compacting would replace the measurements recorded there.
+        Load the recording with `load` to continue it instead.
+        """
+        if path is None:
+            path = self._path if self._path is not None else Dataset.make_safe_file_name(
+                self.name) + ".json"
+        loaded_from_path = self._path is not None and os.path.abspath(self._path) == os.path.abspath(path)
+        journal = journal_path(path)
+        if not loaded_from_path and (os.path.exists(path)
+                                     or os.path.exists(journal) and os.path.getsize(journal) > 0):
+            raise Exception(
+                f"ERROR: A recording already exists at {path}. Load it with Dataset.load to continue it.")
+        self._path = path
+        self._journal = Journal(journal_path(path), fsync)
+        self._journal.append({"record": "dataset", "name": self.name,
+                             "created": self.created, "description": self.description})
+        for instrument in self.instruments.values():
+            self.__attach_journal(instrument)
+        return path
+
+    def __attach_journal(self, instrument: Instrument):
+        instrument._journal = self._journal
+        self._journal.append({
+            "record": "instrument",
+            "instrument": instrument.name,
+            "meta": instrument.meta,
+            "value_types": dict((k, v.to_dict()) for k, v in instrument.value_types.items()),
+        })
+
+    def __replay_journal(self, instrument_names: Optional[Iterable[str]], restore_metadata: bool):
+        known_ids: Dict[str, Set[str]] = {}
+        for record in replay(journal_path(self._path)):
+            if record["record"] == "dataset":
+                if restore_metadata:
+                    self.name = record["name"]
+                    self.created = record["created"]
+                    self.description = record["description"]
+                continue
+            name = record["instrument"]
+            if instrument_names is not None and name not in instrument_names:
+                continue
+            if record["record"] == "instrument":
+                if name not in self.instruments:
+                    self.instruments[name] = Instrument.from_dict(
+                        {**record, "name": name, "measurements": []})
+            elif record["record"] == "measurement":
+                instrument = self.instruments[name]
+                if name not in known_ids:
+                    known_ids[name] = set(instrument.store.ids)
+                if record["measurement"]["id"] not in known_ids[name]:
+                    known_ids[name].add(record["measurement"]["id"])
+                    instrument.append_measurement_dict(record["measurement"])
+
+    def compact(self) -> str:
+        """
+        Saves the dataset to its file and empties its journal. Returns the path of the saved file.
+
+        The journal is only emptied once the new file has replaced the old one, so a crash at any
+        point leaves a dataset file and a journal that `load` can replay.
+        """
+        filename = self.save(self._path)
+        if self._journal is not None:
+            self._journal.clear()
+        return filename
+
+    def load_many(
+        paths: Sequence[str],
+        instruments: Optional[Iterable[str]] = None,
+        offsets: Optional[Sequence[Optional[Coordinates]]] = None,
+        workers: Optional[int] = None,
+        name: Optional[str] = None
+    ) -> Self:
+        """
+        Loads the datasets at `paths` (e.g., one per floor and session) and combines them with
+        `merge`, where `offsets[i]` is added to the coordinates of the measurements at `paths[i]`.
+
+        JSON files are parsed in `workers` processes (one per CPU core by default, none for
+        `workers=0`). Columnar datasets are memory-mapped in this process instead.
+        """
+        paths = list(paths)
+        instruments = list(instruments) if instruments is not None else None
+        json_paths = list(dict.fromkeys(p for p in paths if not is_columnar_path(p)))
+        loaded = {}
+        if workers != 0 and len(json_paths) > 1:
+            with ProcessPoolExecutor(workers) as pool:
+                for path, parts in zip(json_paths, pool.map(_load_parts, json_paths, [instruments] * len(json_paths))):
+                    loaded[path] = _dataset_from_parts(*parts)
+        for path in paths:
+            if path not in loaded:
+                loaded[path] = Dataset.load(path, instruments)
+        return Dataset.merge([loaded[path] for path in paths], offsets, name)
+
+    @metrics.timed("dataset.merge")
+    def merge(
+        datasets: Sequence[Self],
+        offsets: Optional[Sequence[Optional[Coordinates]]] = None,
+        name: Optional[str] = None
+    ) -> Self:
+        """
+        Combines `datasets` into a new dataset (named like the first one by default). Instruments
+        with the same name are merged into one:
+
+        - value types with the same name are reconciled with `reconcile_value_types`,
+        - measurements with an id that was already merged are skipped (the first one is kept),
+        - `offsets[i]` (e.g., the height of a floor) is added to the coordinates of all
+          measurements of `datasets[i]`.
+        """
+        datasets = list(datasets)
+        if len(datasets) == 0:
+            raise Exception("ERROR: There are no datasets to merge.")
+        offsets = list(offsets) if offsets is not None else [None] * len(datasets)
+        if len(offsets) != len(datasets):
+            raise Exception(f"ERROR: Got {len(offsets)} offsets for {len(datasets)} datasets.")
+        merged = Dataset(name if name is not None else datasets[0].name, datasets[0].description)
+        merged.created = min(ds.created for ds in datasets)
+        # ids of the merged measurements, by instrument
+        seen: Dict[str, Set[str]] = {}
+        for ds, offset in zip(datasets, offsets):
+            delta = (0, 0, 0) if offset is None else (offset.x, offset.y, offset.z)
+            for instrument_name, instrument in ds.instruments.items():
+                target = merged.instruments.get(instrument_name)
+                if target is None:
+                    target = Instrument(instrument.name, dict(instrument.meta), [], instrument.do_measure_function)
+                    merged.instruments[instrument_name] = target
+                else:
+                    target.meta = {**instrument.meta, **target.meta}
+                for value_type in instrument.value_types.values():
+                    existing = target.value_types.get(value_type.name)
+                    target.value_types[value_type.name] = value_type if existing is None \
+                        else reconcile_value_types(existing, value_type)
+                ids = seen.setdefault(instrument_name, set())
+                keep = []
+                for index, id in enumerate(instrument.store.ids):
+                    if id not in ids:
+                        ids.add(id)
+                        keep.append(index)
+                indices = None if len(keep) == len(instrument.store) else np.array(keep, dtype=np.int64)
+                target.store.extend_store(instrument.store, indices, delta)
+        return merged
+
+    def load_meta(path: str) -> Self:
+        """
+        Reads only the metadata of a `dataset` and its instruments, skipping all measurements.
+        """
+        if is_columnar_path(path):
+            return Dataset.__load_columns(path, None, False)
+        with open_text(path) as file:
+            return Dataset.__read(JsonStream(file), None, False)
+
+    def __read(stream: JsonStream, instrument_names: Optional[Iterable[str]], with_measurements: bool) -> Self:
+        if instrument_names is not None:
+            instrument_names = set(instrument_names)
+        raw_ds = {}
+        for key in stream.iter_object():
+            if key == "instruments":
+                raw_ds[key] = {}
+                for name in stream.iter_object():
+                    if instrument_names is None or name in instrument_names:
+                        raw_ds[key][name] = Instrument.read(
+                            stream, with_measurements)
+                    else:
+                        stream.skip_value()
+            else:
+                raw_ds[key] = stream.read_value()
+        ds = Dataset(raw_ds["name"])
+        if "created" in raw_ds:
+            ds.created = raw_ds["created"]
+        if "description" in raw_ds:
+            ds.description = raw_ds["description"]
+        if "instruments" in raw_ds:
+            ds.instruments = raw_ds["instruments"]
+        return ds
+
+    def iter_measurements(path: str, instrument_name: str, chunk_size: int = 10000) -> Iterator[Measurements]:
         """
-        with open(path, "r") as file:
-            raw_ds = json.loads(file.read())
-            ds = Dataset(raw_ds["name"])
-            if "created" in raw_ds:
-                ds.created = raw_ds["created"]
-            if "description" in raw_ds:
-                ds.description = raw_ds["description"]
-            if "instruments" in raw_ds:
-                ds.instruments = dict((k, Instrument.from_dict(v))
-                                      for k, v in raw_ds["instruments"].items())
-            return ds
+        Reads the measurements of one instrument from the file at `path` and yields them in
+        lists of up to `chunk_size` measurements, without loading the rest of the file.
+        """
+        if is_columnar_path(path):
+            measurements = Dataset.load(path, [instrument_name]).get_instrument(
+                instrument_name).measurements
+            for start in range(0, len(measurements), chunk_size):
+                yield measurements[start:start + chunk_size]
+            return
+        with open_text(path) as file:
+            stream = JsonStream(file)
+            for key in stream.iter_object():
+                if key != "instruments":
+                    stream.skip_value()
+                    continue
+                for name in stream.iter_object():
+                    if name != instrument_name:
+                        stream.skip_value()
+                        continue
+                    for field in stream.iter_object():
+                        if field != "measurements":
+                            stream.skip_value()
+                            continue
+                        chunk = []
+                        for _ in stream.iter_array():
+                            chunk.append(Measurement.from_dict(
+                                stream.read_value()))
+                            if len(chunk) >= chunk_size:
+                                yield chunk
+                                chunk = []
+                        if len(chunk) > 0:
+                            yield chunk
+                        return
 
     def make_safe_file_name(name: str):
         return re.sub("\/| ", "-", str(name)).lower()
 
-    def save(self) -> str:
+    @metrics.timed("dataset.save")
+    def save(self, path: Optional[str] = None, stores: Dict[str, Iterable[MeasurementStore]] = {}) -> str:
         """
-        Saves the dataset as JSON.
+        Saves the dataset as JSON, or in the columnar format if `path` ends with
+        `COLUMNAR_EXTENSION`. JSON is compressed while it is written if `path` ends in `.gz`,
+        `.xz` or `.bz2`. Returns the path of the saved file.
+
+        The measurements of the instruments named in `stores` are taken from the given stores
+        instead of the instruments, one store after another, so they never need to be in memory
+        all at once (e.g., when the stores come from a generator).
         """
         self.modified = datetime.datetime.now().isoformat()
-        filename = Dataset.make_safe_file_name(self.name) + ".json"
-        with open(filename, "w") as file:
-            file.write(json.dumps(self, cls=ObjectEncoder,
-                       indent=2, sort_keys=True))
+        filename = path if path is not None else Dataset.make_safe_file_name(
+            self.name) + ".json"
+        # everything is written to a temporary file (or directory) next to `filename` first, so a
+        # crash while saving never leaves a half-written dataset behind
+        directory, base = os.path.split(os.path.abspath(filename.rstrip("/")))
+        temporary = os.path.join(directory, f".{base}.{uuid.uuid4().hex[:8]}.tmp{compression_of(filename) or ''}")
+        try:
+            if is_columnar_path(filename):
+                os.makedirs(temporary)
+                self.__save_columns(temporary, stores)
+                _sync(os.path.join(temporary, COLUMNAR_HEADER))
+                _replace_directory(temporary, filename)
+            else:
+                with open_text(temporary, "w") as file:
+                    for chunk in self.iter_json(stores):
+                        file.write(chunk)
+                _sync(temporary)
+                os.replace(temporary, filename)
+        except BaseException:
+            if os.path.isdir(temporary):
+                shutil.rmtree(temporary, ignore_errors=True)
+            elif os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        _sync(directory)
         return filename
 
+    def to_dict(self, with_measurements: bool = True) -> dict:
+        d = {
+            "created": self.created,
+            "description": self.description,
+            "instruments": dict((k, v.to_dict(with_measurements)) for k, v in self.instruments.items()),
+            "name": self.name,
+        }
+        if hasattr(self, "modified"):
+            d["modified"] = self.modified
+        return d
+
+    def iter_json(self, stores: Dict[str, Iterable[MeasurementStore]] = {}) -> Iterator[str]:
+        """
+        Yields the dataset as indented JSON with sorted keys, in chunks. Measurements are
+        formatted straight from the columnar stores of the instruments (or from `stores`, see
+        `save`).
+        """
+        d = self.to_dict(with_measurements=False)
+        for name, instrument in self.instruments.items():
+            d["instruments"][name]["measurements"] = jsonwriter.Splice(
+                lambda level, stores=stores.get(name, [instrument.store]):
+                    jsonwriter.iter_measurements_of_stores(stores, level))
+        return jsonwriter.iter_document(d)
+
+    def __save_columns(self, path: str, stores: Dict[str, Iterable[MeasurementStore]]):
+        header = {**self.to_dict(with_measurements=False),
+                  "format": COLUMNAR_FORMAT, "instruments": {}}
+        for i, (name, instrument) in enumerate(self.instruments.items()):
+            directory = f"instrument-{i}"
+            header["instruments"][name] = {
+                **instrument.to_dict(with_measurements=False),
+                "directory": directory,
+                **save_columns_of_stores(os.path.join(path, directory), stores.get(name, [instrument.store])),
+            }
+        # the header is written last, so it never points to incomplete columns
+        with open(os.path.join(path, COLUMNAR_HEADER), "w") as file:
+            file.write(json.dumps(header, indent=2, sort_keys=True))
+
+    def __load_columns(path: str, instrument_names: Optional[Iterable[str]], with_measurements: bool) -> Self:
+        with open(os.path.join(path, COLUMNAR_HEADER), "r") as file:
+            header = json.loads(file.read())
+        if header.get("format") != COLUMNAR_FORMAT:
+            raise Exception(f"Unsupported dataset format: {header.get('format')}")
+        ds = Dataset(header["name"], header["description"])
+        ds.created = header["created"]
+        for name, raw_ins in header["instruments"].items():
+            if instrument_names is not None and name not in instrument_names:
+                continue
+            i = Instrument.from_dict({**raw_ins, "measurements": []})
+            if with_measurements:
+                i.store = MeasurementStore.load_columns(
+                    os.path.join(path, raw_ins["directory"]), raw_ins)
+            ds.instruments[name] = i
+        return ds
+
     def get_instrument(self, name: str):
         return self.instruments[name]
 
@@ -299,8 +1243,115 @@ class Dataset:
             raise Exception(
                 f"Instrument {instrument.name} already exists. Try editing it instead.")
         self.instruments[instrument.name] = instrument
+        if self._journal is not None:
+            self.__attach_journal(instrument)
         return self
 
+    def replace_instrument(self, instrument: Instrument) -> Self:
+        """
+        Replaces the instrument of the same name (or adds `instrument`), keeping the measurements
+        and value types of the replaced one, e.g., to continue a loaded recording with a
+        `WifiInstrument` that can take new measurements.
+        """
+        replaced = self.instruments.pop(instrument.name, None)
+        if replaced is not None:
+            instrument.store = replaced.store
+            for name, value_type in replaced.value_types.items():
+                instrument.value_types.setdefault(name, value_type)
+        return self.add_instrument(instrument)
+
+    def transform(
+        self,
+        matrix: np.ndarray,
+        note: Optional[str] = None,
+        ids: Optional[Iterable[str]] = None,
+        predicate: Optional[Callable[[Optional[str], Optional[str]], bool]] = None
+    ) -> int:
+        """
+        Applies the affine `matrix` to the measurements of every instrument (only those selected
+        by `note`, `ids` and `predicate` if given, see `Instrument.select`). Returns the number of
+        measurements moved.
+        """
+        if ids is not None:
+            ids = set(ids)
+        moved = 0
+        for instrument in self.instruments.values():
+            indices = None if note is None and ids is None and predicate is None \
+                else instrument.select(note, ids, predicate)
+            moved += instrument.transform(matrix, indices)
+        self._undo.append(list(self.instruments.values()))
+        return moved
+
+    def translate(self, dx: float = 0, dy: float = 0, dz: float = 0, **selection) -> int:
+        return self.transform(translation(dx, dy, dz), **selection)
+
+    def scale(self, factor: float | Point, origin: Point = (0, 0, 0), **selection) -> int:
+        return self.transform(scaling(factor, origin), **selection)
+
+    def rotate(self, degrees: float, axis: str = "z", origin: Point = (0, 0, 0), **selection) -> int:
+        return self.transform(rotation(degrees, axis, origin), **selection)
+
+    def undo_transform(self) -> bool:
+        """
+        Undoes the last `transform` of the whole dataset. Returns `False` if there is nothing to
+        undo.
+        """
+        if len(self._undo) == 0:
+            return False
+        for instrument in self._undo.pop():
+            instrument.undo_transform()
+        return True
+
+
+def _sync(path: str):
+    """
+    Flushes a file (or, on POSIX systems, the entries of a directory) to disk.
+    """
+    is_directory = os.path.isdir(path)
+    if is_directory and os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY if is_directory else os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replace_directory(source: str, destination: str):
+    """
+    Moves the directory `source` to `destination`, replacing the directory there. Directories
+    cannot be swapped atomically, so the old one is moved aside first; a crash in between leaves
+    it at `<destination>.old`.
+    """
+    if not os.path.exists(destination):
+        os.replace(source, destination)
+        return
+    old = destination.rstrip("/") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    os.replace(destination, old)
+    os.replace(source, destination)
+    # memory-mapped columns of the old directory stay readable until they are unmapped
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _load_parts(path: str, instrument_names: Optional[List[str]]) -> Tuple[dict, Dict[str, MeasurementStore]]:
+    """
+    Loads a dataset in a worker process of `Dataset.load_many`. Measure functions cannot be
+    pickled, so only the header and the stores are sent back.
+    """
+    ds = Dataset.load(path, instrument_names)
+    return ds.to_dict(with_measurements=False), dict((name, i.store) for name, i in ds.instruments.items())
+
+
+def _dataset_from_parts(d: dict, stores: Dict[str, MeasurementStore]) -> Dataset:
+    ds = Dataset(d["name"], d["description"])
+    ds.created = d["created"]
+    for name, raw_ins in d["instruments"].items():
+        i = Instrument.from_dict({**raw_ins, "measurements": []})
+        i.store = stores[name]
+        ds.instruments[name] = i
+    return ds
+
 
 def __distance(a: Tuple[int, int, int], b: Tuple[int, int, int]) -> float:
     """
@@ -320,58 +1371,142 @@ DEFAULT_MEASUREMENT_COUNT = 500
 DEFAULT_EMITTER_COUNT = 2
 
 
-def generate_random_dataset(
-    measurement_count: int = DEFAULT_MEASUREMENT_COUNT,
-    emitter_count: int = DEFAULT_EMITTER_COUNT,
-    value_function_and_output_type=(lambda d: d, ValueType(
-        "value_function_output", "m", 0, 0.9 * (AREA_DEPTH + AREA_HEIGHT + AREA_WIDTH) / 2))
-) -> Dataset:
-    """
-    Generates a random dataset with `measurement_count` data points and `emitter_count` emitter
-    in a space of size `area_depth * area_width * area_height` and computes the measurement
-    values for each data point based on the distance to the closest emitter and the `value_function`.
-    """
-    # generate random coordinates
-    x_coordinates = list(random.random() *
-                         AREA_DEPTH for _ in range(measurement_count))
-    y_coordinates = list(random.random() *
-                         AREA_WIDTH for _ in range(measurement_count))
-    z_coordinates = list(random.random() *
-                         AREA_HEIGHT for _ in range(measurement_count))
+DEFAULT_VALUE_FUNCTION_AND_OUTPUT_TYPE = (lambda d: d, ValueType(
+    "value_function_output", "m", 0, 0.9 * (AREA_DEPTH + AREA_HEIGHT + AREA_WIDTH) / 2))
+DEFAULT_CHUNK_SIZE = 100000
 
-    random.shuffle(x_coordinates)
-    random.shuffle(y_coordinates)
-    random.shuffle(z_coordinates)
 
-    coordinates = list(zip(x_coordinates, y_coordinates, z_coordinates))
+def random_uuids(rng: np.random.Generator, count: int) -> np.ndarray:
+    """
+    Returns `count` version 4 UUIDs drawn from `rng` (so they are reproducible given a seed) in
+    binary form, as a `count` x 16 uint8 array (see `lib.store.format_uuids`).
+    """
+    raw = rng.bit_generator.random_raw((count, 2)).astype(">u8").view(np.uint8).reshape(count, 16)
+    raw[:, 6] = (raw[:, 6] & 0x0f) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3f) | 0x80  # RFC 4122 variant
+    return raw
 
-    # compute values
-    emitters = [(random.random() * AREA_WIDTH, random.random() * AREA_HEIGHT,
-                 random.random() * AREA_DEPTH) for _ in range(emitter_count)]
 
-    # create dataset
+def _apply_value_function(value_function: Callable[[float], float], distances: np.ndarray) -> np.ndarray:
+    """
+    Applies `value_function` to the whole array of `distances` if it supports arrays (like
+    `lambda d: -40 - 20 * np.log10(d)`) and to every distance on its own otherwise.
+    """
+    try:
+        values = np.asarray(value_function(distances))
+        if values.shape == distances.shape and values.dtype.kind in "iuf":
+            return values
+    except Exception:
+        pass
+    return np.vectorize(value_function)(distances)
+
+
+def _random_chunks(
+    rng: np.random.Generator,
+    ids_rng: np.random.Generator,
+    measurement_count: int,
+    emitters: np.ndarray,
+    value_function: Callable[[float], float],
+    chunk_size: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yields the binary ids, coordinates (n x 3) and values (n x emitters) of up to `chunk_size` random
+    measurements at a time. Every chunk continues the random streams where the last one
+    stopped, so the data only depends on the seed and not on `chunk_size`.
+    """
+    area = np.array([AREA_DEPTH, AREA_WIDTH, AREA_HEIGHT])
+    for start in range(0, measurement_count, chunk_size):
+        count = min(chunk_size, measurement_count - start)
+        coordinates = rng.random((count, 3)) * area
+        distances = np.sqrt(((coordinates[:, None, :] - emitters[None, :, :]) ** 2).sum(axis=2))
+        yield random_uuids(ids_rng, count), coordinates, _apply_value_function(value_function, distances)
+
+
+def __random_dataset(
+    measurement_count: int,
+    emitter_count: int,
+    value_function_and_output_type,
+    seed: Optional[int],
+    chunk_size: int
+) -> Tuple[Dataset, Iterator[MeasurementStore]]:
+    """
+    Returns the (empty) random dataset and a generator of stores holding its measurements.
+    """
+    emitter_seed, coordinate_seed, id_seed = np.random.SeedSequence(seed).spawn(3)
+    emitters = np.random.default_rng(emitter_seed).random((emitter_count, 3)) \
+        * np.array([AREA_WIDTH, AREA_HEIGHT, AREA_DEPTH])
     value_function, value_function_output_type = value_function_and_output_type
+    keys = [f"e{i}" for i in range(emitter_count)]
 
     def do_measure(x, y, z) -> Values:
         values = {}
         for i in range(len(emitters)):
-            values[f"e{i}"] = Value(
+            values[keys[i]] = Value(
                 value_function_output_type, value_function(__distance((x, y, z), emitters[i])))
         return values
 
-    INS = Instrument("random_data", {
+    meta = {
         "area_width": AREA_WIDTH,
         "area_height": AREA_HEIGHT,
         "area_depth": AREA_DEPTH,
         "measurement_count": measurement_count,
         "emitter_count": emitter_count
-    }, [value_function_output_type], do_measure)
+    }
+    if seed is not None:
+        meta["seed"] = seed
+    INS = Instrument("random_data", meta, [value_function_output_type], do_measure)
     DS = Dataset("Random Test Dataset").add_instrument(INS)
 
-    for x, y, z in coordinates:
-        INS.take_measurement(Coordinates(x, y, z), None, x, y, z)
+    def stores() -> Iterator[MeasurementStore]:
+        type_names = [value_function_output_type.name] * emitter_count
+        for ids, coordinates, values in _random_chunks(
+                np.random.default_rng(coordinate_seed), np.random.default_rng(id_seed),
+                measurement_count, emitters, value_function, chunk_size):
+            store = MeasurementStore()
+            store.extend_dense(ids, coordinates[:, 0], coordinates[:, 1], coordinates[:, 2],
+                               keys, type_names, values)
+            yield store
+    return DS, stores()
+
+
+def generate_random_dataset(
+    measurement_count: int = DEFAULT_MEASUREMENT_COUNT,
+    emitter_count: int = DEFAULT_EMITTER_COUNT,
+    value_function_and_output_type=DEFAULT_VALUE_FUNCTION_AND_OUTPUT_TYPE,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dataset:
+    """
+    Generates a random dataset with `measurement_count` data points and `emitter_count` emitter
+    in a space of size `area_depth * area_width * area_height` and computes the measurement
+    values for each data point based on the distance to the emitter and the `value_function`
+    (one value per emitter). The same `seed` always gives the same dataset, regardless of the
+    `chunk_size` the data is generated in.
+    """
+    DS, stores = __random_dataset(
+        measurement_count, emitter_count, value_function_and_output_type, seed, chunk_size)
+    store = DS.get_instrument("random_data").store
+    for chunk in stores:
+        store.extend_store(chunk)
     return DS
 
 
+def write_random_dataset(
+    path: str,
+    measurement_count: int = DEFAULT_MEASUREMENT_COUNT,
+    emitter_count: int = DEFAULT_EMITTER_COUNT,
+    value_function_and_output_type=DEFAULT_VALUE_FUNCTION_AND_OUTPUT_TYPE,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> str:
+    """
+    Like `generate_random_dataset`, but writes the dataset to `path` (JSON or columnar, see
+    `Dataset.save`) chunk by chunk, so datasets larger than memory can be generated.
+    """
+    DS, stores = __random_dataset(
+        measurement_count, emitter_count, value_function_and_output_type, seed, chunk_size)
+    return DS.save(path, {"random_data": stores})
+
+
 if __name__ == "__main__":
     generate_random_dataset().save()
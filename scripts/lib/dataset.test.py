@@ -27,6 +27,9 @@ DS2 = Dataset.load("the-great-testing-dataset.json")
 INS2 = DS2.get_instrument(instrument_name)
 
 print(INS2.measurements_as_table("test", MergeFunction.accumulate).csv())
+print(INS2.measurements_as_table(["test"], MergeFunction.median).csv())
+print(INS2.measurements_as_table(["test"], MergeFunction.percentile(25)).csv())
+print(INS2.measurements_as_table(["test"], MergeFunction.count).csv())
 print(INS2.measurements_as_table("1|2").csv())
 
 INS2.take_measurement(Coordinates(0, 0, 0))
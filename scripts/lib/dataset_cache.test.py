@@ -0,0 +1,29 @@
+#!/usr/bin/python3
+import time
+from lib.dataset import Coordinates, MergeFunction, generate_random_dataset
+
+live = generate_random_dataset(100000, 2, seed=3).get_instrument("random_data")
+live_table = live.measurements_as_table(["e0"], MergeFunction.percentile(50))
+hit = live.measurements_as_table(["e0"], MergeFunction.percentile(50))
+assert hit is not live_table and hit.rows == live_table.rows
+# tables handed out earlier neither grow nor change with the cache
+hit.rows.pop()
+live.take_measurement(Coordinates(1, 2, 3), None, 1, 2, 3)
+assert len(live.measurements_as_table(["e0"], MergeFunction.percentile(50)).rows) == 100001
+assert len(live_table.rows) == 100000 and len(hit.rows) == 99999
+live.measurements[0].coordinates.x = -1
+rebuilt = live.measurements_as_table(["e0"], MergeFunction.percentile(50))
+assert rebuilt is not live_table and rebuilt.rows[0][1] == -1
+live.table_cache_size = 0
+assert live.measurements_as_table(["e0"]).rows == rebuilt.rows
+
+for cache_size in (0, 16):
+    live.table_cache_size = cache_size
+    start = time.perf_counter()
+    for i in range(100):
+        live.take_measurement(Coordinates(i, i, i), None, i, i, i)
+        live.measurements_as_table(["e0"])
+    print(f"100 refreshes with a cache of {cache_size}: {time.perf_counter() - start:.2f} s")
+cached_rows = live.measurements_as_table(["e0"]).rows
+live.table_cache_size = 0
+assert cached_rows == live.measurements_as_table(["e0"]).rows
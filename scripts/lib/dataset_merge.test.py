@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+from lib.dataset import Coordinates, Dataset, ValueType, generate_random_dataset, reconcile_value_types, write_random_dataset
+
+floor_0 = generate_random_dataset(300, 2, seed=1)
+floor_1 = generate_random_dataset(200, 2, seed=2)
+floor_1.get_instrument("random_data").value_types["value_function_output"].worst_possible_value = 1000
+floor_0.save("floor-0.json")
+floor_1.save("floor-1.json")
+write_random_dataset("floor-1.columns", 200, 2, seed=2)
+merged = Dataset.load_many(["floor-0.json", "floor-1.json", "floor-0.json", "floor-1.columns"],
+                           offsets=[None, Coordinates(0, 0, 3), None, None])
+merged_ins = merged.get_instrument("random_data")
+assert len(merged_ins.measurements) == 500  # the second copy of every file is skipped
+assert merged_ins.measurements[300].coordinates.z \
+    == floor_1.get_instrument("random_data").measurements[0].coordinates.z + 3
+assert merged_ins.measurements[0] == floor_0.get_instrument("random_data").measurements[0]
+assert merged_ins.value_types["value_function_output"].worst_possible_value == 1000
+assert Dataset.load_many(["floor-0.json", "floor-1.json"], workers=0).get_instrument(
+    "random_data").measurements[499] == floor_1.get_instrument("random_data").measurements[199]
+try:
+    # value types of the same name in different units cannot be merged
+    reconcile_value_types(ValueType("RSSI", "dBm", -20, -90), ValueType("RSSI", "mW", 1e-2, 1e-9))
+    assert False
+except Exception as e:
+    print(e)
@@ -0,0 +1,26 @@
+#!/usr/bin/python3
+import re
+import time
+from lib.dataset import Dataset, ValueType, generate_random_dataset, write_random_dataset
+
+
+def without_times(json: str) -> str: return re.sub(
+    r'"(created|modified)": "[^"]*"', "", json)
+
+
+random_a = generate_random_dataset(1000, 3, seed=7)
+random_b = generate_random_dataset(1000, 3, seed=7, chunk_size=37)
+assert without_times("".join(random_a.iter_json())) == without_times("".join(random_b.iter_json()))
+assert without_times("".join(random_a.iter_json())) != without_times(
+    "".join(generate_random_dataset(1000, 3, seed=8).iter_json()))
+for path in ("random.json", "random.columns"):
+    write_random_dataset(path, 1000, 3, seed=7, chunk_size=100)
+    assert list(Dataset.load(path).get_instrument("random_data").measurements) \
+        == list(random_a.get_instrument("random_data").measurements)
+rounded = generate_random_dataset(10, 2, (lambda d: round(d), ValueType("distance", "m", 0, 100)), seed=1)
+assert all(isinstance(v.value, int) for m in rounded.get_instrument("random_data").measurements
+           for v in m.values.values())
+
+start = time.perf_counter()
+generate_random_dataset(1000000, 2, seed=1)
+print(f"generated 1000000 measurements in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+import random
+from lib.dataset import Coordinates, Instrument, Measurement, MergeFunction, Value, ValueType
+
+
+def reference_table(instrument: Instrument, filter_expression: str, merger) -> list:
+    """
+    The scalar `measurements_as_table` the vectorized reductions replaced: every measurement's
+    matching values of the first matching type are folded through `merger` one at a time.
+    """
+    rows, value_type_name = [], None
+    for measurement in instrument.measurements:
+        matching = [v for k, v in measurement.values.items() if filter_expression in k]
+        if len(matching) == 0:
+            continue
+        if value_type_name is None:
+            value_type_name = matching[0].type
+        values = [v for v in matching if v.type == value_type_name]
+        saved_value = None
+        for value in values:
+            saved_value = float(merger(value.value, saved_value, values))
+        c = measurement.coordinates
+        rows.append((measurement.id, c.x, c.y, c.z, saved_value))
+    return rows
+
+
+rng = random.Random(0)
+ins = Instrument("Reducers", {}, [ValueType("RSSI", "dBm", -30, -90), ValueType("noise", "dBm", -100, -50)], None)
+for i in range(2000):
+    values = {}
+    for ap in rng.sample(range(40), rng.randint(0, 12)):
+        value = rng.randint(-95, -30) if rng.random() < 0.5 else rng.uniform(-95, -30)
+        values[f"AP {ap}"] = Value("noise" if ap % 7 == 0 else "RSSI", value)
+    ins.append_measurement(Measurement(
+        f"{i:08d}-0000-0000-0000-000000000000", Coordinates(i, rng.random(), 0), values, None))
+
+mergers = {
+    "max": MergeFunction.max,
+    "min": MergeFunction.min,
+    "accumulate": MergeFunction.accumulate,
+    "average": MergeFunction.average,
+    "count": MergeFunction.count,
+    "median": MergeFunction.median,
+    "average_mw": MergeFunction.average_mw,
+    "percentile 0": MergeFunction.percentile(0),
+    "percentile 37.5": MergeFunction.percentile(37.5),
+    "percentile 90": MergeFunction.percentile(90),
+    "percentile 100": MergeFunction.percentile(100),
+    "static": MergeFunction.static(3),
+    "custom": lambda x, accumulator, all: x * 2 if accumulator is None else accumulator - x / len(all),
+}
+# sums and averages are folded in the same order, so only these differ in the last bits
+approximate = {"average_mw", "percentile 37.5", "percentile 90"}
+ins.table_cache_size = 0
+for filter_expression in ["AP", "AP 1", "AP 7"]:
+    for name, merger in mergers.items():
+        rows = ins.measurements_as_table([filter_expression], merger).rows
+        expected = reference_table(ins, filter_expression, merger)
+        assert [row[:4] for row in rows] == [row[:4] for row in expected], (filter_expression, name)
+        for row, expected_row in zip(rows, expected):
+            assert row[4] == expected_row[4] or name in approximate \
+                and abs(row[4] - expected_row[4]) <= 1e-9 * abs(expected_row[4]), \
+                (filter_expression, name, row, expected_row)
@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+"""
+# WiFi Scan Parsers
+
+Turn the text output of a scan command into `{access point identifier: RSSI in dBm}`. Every
+parser reads its input in a single pass with precompiled patterns and parses cell by cell, so a
+cell with a missing field (e.g., a hidden SSID) never shifts the fields of the cells after it.
+
+| name       | command                                        |
+| ---------- | ---------------------------------------------- |
+| `"iwlist"` | `iwlist <interface> scanning` (Linux)          |
+| `"iw"`     | `iw dev <interface> scan` or `... scan dump` (Linux) |
+| `"airport"`| `airport -s` (macOS)                           |
+
+Access point identifiers look like `SSID:<ssid>;MAC:<mac>;FREQUENCY:<GHz>;CHANNEL:<channel>)`
+(`iwlist` and `iw` give the same identifier for the same access point). The closing parenthesis
+after the channel is left over from the first `iwlist` parser, which cut the channel out of
+`Frequency:2.412 GHz (Channel 1)`. It is kept, so new recordings use the same value keys as old
+ones in filter expressions, `Dataset.merge` and the table cache. Cells without a channel end in
+`CHANNEL:`.
+"""
+
+from typing import *
+import re
+
+
+ScanParser = Callable[[str], Dict[str, float]]
+
+IWLIST_FIELDS = re.compile(
+    r"Address: ([0-9A-Fa-f:]{17})"
+    r"|Frequency:(\d+(?:\.\d+)?) GHz(?: \(Channel (\d+)\))?"
+    r"|Signal level=(-?\d+(?:\.\d+)?) dBm"
+    r"|ESSID:\"(.*)\"[ \t]*$",
+    re.MULTILINE)
+
+
+def access_point_identifier(ssid: str, mac: str, frequency: str, channel: str) -> str:
+    return f"SSID:{ssid};MAC:{mac};FREQUENCY:{frequency};CHANNEL:{channel}" + (")" if channel != "" else "")
+
+
+def parse_iwlist(output: str) -> Dict[str, float]:
+    """
+    Parses the output of `iwlist <interface> scanning`:
+
+    ```sh
+              Cell 01 - Address: AB:12:34:56:78:CD
+                        Channel:1
+                        Frequency:2.412 GHz (Channel 1)
+                        Quality=52/70  Signal level=-58 dBm
+                        Encryption key:on
+                        ESSID:"My Network 123"
+    ```
+
+    Cells without a signal level in dBm are skipped.
+    """
+    access_points = {}
+    cell = None
+
+    def finish(cell):
+        if cell is not None and cell[3] is not None:
+            mac, frequency, channel, rssi, ssid = cell
+            access_points[access_point_identifier(ssid, mac, frequency, channel)] = rssi
+
+    for match in IWLIST_FIELDS.finditer(output):
+        address, frequency, channel, rssi, ssid = match.groups()
+        if address is not None:
+            finish(cell)
+            cell = [address, "", "", None, ""]
+        elif cell is None:
+            continue
+        elif frequency is not None:
+            cell[1] = frequency
+            cell[2] = channel or ""
+        elif rssi is not None:
+            cell[3] = float(rssi)
+        else:
+            cell[4] = ssid
+    finish(cell)
+    return access_points
+
+
+IW_FIELDS = re.compile(
+    r"^BSS ([0-9A-Fa-f:]{17})"
+    r"|^\tfreq: (\d+(?:\.\d+)?)"
+    r"|^\tsignal: (-?\d+(?:\.\d+)?) dBm"
+    r"|^\tSSID: ?(.*)$"
+    r"|^\tDS Parameter set: channel (\d+)"
+    r"|^\t\t \* primary channel: (\d+)",
+    re.MULTILINE)
+IW_ESCAPE = re.compile(r"(?:\\x[0-9a-fA-F]{2})+")
+
+
+def __unescape_iw(ssid: str) -> str:
+    """
+    `iw` prints the bytes of an SSID that are not printable ASCII as `\\xNN`.
+    """
+    return IW_ESCAPE.sub(lambda m: bytes.fromhex(m.group().replace("\\x", "")).decode("utf-8", "replace"), ssid)
+
+
+def channel_of_frequency(mhz: float) -> int:
+    if mhz == 2484:
+        return 14
+    if mhz < 2484:
+        return int((mhz - 2407) // 5)
+    if mhz < 5950:
+        return int((mhz - 5000) // 5)
+    return int((mhz - 5950) // 5)
+
+
+def parse_iw(output: str) -> Dict[str, float]:
+    """
+    Parses the output of `iw dev <interface> scan` (or `scan dump`):
+
+    ```sh
+    BSS ab:12:34:56:78:cd(on wlan0) -- associated
+            freq: 2412
+            signal: -58.00 dBm
+            SSID: My Network 123
+            DS Parameter set: channel 1
+    ```
+
+    MAC addresses are upper cased like those of `iwlist`; channels missing from the output are
+    derived from the frequency. Cells without a signal are skipped.
+    """
+    access_points = {}
+    cell = None
+
+    def finish(cell):
+        if cell is not None and cell[2] is not None:
+            mac, mhz, rssi, ssid, channel = cell
+            if channel is None and mhz is not None:
+                channel = str(channel_of_frequency(mhz))
+            frequency = f"{mhz / 1000:g}" if mhz is not None else ""
+            access_points[access_point_identifier(
+                __unescape_iw(ssid), mac, frequency, channel or "")] = rssi
+
+    for match in IW_FIELDS.finditer(output):
+        address, mhz, rssi, ssid, ds_channel, primary_channel = match.groups()
+        if address is not None:
+            finish(cell)
+            cell = [address.upper(), None, None, "", None]
+        elif cell is None:
+            continue
+        elif mhz is not None:
+            cell[1] = float(mhz)
+        elif rssi is not None:
+            cell[2] = float(rssi)
+        elif ssid is not None:
+            cell[3] = ssid
+        elif cell[4] is None:
+            cell[4] = ds_channel or primary_channel
+    finish(cell)
+    return access_points
+
+
+def parse_airport(output: str) -> Dict[str, float]:
+    """
+    Parses the output of `airport -s`:
+
+    ```sh
+                      SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)
+            My Network 123 ab:12:34:56:78:cd -88  36,+1   Y  -- RSN(802.1x/AES/AES)
+             Other Network ef:cd:78:56:34:12 -75  1       Y  -- RSN(PSK/AES/AES)
+
+    1 IBSS network found:
+                      SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)
+                     SETUP de:00:00:12:34:56 -81  11      Y  -- NONE
+    ```
+
+    The columns are located by the header. The BSSID is only shown to root, so identifiers
+    only contain a MAC address if there is one.
+    """
+    rows = [row for row in output.split("\n") if row.strip() != ""]
+    if len(rows) < 2:
+        return {}
+
+    end_of_ssid_column = rows[0].find(" SSID ") + 1 + 4  # network name
+    start_of_bssid_column = rows[0].find(" BSSID ") + 1  # AP MAC
+    start_of_channel_column = rows[0].find(" CHANNEL ") + 1  # subfrequency
+    start_of_ht_column = rows[0].find(" HT ") + 1
+    start_of_security_column = rows[0].find(" SECURITY ") + 1
+    start_of_rssi_column = rows[0].find(" RSSI ") + 1
+
+    access_points = {}
+    for row in rows[1:]:
+        try:
+            rssi = float(row[start_of_rssi_column:start_of_rssi_column + 4])
+        except ValueError:
+            continue
+        ssid = row[:end_of_ssid_column].strip()
+        bssid = row[start_of_bssid_column:start_of_rssi_column].strip()
+        channel = row[start_of_channel_column:start_of_ht_column].strip()
+        security = row[start_of_security_column:].strip()
+        identifier = f"SSID:{ssid};" + (f"MAC:{bssid};" if bssid != "" else "") \
+            + f"CHANNEL:{channel};SECURITY:{security}"
+        access_points[identifier] = rssi
+    return access_points
+
+
+PARSERS: Dict[str, ScanParser] = {
+    "iwlist": parse_iwlist,
+    "iw": parse_iw,
+    "airport": parse_airport,
+}
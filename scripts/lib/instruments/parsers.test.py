@@ -0,0 +1,31 @@
+#!/usr/bin/python3
+import glob
+import json
+import os
+from lib.instruments.parsers import PARSERS, channel_of_frequency
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# every recorded scan output parses to its expected access points
+for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+    backend = os.path.basename(path).split("_")[0].removesuffix(".txt")
+    with open(path, encoding="utf-8") as file:
+        parsed = PARSERS[backend](file.read())
+    with open(path.removesuffix(".txt") + ".expected.json", encoding="utf-8") as file:
+        expected = json.load(file)
+    assert parsed == expected, path
+    print(os.path.basename(path), len(parsed), "access points")
+
+# `iwlist` and `iw` identify the same access point the same way
+with open(os.path.join(FIXTURES, "iwlist_basic.txt"), encoding="utf-8") as file:
+    iwlist = PARSERS["iwlist"](file.read())
+with open(os.path.join(FIXTURES, "iw_scan.txt"), encoding="utf-8") as file:
+    iw = PARSERS["iw"](file.read())
+assert len(set(iwlist) & set(iw)) == 2
+
+assert [channel_of_frequency(f) for f in [2412, 2484, 5180, 5975]] == [1, 14, 36, 5]
+assert PARSERS["iwlist"]("wlan0     No scan results") == {}
+
+# identifiers match those of the first `iwlist` parser byte for byte
+legacy = "SSID:My Network 123;MAC:AB:12:34:56:78:CD;FREQUENCY:2.412;CHANNEL:1)"
+assert legacy in iwlist and legacy in iw
@@ -1,10 +1,15 @@
 #!/usr/bin/python3
+from collections import deque
+from dataclasses import dataclass
 from typing import *
 from sys import platform
 import os
 import subprocess
-import re
-from lib.dataset import Instrument, Value, Values, ValueType
+import threading
+import time
+from lib import metrics
+from lib.dataset import Instrument, MergeFunction, Value, Values, ValueType
+from lib.instruments.parsers import PARSERS
 
 
 # RSSI = Received Signal Strength Indicator
@@ -19,111 +24,35 @@ def posix_is_root():
     return os.geteuid() == 0
 
 
-def prepare_get_access_points_linux(interface: str):
-    def get_access_points_linux() -> Values:
-        cmd = [f"iwlist", interface, "scanning" if posix_is_root() else "scan"]
-        rows = subprocess.run(
-            cmd, check=True, capture_output=True, text=True).stdout
-        rows = str.split(rows, "\n")
-        rows = [row for row in rows
-                if "SSID" in row
-                or "Signal level" in row
-                or "Address" in row
-                or "Frequency" in row]
-        """
-        # Example Command Output After Filtering Rows
-        ```sh
-                  Cell 01 - Address: AB:12:34:56:78:CD
-                            Frequency:2.412 GHz (Channel 1)
-                            Quality=52/70  Signal level=-58 dBm
-                            ESSID:"My Network 123"
-                  Cell 02 - Address: EF:CD:78:56:34:12
-                            Frequency:5.18 GHz (Channel 36)
-                            Quality=46/70  Signal level=-64 dBm
-                            ESSID:"Other Network" 
-        ```
-        """
-        ROWS_PER_CELL = 4  # since we are looking for 4 values
-
-        APs = {}
-        for quad_index in range(int(len(rows) / ROWS_PER_CELL)):
-            quad_base_index = ROWS_PER_CELL * quad_index
-
-            address_line = rows[quad_base_index].strip()
-            address = address_line.split(" ")[-1]
-
-            frequency_line = rows[quad_base_index + 1].strip()
-            frequency = re.search(
-                "\d.\d+ GHz", frequency_line).group().replace(" GHz", "")
-            channel = re.search(
-                "Channel .+", frequency_line).group().replace("Channel ", "")
-
-            signal_line = rows[quad_base_index + 2].strip()
-            rssi = re.search("-\d+", signal_line).group()
-            rssi = float(rssi)
-
-            ssid_line = rows[quad_base_index + 3].strip()
-            ssid = re.sub("ESSID:\"", "", ssid_line)[:-1]
-
-            ap_identifier = f"SSID:{ssid};MAC:{address};FREQUENCY:{frequency};CHANNEL:{channel}"
-
-            APs[ap_identifier] = Value(RSSI, rssi)
-
-        return APs
-    return get_access_points_linux
-
-
-def prepare_get_access_points_macos(interface: str):
+# scan command of every parser backend (see `lib.instruments.parsers`), given the interface
+SCAN_COMMANDS: Dict[str, Callable[[str], List[str]]] = {
+    "iwlist": lambda interface: ["iwlist", interface, "scanning" if posix_is_root() else "scan"],
+    # non-root users can only dump the results of the last scan
+    "iw": lambda interface: ["iw", "dev", interface, "scan"] if posix_is_root() else ["iw", "dev", interface, "scan", "dump"],
     # TODO: migrate to new API and use interface?
-    def get_access_points_macos() -> Values:
-        cmd = ["/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport", "-s"]
-        """
-        # Example Command Output
-        ```sh
-                          SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)
-                My Network 123 ab:12:34:56:78:cd -88  36,+1   Y  -- RSN(802.1x/AES/AES)
-                 Other Network ef:cd:78:56:34:12 -75  1       Y  -- RSN(PSK/AES/AES)
-
-        1 IBSS network found:
-                          SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)
-                         SETUP de:00:00:12:34:56 -81  11      Y  -- NONE
-        ```
-        """
-        rows = subprocess.run(
-            cmd, check=True, capture_output=True, text=True).stdout
-        if rows.strip() == "":
-            raise NoScanDataException
-        rows = str.split(rows, "\n")
-        rows = [row for row in rows if row.strip() != ""]
-        if len(rows) < 2:
-            raise NoScanDataException
+    "airport": lambda _interface: ["/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport", "-s"],
+}
 
-        end_of_ssid_column = rows[0].find(" SSID ") + 1 + 4  # network name
-        start_of_bssid_column = rows[0].find(" BSSID ") + 1  # AP MAC
-        start_of_channel_column = rows[0].find(" CHANNEL ") + 1  # subfrequency
-        start_of_ht_column = rows[0].find(" HT ") + 1
-        start_of_security_column = rows[0].find(" SECURITY ") + 1
-        start_of_rssi_column = rows[0].find(" RSSI ") + 1
-
-        APs: Values = {}
-        for row in rows[1:]:
-            ssid = row[:end_of_ssid_column].strip()
-            bssid = row[start_of_bssid_column:start_of_rssi_column].strip()
-            channel = row[start_of_channel_column:start_of_ht_column].strip()
-            security = row[start_of_security_column:].strip()
-            ap_identifier = f"SSID:{ssid};" + (f"MAC:{bssid};" if posix_is_root(
-            ) else "") + f"CHANNEL:{channel};SECURITY:{security}"
-
-            rssi = row[start_of_rssi_column:start_of_rssi_column+4].strip()
-            try:
-                rssi = float(rssi)
-            except:
-                continue
 
-            APs[ap_identifier] = Value(RSSI, rssi)
+def prepare_get_access_points(interface: str, backend: str, scan_command: Optional[List[str]] = None):
+    """
+    Returns a function that runs the scan command of `backend` (or `scan_command`) and parses
+    its output with the parser of `backend`.
+    """
+    parse = PARSERS[backend]
 
-        return APs
-    return get_access_points_macos
+    def get_access_points() -> Values:
+        cmd = scan_command or SCAN_COMMANDS[backend](interface)
+        with metrics.span("wifi.scan", backend):
+            output = subprocess.run(
+                cmd, check=True, capture_output=True, text=True).stdout
+        if output.strip() == "":
+            raise NoScanDataException
+        with metrics.span("wifi.parse", backend):
+            access_points = parse(output)
+        metrics.count("wifi.access_points", len(access_points))
+        return dict((identifier, Value(RSSI, rssi)) for identifier, rssi in access_points.items())
+    return get_access_points
 
 
 def prepare_get_access_points_windows(interface: str):
@@ -145,10 +74,147 @@ def prepare_get_access_points_windows(interface: str):
     return get_access_points_windows
 
 
+DEFAULT_SCAN_CAPACITY = 64
+# after a failed scan, wait this long before retrying, doubling with every further failure
+FAILURE_BACKOFF = 0.5
+MAX_FAILURE_BACKOFF = 30.0
+
+
+def average_mw(values: List[float]) -> float:
+    """
+    Averages RSSI values (in dBm) in the linear domain, like `MergeFunction.average_mw`.
+    """
+    return MergeFunction.average_mw(values[-1], None, values)
+
+
+@dataclass
+class Scan:
+    time: float  # seconds since the epoch, when the scan finished
+    values: Values
+
+
+class BackgroundScanner:
+    """
+    Runs a scan function over and over on a worker thread and keeps the last `capacity` results
+    in a ring buffer, so measurements can be taken without waiting for a scan to finish.
+    """
+
+    def __init__(self, scan_function: Callable[[], Values], capacity: int = DEFAULT_SCAN_CAPACITY, interval: float = 0.0):
+        """
+        `interval` is the pause in seconds between the end of one scan and the start of the next.
+        After a failed scan, the pause is at least `FAILURE_BACKOFF` seconds, doubling with every
+        consecutive failure up to `MAX_FAILURE_BACKOFF`, so a missing interface or scan command
+        is not retried in a busy loop.
+        """
+        self.scan_function = scan_function
+        self.interval = interval
+        self.scans: Deque[Scan] = deque(maxlen=capacity)
+        self.attempts = 0
+        self.failures = 0  # consecutive failed attempts
+        self.error: Optional[Exception] = None  # of the last attempt
+        self.__condition = threading.Condition()
+        self.__stop = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *_exception):
+        self.stop()
+
+    def running(self) -> bool:
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def start(self) -> Self:
+        if not self.running():
+            self.__stop.clear()
+            self.__thread = threading.Thread(
+                target=self.__run, name="BackgroundScanner", daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stops scanning after the scan in progress has finished (or `timeout` seconds have passed).
+        """
+        self.__stop.set()
+        with self.__condition:
+            self.__condition.notify_all()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+
+    def __run(self):
+        while not self.__stop.is_set():
+            scan, error = None, None
+            try:
+                values = self.scan_function()
+                scan = Scan(time.time(), values)
+            except Exception as e:
+                error = e
+            with self.__condition:
+                if scan is not None:
+                    self.scans.append(scan)
+                self.attempts += 1
+                self.failures = 0 if error is None else self.failures + 1
+                self.error = error
+                self.__condition.notify_all()
+            backoff = 0.0 if self.failures == 0 \
+                else min(FAILURE_BACKOFF * 2 ** (self.failures - 1), MAX_FAILURE_BACKOFF)
+            self.__stop.wait(max(self.interval, backoff))
+
+    def latest(self, max_age: Optional[float] = None, timeout: Optional[float] = None) -> Scan:
+        """
+        Returns the freshest scan right away if it is at most `max_age` seconds old. Otherwise,
+        waits up to `timeout` seconds (forever if `None`) for the next scan. Raises the error of
+        a failed scan attempt, or `NoScanDataException` if no scan arrived in time.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.__condition:
+            attempts = self.attempts
+            while True:
+                if len(self.scans) > 0 and (max_age is None or time.time() - self.scans[-1].time <= max_age):
+                    return self.scans[-1]
+                if self.attempts > attempts and self.error is not None:
+                    raise self.error
+                if not self.running():
+                    raise NoScanDataException("The background scanner is not running.")
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    raise NoScanDataException(
+                        f"No scan finished within {timeout} seconds.")
+                self.__condition.wait(remaining)
+
+    def window(
+        self,
+        seconds: float,
+        aggregate: Callable[[List[float]], float] = average_mw,
+        timeout: Optional[float] = None
+    ) -> Values:
+        """
+        Aggregates every value key over the scans of the last `seconds` seconds, by default into
+        the mean RSSI of every access point, averaged in mW (pass `statistics.fmean` to average
+        the dBm values instead). Waits for the next scan like `latest` if there is none.
+        """
+        with self.__condition:
+            since = time.time() - seconds
+            scans = [scan for scan in self.scans if scan.time >= since]
+        if len(scans) == 0:
+            scans = [self.latest(timeout=timeout)]
+        by_key: Dict[str, List[Value]] = {}
+        for scan in scans:
+            for key, value in scan.values.items():
+                by_key.setdefault(key, []).append(value)
+        return dict((key, Value(values[0].type, aggregate([v.value for v in values])))
+                    for key, values in by_key.items())
+
+
 class WifiInstrument(Instrument):
-    def __init__(self, interface: Optional[str]):
+    def __init__(self, interface: Optional[str], scan_command: Optional[List[str]] = None, backend: Optional[str] = None):
         """
-        Set interface to `None` to use the default interface.
+        Set interface to `None` to use the default interface. `backend` selects the scan command
+        and parser (see `lib.instruments.parsers`): `"iwlist"` (default) or `"iw"` on Linux and
+        `"airport"` on macOS. `scan_command` replaces the backend's scan command (its output must
+        be in the same format), e.g., for testing.
         """
         do_measure_function = None
         if platform == "linux" or platform == "linux2":
@@ -156,17 +222,59 @@ class WifiInstrument(Instrument):
                 print("WARNING: YOU MUST BE ROOT TO INTIATE A NEW NETWORK SCAN. THE DATA PROVIDED TO NON-SUPERUSERS MAY BE A FEW MINUTES OLD.")
             if interface is None:
                 interface = "wlan0"
-            do_measure_function = prepare_get_access_points_linux(interface)
+            backend = backend or "iwlist"
         elif platform == "darwin":
             if not posix_is_root():
                 print(
                     "WARNING: YOU MUST BE ROOT TO ACCESS CERTAIN INFORMATION SUCH AS THE BSSID (MAC) OF AN ACCESS POINT.")
             if interface is None:
                 interface = "en0"
-            do_measure_function = prepare_get_access_points_macos(interface)
+            backend = backend or "airport"
         elif platform == "win32":
             do_measure_function = prepare_get_access_points_windows(interface)
         else:
             raise Exception(f"Invalid platform: {platform}")
-        super().__init__("WiFi", {"platform": platform, "interface": interface}, [
-            RSSI], do_measure_function)
+        if do_measure_function is None:
+            if backend not in PARSERS:
+                raise Exception(
+                    f"ERROR: Unknown scan backend \"{backend}\". Use one of {list(PARSERS)}.")
+            do_measure_function = prepare_get_access_points(
+                interface, backend, scan_command)
+        meta = {"platform": platform, "interface": interface}
+        if backend is not None:
+            meta["backend"] = backend
+        super().__init__("WiFi", meta, [RSSI], do_measure_function)
+        self.scan_function = do_measure_function
+        self.scanner: Optional[BackgroundScanner] = None
+
+    def start_background_scanning(
+        self,
+        window: Optional[float] = None,
+        max_age: Optional[float] = None,
+        interval: float = 0.0,
+        capacity: int = DEFAULT_SCAN_CAPACITY
+    ) -> BackgroundScanner:
+        """
+        Keeps scanning on a worker thread, so `take_measurement` returns right away with the
+        freshest scan (waiting only if it is older than `max_age` seconds) or, if `window` is
+        set, with the mean RSSI (in mW) of every access point over the scans of the last `window`
+        seconds.
+        """
+        self.stop_background_scanning()
+        scanner = BackgroundScanner(
+            self.scan_function, capacity, interval).start()
+        self.scanner = scanner
+        if window is not None:
+            self.do_measure_function = lambda: scanner.window(window)
+        else:
+            self.do_measure_function = lambda: scanner.latest(max_age).values
+        return scanner
+
+    def stop_background_scanning(self):
+        """
+        Stops the background scanner; measurements scan synchronously again.
+        """
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+        self.do_measure_function = self.scan_function
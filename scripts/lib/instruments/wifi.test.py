@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+import itertools
+import math
+import sys
+import time
+from lib.dataset import Coordinates, Value
+from lib.instruments.wifi import RSSI, BackgroundScanner, NoScanDataException, WifiInstrument
+
+if not sys.platform.startswith("linux"):
+    print("The fake scan command below prints `iwlist` output, which is only parsed on Linux.")
+    sys.exit()
+
+# prints two access points like `iwlist` after a short "scan"; the RSSI changes every scan
+FAKE_SCAN = """
+import time
+time.sleep(0.2)
+rssi = -40 - int(time.time() * 10) % 20
+print(f'''          Cell 01 - Address: AB:12:34:56:78:CD
+                    Frequency:2.412 GHz (Channel 1)
+                    Quality=52/70  Signal level={rssi} dBm
+                    ESSID:"My Network 123"
+          Cell 02 - Address: EF:CD:78:56:34:12
+                    Frequency:5.18 GHz (Channel 36)
+                    Quality=46/70  Signal level=-64 dBm
+                    ESSID:"Other Network"''')
+"""
+wifi = WifiInstrument("wlan0", [sys.executable, "-c", FAKE_SCAN])
+print(wifi.take_measurement(Coordinates(0, 0, 0)))
+
+# background scanning: after the first scan, measurements no longer wait for the scan command
+wifi.start_background_scanning()
+wifi.take_measurement(Coordinates(1, 0, 0))
+start = time.time()
+for x in range(2, 22):
+    wifi.take_measurement(Coordinates(x, 0, 0))
+print(f"20 measurements in {time.time() - start:.3f}s")
+assert time.time() - start < 0.2
+time.sleep(0.5)
+print(len(wifi.scanner.scans), "scans in the ring buffer")
+assert len(wifi.scanner.scans) >= 2
+
+# the mean over a window of scans
+wifi.start_background_scanning(window=1)
+time.sleep(1)
+measurement = wifi.take_measurement(Coordinates(22, 0, 0))
+print(measurement.values)
+assert len(measurement.values) == 2
+wifi.stop_background_scanning()
+assert len(wifi.measurements) == 23
+
+# failing scans are reported to the waiting measurement
+def failing_scan():
+    raise NoScanDataException("fake failure")
+
+
+with BackgroundScanner(failing_scan, interval=0.05) as scanner:
+    try:
+        scanner.latest(timeout=1)
+        assert False
+    except NoScanDataException as e:
+        print("failure:", e)
+    # failed scans are retried after a growing pause instead of right away
+    time.sleep(1)
+    print(scanner.attempts, "attempts in about a second,", scanner.failures, "failures in a row")
+    assert scanner.attempts <= 3 and scanner.failures == scanner.attempts
+
+# windows average in mW: -40 and -60 dBm average to about -43 dBm, not -50 dBm
+levels = itertools.cycle([-40, -60])
+with BackgroundScanner(lambda: {"ap": Value(RSSI, next(levels))}, interval=0.01) as scanner:
+    time.sleep(0.2)
+    values = [scan.values["ap"].value for scan in scanner.scans]
+    expected = 10 * math.log10(sum(10 ** (v / 10) for v in values) / len(values))
+    assert abs(scanner.window(10)["ap"].value - expected) < 1e-9 and expected > -44
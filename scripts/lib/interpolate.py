@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+"""
+# Spatial Interpolation
+
+Turns the scattered points of a `MergedMeasurementTable` into values on a regular 2D or 3D grid,
+e.g., to draw a continuous heat map. The following methods are available:
+
+- `"idw"`: inverse distance weighting,
+- `"nearest"`: the value of the nearest measurement,
+- `"rbf"`: radial basis function interpolation (exact at the measured points, smooth in between).
+
+All methods evaluate the grid in chunks, so the memory used for distance matrices stays below
+`chunk_elements` values regardless of the size of the grid.
+"""
+
+from dataclasses import dataclass
+from typing import *
+import numpy as np
+from lib import metrics
+from lib.dataset import MergedMeasurementTable, ValueType
+from lib.spatial import KDTree
+
+
+AXES = ("x", "y", "z")
+DEFAULT_GRID_CELLS = 100  # along the longest axis
+DEFAULT_CHUNK_ELEMENTS = 1 << 22
+DEFAULT_IDW_POWER = 2.0
+# beyond this many points, nearest neighbours are looked up in a `KDTree` instead of brute force
+KD_TREE_MIN_POINTS = 4096
+RBF_MAX_POINTS = 5000
+
+# flattened axis -> remaining axes, matching `show_plot_2d`
+PLANES = {"x": ("y", "z"), "y": ("x", "z"), "z": ("x", "y")}
+
+
+@dataclass
+class Grid:
+    axes: Tuple[str, ...]
+    coordinates: List[np.ndarray]  # cell centers along every axis
+    values: np.ndarray  # indexed [i, j(, k)] like the `axes`
+    value_type: ValueType
+
+    def points(self) -> np.ndarray:
+        """
+        Returns the cell centers as an array of shape (cell count, dimensions).
+        """
+        mesh = np.meshgrid(*self.coordinates, indexing="ij")
+        return np.stack([m.ravel() for m in mesh], axis=1)
+
+    def extent(self, axis: int) -> Tuple[float, float]:
+        c = self.coordinates[axis]
+        half = (c[1] - c[0]) / 2 if len(c) > 1 else 0.5
+        return float(c[0] - half), float(c[-1] + half)
+
+
+def table_points(table: MergedMeasurementTable, axes: Sequence[str] = AXES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the coordinates along `axes` and the values of every row of `table` that has a value.
+    """
+    rows = [row for row in table.rows if row[4] is not None]
+    columns = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 4)
+    return columns[:, [AXES.index(a) for a in axes]], columns[:, 3]
+
+
+def _squared_distances(targets: np.ndarray, points: np.ndarray) -> np.ndarray:
+    d = (targets ** 2).sum(axis=1)[:, None] + (points ** 2).sum(axis=1)[None, :] \
+        - 2 * targets @ points.T
+    return np.maximum(d, 0)
+
+
+def _chunks(target_count: int, point_count: int, chunk_elements: int) -> Iterator[slice]:
+    step = max(1, chunk_elements // max(1, point_count))
+    for start in range(0, target_count, step):
+        yield slice(start, min(start + step, target_count))
+
+
+def idw(
+    points: np.ndarray,
+    values: np.ndarray,
+    targets: np.ndarray,
+    power: float = DEFAULT_IDW_POWER,
+    neighbors: Optional[int] = None,
+    chunk_elements: int = DEFAULT_CHUNK_ELEMENTS
+) -> np.ndarray:
+    """
+    Inverse distance weighting: every target gets the average of all values (or of those of its
+    `neighbors` nearest measurements), weighted by `1 / distance**power`. Targets that coincide
+    with measurements get their (average) value.
+    """
+    result = np.empty(len(targets))
+    if neighbors is not None:
+        tree = KDTree(points)
+        for chunk in _chunks(len(targets), neighbors, chunk_elements):
+            distances, indices = tree.nearest_many(targets[chunk], neighbors)
+            exact = distances <= 1e-9
+            with np.errstate(divide="ignore"):
+                weights = distances ** -power
+            hits = exact.any(axis=1)
+            weights[hits] = exact[hits]
+            result[chunk] = (weights * values[indices]).sum(axis=1) / weights.sum(axis=1)
+        return result
+    for chunk in _chunks(len(targets), len(points), chunk_elements):
+        d2 = _squared_distances(targets[chunk], points)
+        exact = d2 <= 1e-18
+        with np.errstate(divide="ignore"):
+            weights = d2 ** (-power / 2)
+        hits = exact.any(axis=1)
+        weights[hits] = exact[hits]
+        result[chunk] = (weights @ values) / weights.sum(axis=1)
+    return result
+
+
+def nearest(points: np.ndarray, values: np.ndarray, targets: np.ndarray, chunk_elements: int = DEFAULT_CHUNK_ELEMENTS) -> np.ndarray:
+    """
+    Nearest neighbour: every target gets the value of the closest measurement.
+    """
+    result = np.empty(len(targets))
+    if len(points) >= KD_TREE_MIN_POINTS:
+        tree = KDTree(points)
+        for chunk in _chunks(len(targets), 1, chunk_elements):
+            result[chunk] = values[tree.nearest_many(targets[chunk])[1][:, 0]]
+        return result
+    for chunk in _chunks(len(targets), len(points), chunk_elements):
+        result[chunk] = values[_squared_distances(
+            targets[chunk], points).argmin(axis=1)]
+    return result
+
+
+def _rbf_kernel(name: str, r: np.ndarray, epsilon: float) -> np.ndarray:
+    if name == "thin_plate_spline":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(r > 0, r ** 2 * np.log(r), 0)
+    if name == "linear":
+        return -r
+    if name == "cubic":
+        return r ** 3
+    if name == "gaussian":
+        return np.exp(-(epsilon * r) ** 2)
+    if name == "multiquadric":
+        return -np.sqrt(1 + (epsilon * r) ** 2)
+    if name == "inverse_multiquadric":
+        return 1 / np.sqrt(1 + (epsilon * r) ** 2)
+    raise ValueError(f"Unknown RBF kernel: {name}")
+
+
+def rbf(
+    points: np.ndarray,
+    values: np.ndarray,
+    targets: np.ndarray,
+    kernel: str = "thin_plate_spline",
+    epsilon: float = 1.0,
+    smoothing: float = 0.0,
+    chunk_elements: int = DEFAULT_CHUNK_ELEMENTS
+) -> np.ndarray:
+    """
+    Radial basis function interpolation with a linear polynomial term. `smoothing` > 0 trades
+    exactness at the measured points for a smoother surface. Measurements at the same location
+    are averaged first. Solving for the weights is O(n³), so at most `RBF_MAX_POINTS` distinct
+    locations are supported.
+    """
+    points, inverse = np.unique(points, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    values = np.bincount(inverse, weights=values) / np.bincount(inverse)
+    if len(points) > RBF_MAX_POINTS:
+        raise ValueError(
+            f"RBF interpolation supports at most {RBF_MAX_POINTS} distinct points, got {len(points)}. Try \"idw\" instead.")
+
+    # normalize for a well-conditioned system
+    center = points.mean(axis=0)
+    scale = np.ptp(points, axis=0).max() or 1.0
+    points = (points - center) / scale
+    targets = (targets - center) / scale
+
+    n, dimensions = points.shape
+    polynomial = np.hstack([np.ones((n, 1)), points])
+    system = np.zeros((n + dimensions + 1, n + dimensions + 1))
+    system[:n, :n] = _rbf_kernel(kernel, np.sqrt(_squared_distances(points, points)), epsilon) \
+        + smoothing * np.eye(n)
+    system[:n, n:] = polynomial
+    system[n:, :n] = polynomial.T
+    rhs = np.concatenate([values, np.zeros(dimensions + 1)])
+    try:
+        coefficients = np.linalg.solve(system, rhs)
+    except np.linalg.LinAlgError:
+        # e.g., all points on one line, which leaves the polynomial term undetermined
+        coefficients = np.linalg.lstsq(system, rhs, rcond=None)[0]
+    weights, polynomial_coefficients = coefficients[:n], coefficients[n:]
+
+    result = np.empty(len(targets))
+    for chunk in _chunks(len(targets), n, chunk_elements):
+        t = targets[chunk]
+        result[chunk] = _rbf_kernel(kernel, np.sqrt(_squared_distances(t, points)), epsilon) @ weights \
+            + np.hstack([np.ones((len(t), 1)), t]) @ polynomial_coefficients
+    return result
+
+
+METHODS = {"idw": idw, "nearest": nearest, "rbf": rbf}
+
+
+def make_grid_coordinates(points: np.ndarray, resolution: Optional[float]) -> List[np.ndarray]:
+    """
+    Returns the cell centers of a regular grid covering `points` with cells of size `resolution`
+    (by default, `DEFAULT_GRID_CELLS` cells along the longest axis).
+    """
+    low, high = points.min(axis=0), points.max(axis=0)
+    if resolution is None:
+        resolution = (high - low).max() / DEFAULT_GRID_CELLS or 1.0
+    return [np.arange(l, h + resolution / 2, resolution) for l, h in zip(low, high)]
+
+
+@metrics.timed("interpolate")
+def interpolate(
+    table: MergedMeasurementTable,
+    method: str = "idw",
+    ignore_axis: Optional[str] = None,
+    resolution: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    **method_options
+) -> Grid:
+    """
+    Interpolates the values of `table` onto a regular grid with cells of size `resolution`.
+
+    Set `ignore_axis` to flatten the table along that axis for a 2D grid; leave it as `None`
+    for a 3D grid. Cells further than `max_distance` from the nearest measurement are NaN.
+    """
+    axes = PLANES[ignore_axis] if ignore_axis is not None else AXES
+    points, values = table_points(table, axes)
+    if len(points) == 0:
+        raise Exception("ERROR: The table has no values to interpolate.")
+    coordinates = make_grid_coordinates(points, resolution)
+    grid = Grid(axes, coordinates, np.empty(0), table.value_type)
+    targets = grid.points()
+    chunk_elements = method_options.pop(
+        "chunk_elements", DEFAULT_CHUNK_ELEMENTS)
+    result = METHODS[method](points, values, targets,
+                             chunk_elements=chunk_elements, **method_options)
+    if max_distance is not None and len(points) >= KD_TREE_MIN_POINTS:
+        tree = KDTree(points)
+        for chunk in _chunks(len(targets), 1, chunk_elements):
+            result[chunk][tree.nearest_many(targets[chunk])[0][:, 0] > max_distance] = np.nan
+    elif max_distance is not None:
+        for chunk in _chunks(len(targets), len(points), chunk_elements):
+            too_far = _squared_distances(
+                targets[chunk], points).min(axis=1) > max_distance ** 2
+            result[chunk][too_far] = np.nan
+    grid.values = result.reshape([len(c) for c in coordinates])
+    return grid
@@ -0,0 +1,35 @@
+#!/usr/bin/python3
+import numpy as np
+from lib.dataset import generate_random_dataset
+from lib.interpolate import interpolate, idw, nearest, rbf, table_points
+
+table = generate_random_dataset(300, 2).get_instrument(
+    "random_data").measurements_as_table()
+points, values = table_points(table)
+
+# all methods reproduce the measured values at the measured points
+for method in [idw, nearest, rbf]:
+    assert np.allclose(method(points, values, points[:10]), values[:10]), method
+
+# a tiny chunk size gives the same result as one big chunk
+assert np.allclose(idw(points, values, points[:50] + 1, chunk_elements=1),
+                   idw(points, values, points[:50] + 1))
+
+for method in ["idw", "nearest", "rbf"]:
+    grid = interpolate(table, method, "z", resolution=5)
+    print(method, grid.axes, grid.values.shape,
+          np.nanmin(grid.values), np.nanmax(grid.values))
+
+grid = interpolate(table, "idw", None, resolution=20, max_distance=5)
+print("3d", grid.values.shape, "unknown cells:", np.isnan(grid.values).sum())
+
+# the KD-tree paths agree with brute force
+rng = np.random.default_rng(1)
+many, many_values = rng.random((5000, 2)) * 100, rng.random(5000)
+targets = rng.random((2000, 2)) * 100
+brute = ((targets[:, None, :] - many[None, :, :]) ** 2).sum(axis=2)
+assert np.array_equal(nearest(many, many_values, targets), many_values[brute.argmin(axis=1)])
+closest = np.argsort(brute, axis=1)[:, :8]
+weights = np.take_along_axis(brute, closest, axis=1) ** -1.0
+assert np.allclose(idw(many, many_values, targets, neighbors=8, chunk_elements=1000),
+                   (weights * many_values[closest]).sum(axis=1) / weights.sum(axis=1))
@@ -0,0 +1,63 @@
+#!/usr/bin/python3
+"""
+# Measurement Journal
+
+A journal is an append-only JSON Lines file. Every record is written and flushed (and, by default,
+synced to disk) as soon as it is appended, so a crash loses at most the record being written.
+"""
+
+from typing import *
+import json
+import os
+
+
+JOURNAL_EXTENSION = ".journal"
+
+
+def journal_path(dataset_path: str) -> str:
+    return dataset_path.rstrip("/") + JOURNAL_EXTENSION
+
+
+class Journal:
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.file = open(path, "a", encoding="utf-8")
+        # terminate a record that was cut off by a crash, so it cannot swallow the next one
+        if self.file.tell() > 0:
+            with open(path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    self.file.write("\n")
+
+    def append(self, record: dict):
+        self.file.write(json.dumps(record, sort_keys=True) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def clear(self):
+        """
+        Empties the journal, e.g., after its records were compacted into the dataset file.
+        """
+        self.file.truncate(0)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+
+def replay(path: str) -> Iterator[dict]:
+    """
+    Yields the records of the journal at `path`. Records that were cut off by a crash are skipped.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+import os
+import tempfile
+from lib.journal import Journal, replay
+
+path = os.path.join(tempfile.mkdtemp(), "test.journal")
+journal = Journal(path, fsync=False)
+journal.append({"record": 1})
+journal.append({"record": 2})
+journal.file.write('{"record": 3, "cut off by a cra')
+journal.close()
+
+# reopening terminates the broken record
+journal = Journal(path, fsync=False)
+journal.append({"record": 4})
+print(list(replay(path)))
+assert list(replay(path)) == [{"record": 1}, {"record": 2}, {"record": 4}]
+
+journal.clear()
+assert list(replay(path)) == []
+
+# a crash while compacting leaves the old dataset file and the journal intact
+from lib.dataset import Coordinates, Dataset, Instrument, Measurement, Value, ValueType
+
+dataset_path = os.path.join(os.path.dirname(path), "crash.json")
+ds = Dataset("Crash")
+ds.add_instrument(Instrument("Test", {}, [ValueType("t", "u", 1, 0)], None))
+ds.enable_journal(dataset_path, fsync=False)
+ins = ds.get_instrument("Test")
+ins.append_measurement(Measurement("first", Coordinates(0, 0, 0), {"a": Value("t", 1)}, None))
+ds.compact()
+ins.append_measurement(Measurement("second", Coordinates(1, 0, 0), {"a": Value("t", 2)}, None))
+
+
+def crash(*_args):
+    yield "{\"name\": "
+    raise KeyboardInterrupt()
+
+
+ds.iter_json = crash
+try:
+    ds.compact()
+    assert False
+except KeyboardInterrupt:
+    pass
+assert os.listdir(os.path.dirname(path)).count("crash.json") == 1
+assert not any(name.endswith(".tmp") for name in os.listdir(os.path.dirname(path)))
+assert [m.id for m in Dataset.load(dataset_path).get_instrument("Test").measurements] == ["first", "second"]
+
+# columnar datasets are replaced as a whole, even while their columns are memory-mapped
+columnar_path = os.path.join(os.path.dirname(path), "crash.columns")
+del ds.iter_json
+ds.save(columnar_path)
+loaded = Dataset.load(columnar_path)
+loaded.save(columnar_path)
+assert [m.id for m in Dataset.load(columnar_path).get_instrument("Test").measurements] == ["first", "second"]
+assert [m.id for m in loaded.get_instrument("Test").measurements] == ["first", "second"]
+assert not os.path.exists(columnar_path + ".old")
+
+# a second session on the path of a crashed one must continue it, not replace it
+restart_path = os.path.join(os.path.dirname(path), "restart.json")
+crashed = Dataset("Restart")
+crashed.add_instrument(Instrument("Test", {}, [ValueType("t", "u", 1, 0)], None))
+crashed.enable_journal(restart_path, fsync=False)
+for i in range(3):
+    crashed.get_instrument("Test").append_measurement(
+        Measurement(f"crashed {i}", Coordinates(i, 0, 0), {"a": Value("t", i)}, None))
+crashed._journal.close()  # the session crashes without compacting
+
+fresh = Dataset("Restart")
+fresh.add_instrument(Instrument("Test", {}, [ValueType("t", "u", 1, 0)], None))
+try:
+    fresh.enable_journal(restart_path, fsync=False)
+    assert False
+except Exception as e:
+    print(e)
+resumed = Dataset.load(restart_path).replace_instrument(Instrument("Test", {}, [ValueType("t", "u", 1, 0)], None))
+resumed.enable_journal(restart_path, fsync=False)
+resumed.get_instrument("Test").append_measurement(
+    Measurement("resumed", Coordinates(3, 0, 0), {"a": Value("t", 3)}, None))
+resumed.compact()
+assert [m.id for m in Dataset.load(restart_path).get_instrument("Test").measurements] \
+    == ["crashed 0", "crashed 1", "crashed 2", "resumed"]
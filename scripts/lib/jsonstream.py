@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+"""
+# Incremental JSON Reading
+
+`JsonStream` walks through a JSON document read from a file in chunks. Objects and arrays can be
+iterated one member at a time, so large arrays (e.g., the measurements of an instrument) never
+have to be held in memory as a whole. Each member itself is decoded with the `json` module.
+"""
+
+from typing import *
+import json
+import re
+
+
+DEFAULT_READ_SIZE = 1 << 20
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# characters that may continue a number, e.g., "12" followed by ".5" in the next chunk
+NUMBER_CHARACTERS = frozenset("0123456789.eE+-")
+
+
+class JsonStream:
+    def __init__(self, file: IO[str], read_size: int = DEFAULT_READ_SIZE):
+        self.file = file
+        self.read_size = read_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def __fill(self) -> bool:
+        """
+        Reads the next chunk of the file into the buffer. Returns `False` at the end of the file.
+        """
+        if self.eof:
+            return False
+        chunk = self.file.read(self.read_size)
+        if chunk == "":
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skips whitespace and returns the next character without consuming it.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.__fill():
+                raise EOFError("Unexpected end of JSON document.")
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"Expected '{char}' but found '{found}' at offset {self.pos} of the current chunk.")
+        self.pos += 1
+
+    def read_value(self) -> Any:
+        """
+        Decodes and returns the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # numbers and literals cut off at the end of the buffer look complete
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARACTERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.__fill()
+
+    def skip_value(self):
+        """
+        Consumes the next value without keeping it. Objects and arrays that are not complete in
+        the buffer are walked member by member, so skipping a large value (e.g., an instrument
+        that is not loaded) reads the file once and never holds more than a chunk of it.
+        """
+        first = self.peek()
+        if first != "[" and first != "{":
+            self.read_value()
+            return
+        try:
+            _, self.pos = self.decoder.raw_decode(self.buffer, self.pos)
+            return
+        except json.JSONDecodeError:
+            if self.eof:
+                raise
+        for _ in (self.iter_array() if first == "[" else self.iter_object()):
+            self.skip_value()
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Yields the keys of the next object. The caller must consume each member's value
+        (e.g., via `read_value` or `skip_value`) before advancing the iterator.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(":")
+            yield key
+            if self.peek() == "}":
+                self.pos += 1
+                return
+            self.expect(",")
+
+    def iter_array(self) -> Iterator[None]:
+        """
+        Yields once per element of the next array. The caller must consume each element
+        before advancing the iterator.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield None
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            self.expect(",")
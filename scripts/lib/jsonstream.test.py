@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+import io
+from lib.jsonstream import JsonStream
+
+doc = '{"a": 12345, "list": [{"x": 1}, [2, 3], "four", 5.5, null], "skipped": [[1], {"b": []}], "z": {}}'
+
+# a tiny read size makes every value cross chunk boundaries
+stream = JsonStream(io.StringIO(doc), read_size=3)
+result = {}
+for key in stream.iter_object():
+    if key == "list":
+        result[key] = []
+        for _ in stream.iter_array():
+            result[key].append(stream.read_value())
+    elif key == "skipped":
+        stream.skip_value()
+    else:
+        result[key] = stream.read_value()
+
+print(result)
+assert result == {"a": 12345, "list": [{"x": 1}, [2, 3], "four", 5.5, None], "z": {}}
+
+# a number split between chunks is not cut short
+stream = JsonStream(io.StringIO('[12.5, -3e2]'), read_size=4)  # the first chunk ends in "12."
+values = []
+for _ in stream.iter_array():
+    values.append(stream.read_value())
+assert values == [12.5, -300]
+
+# skipping a large instrument reads it member by member, without buffering all of it
+measurements = ", ".join(f'{{"id": {i}, "values": {{"a": {i}.5, "b": [1, 2]}}, "note": "x"}}' for i in range(20000))
+doc = f'{{"instruments": {{"A": {{"meta": {{}}, "measurements": [{measurements}]}}, "B": {{"name": "B"}}}}}}'
+
+
+class ObservedFile(io.StringIO):
+    def read(self, size: int = -1) -> str:
+        self.largest_buffer = max(getattr(self, "largest_buffer", 0), len(stream.buffer))
+        return super().read(size)
+
+
+file = ObservedFile(doc)
+stream = JsonStream(file, read_size=4096)
+found = {}
+for key in stream.iter_object():
+    for name in stream.iter_object():
+        if name == "A":
+            stream.skip_value()
+        else:
+            found[name] = stream.read_value()
+assert found == {"B": {"name": "B"}}
+print(len(doc), file.largest_buffer)
+assert file.largest_buffer < 3 * 4096
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+"""
+# Streaming JSON Writing
+
+Writes datasets in exactly the format of `json.dumps(..., indent=2, sort_keys=True)`, but without
+building the document (or one object per measurement) in memory first: the measurements of an
+instrument are formatted straight from the columns of its `MeasurementStore`, one chunk at a time.
+"""
+
+from typing import *
+import json
+import numpy as np
+from lib.store import AXIS_INT_FLAGS, MeasurementStore
+
+
+INDENT = "  "
+DEFAULT_CHUNK_SIZE = 10000
+
+encode_string = json.encoder.encode_basestring_ascii
+
+
+def encode_number(value: float | int) -> str:
+    """
+    Formats a number the way the `json` module does.
+    """
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "Infinity"
+    if value == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def encode_numbers(values: np.ndarray, is_int: np.ndarray) -> List[str]:
+    """
+    Formats an array of float64 values like `encode_number`, formatting those flagged in `is_int`
+    as integers. These are exact because the store only accepts integers within +-2**53 (see
+    `lib.store.int_flag`).
+    """
+    if is_int.any() or not np.isfinite(values).all():
+        return [encode_number(int(v) if i else v) for v, i in zip(values.tolist(), is_int.tolist())]
+    return list(map(float.__repr__, values.tolist()))
+
+
+def iter_measurements(store: MeasurementStore, level: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yields the measurements array of `store` in chunks, formatted as if it was nested `level`
+    indentation levels deep.
+    """
+    return iter_measurements_of_stores([store], level, chunk_size)
+
+
+def iter_measurements_of_stores(stores: Iterable[MeasurementStore], level: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Like `iter_measurements`, but yields the measurements of all `stores` as one array, with
+    only one store needed in memory at a time (e.g., when `stores` is a generator).
+    """
+    empty = True
+    for store in stores:
+        if len(store) == 0:
+            continue
+        format_chunk = __chunk_formatter(store, level)
+        for start in range(0, len(store), chunk_size):
+            yield "[\n" if empty else ",\n"
+            empty = False
+            yield format_chunk(start, min(start + chunk_size, len(store)))
+    yield "[]" if empty else f"\n{INDENT * level}]"
+
+
+def __chunk_formatter(store: MeasurementStore, level: int) -> Callable[[int, int], str]:
+    """
+    Returns a function that formats the measurements `start` to `stop` of `store`.
+    """
+    i0, i1, i2, i3 = (INDENT * (level + n) for n in range(1, 5))
+
+    # sort_keys: order the values of every measurement by key
+    key_order = sorted(range(len(store.keys)), key=lambda k: store.keys[k])
+    key_rank = np.empty(len(store.keys), dtype=np.int64)
+    key_rank[key_order] = np.arange(len(store.keys))
+    key_prefixes = [f"{i2}{encode_string(key)}: {{\n{i3}\"type\": " for key in store.keys]
+    type_names = [encode_string(name) + f",\n{i3}\"value\": " for name in store.type_names]
+    value_suffix = f"\n{i2}}}"
+
+    def format_chunk(start: int, stop: int) -> str:
+        entry_measurement = store.entry_measurement.array
+        entry_start, entry_stop = np.searchsorted(entry_measurement, [start, stop])
+        measurement_of_entry = entry_measurement[entry_start:entry_stop]
+        keys = store.entry_key.array[entry_start:entry_stop]
+        order = np.lexsort((key_rank[keys], measurement_of_entry))
+        entry_texts = [
+            key_prefixes[k] + type_names[t] + v + value_suffix
+            for k, t, v in zip(
+                keys[order].tolist(),
+                store.entry_type.array[entry_start:entry_stop][order].tolist(),
+                encode_numbers(
+                    store.entry_value.array[entry_start:entry_stop][order],
+                    store.entry_is_int.array[entry_start:entry_stop][order]))]
+        bounds = np.searchsorted(
+            measurement_of_entry, np.arange(start, stop + 1)).tolist()
+
+        flags = store.coordinate_int_flags.array[start:stop]
+        xs, ys, zs = (encode_numbers(getattr(store, axis).array[start:stop], (flags & flag) != 0)
+                      for axis, flag in AXIS_INT_FLAGS.items())
+        ids = store.id_list(np.arange(start, stop))
+        texts = []
+        for n, index in enumerate(range(start, stop)):
+            note = store.notes[index]
+            values = "{\n" + ",\n".join(entry_texts[bounds[n]:bounds[n + 1]]) + f"\n{i1}}}" \
+                if bounds[n] < bounds[n + 1] else "{}"
+            texts.append(
+                f"{i0}{{\n"
+                f"{i1}\"coordinates\": {{\n"
+                f"{i2}\"x\": {xs[n]},\n"
+                f"{i2}\"y\": {ys[n]},\n"
+                f"{i2}\"z\": {zs[n]}\n"
+                f"{i1}}},\n"
+                f"{i1}\"id\": {encode_string(ids[n])},\n"
+                f"{i1}\"note\": {'null' if note is None else encode_string(note)},\n"
+                f"{i1}\"values\": {values}\n"
+                f"{i0}}}")
+        return ",\n".join(texts)
+    return format_chunk
+
+
+class Splice:
+    """
+    Marks a place in a document that `iter_document` fills with the chunks yielded by
+    `iter_chunks(level)`.
+    """
+
+    def __init__(self, iter_chunks: Callable[[int], Iterator[str]]):
+        self.iter_chunks = iter_chunks
+
+
+def iter_document(document: Any, level: int = 0) -> Iterator[str]:
+    """
+    Yields `document` formatted like `json.dumps(document, indent=2, sort_keys=True)`, except
+    that any `Splice` in it is replaced by its chunks.
+    """
+    if isinstance(document, Splice):
+        yield from document.iter_chunks(level)
+    elif isinstance(document, dict) and len(document) > 0:
+        inner = INDENT * (level + 1)
+        yield "{"
+        for n, key in enumerate(sorted(document)):
+            # like `json`, non-string keys are written as strings
+            name = key if isinstance(key, str) else json.dumps(key)
+            yield ("\n" if n == 0 else ",\n") + inner + encode_string(name) + ": "
+            yield from iter_document(document[key], level + 1)
+        yield "\n" + INDENT * level + "}"
+    elif isinstance(document, (list, tuple)) and len(document) > 0:
+        inner = INDENT * (level + 1)
+        yield "["
+        for n, item in enumerate(document):
+            yield ("\n" if n == 0 else ",\n") + inner
+            yield from iter_document(item, level + 1)
+        yield "\n" + INDENT * level + "]"
+    else:
+        yield json.dumps(document)
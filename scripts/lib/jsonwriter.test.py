@@ -0,0 +1,11 @@
+#!/usr/bin/python3
+import json
+from lib.jsonwriter import iter_document, Splice
+
+document = {"b": [1, 2.5, {"c": None, "a": "ö"}], "a": {}, "e": [], "f": True, "d": float("inf")}
+written = "".join(iter_document(document))
+print(written)
+assert written == json.dumps(document, indent=2, sort_keys=True)
+
+spliced = "".join(iter_document({"x": Splice(lambda level: iter([f"<level {level}>"]))}))
+assert spliced == '{\n  "x": <level 1>\n}'
@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+"""
+# Value Key Index
+
+Value keys like those of the WiFi instrument (`SSID:My Network;MAC:ab:12:34:56:78:cd;FREQUENCY:5.18;
+CHANNEL:36`) are lists of `FIELD:value` pairs. `KeyIndex` parses every distinct key of a
+`MeasurementStore` once and keeps an inverted index from field values to key ids, and from key
+ids to the measurements that contain them, so queries on fields never scan the keys with regular
+expressions:
+
+```python
+index = instrument.key_index
+index.select('ssid="My Network", channel>=36')  # key ids
+index.measurements(index.select("band=5"))  # measurement indices
+instrument.measurements_as_table_where('mac="ab:12:34:56:78:cd"')
+```
+
+Field names are case-insensitive. `CHANNEL` holds the primary channel number (`36` for `36,+1`)
+and the derived field `BAND` holds the frequency band in GHz (`2.4`, `5` or `6`).
+"""
+
+from typing import *
+import json
+import operator
+import re
+import numpy as np
+from lib.store import MeasurementStore
+
+
+OPERATORS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+CONDITION = re.compile(
+    r"\s*(\w+)\s*(==|!=|>=|<=|=|>|<)\s*(\"(?:[^\"\\]|\\.)*\"|[^,]*?)\s*(?:,|$)")
+Condition = Tuple[str, str, str]  # field, operator, value
+
+
+def parse_key(key: str) -> Dict[str, str]:
+    """
+    Returns the fields of a value key of the form `FIELD:value;FIELD:value;...`, with upper case
+    field names and the normalized `CHANNEL` and derived `BAND` fields. Keys without fields
+    (e.g., `e0`) give an empty dict.
+    """
+    fields = {}
+    for part in key.split(";"):
+        name, separator, value = part.partition(":")
+        if separator != "":
+            fields[name.strip().upper()] = value
+    channel = re.match(r"\s*(\d+)", fields.get("CHANNEL", ""))
+    if channel is not None:
+        fields["CHANNEL"] = channel.group(1)
+    band = __band(fields)
+    if band is not None:
+        fields["BAND"] = band
+    return fields
+
+
+def __band(fields: Dict[str, str]) -> Optional[str]:
+    frequency = _number(fields.get("FREQUENCY", ""))
+    if frequency is not None:
+        return "2.4" if frequency < 3 else "5" if frequency < 5.925 else "6"
+    channel = _number(fields.get("CHANNEL", ""))
+    if channel is not None:
+        # without a frequency, 6 GHz channels cannot be told apart from 5 GHz channels
+        return "2.4" if channel <= 14 else "5"
+    return None
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_query(query: str) -> List[Condition]:
+    """
+    Parses a query of comma separated conditions like `ssid="My Network", channel>=36`. Values
+    may be quoted (JSON string syntax) or bare.
+    """
+    conditions = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        match = CONDITION.match(query, pos)
+        if match is None or match.end() == pos:
+            raise Exception(f"ERROR: Invalid query condition at \"{query[pos:]}\".")
+        field, op, value = match.groups()
+        if value.startswith("\""):
+            value = json.loads(value)
+        conditions.append((field.upper(), op, value))
+        pos = match.end()
+    return conditions
+
+
+def _matches(field_value: str, op: str, value: str) -> bool:
+    """
+    Compares numerically if both sides are numbers and as strings otherwise.
+    """
+    a, b = _number(field_value), _number(value)
+    if a is not None and b is not None:
+        return OPERATORS[op](a, b)
+    return OPERATORS[op](field_value, value)
+
+
+class KeyIndex:
+    def __init__(self, store: MeasurementStore):
+        self.store = store
+        self.fields: List[Dict[str, str]] = []  # by key id
+        # field -> value -> key ids
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        # (entry count, key count, store version) the measurement lists were built for
+        self.__entries = None
+        self.__key_order = np.empty(0, dtype=np.int64)
+        self.__key_bounds = np.zeros(1, dtype=np.int64)
+
+    def __sync_keys(self):
+        """
+        Indexes the keys that were added to the store since the last query.
+        """
+        for key_id in range(len(self.fields), len(self.store.keys)):
+            fields = parse_key(self.store.keys[key_id])
+            self.fields.append(fields)
+            for name, value in fields.items():
+                self.postings.setdefault(name, {}).setdefault(
+                    value, []).append(key_id)
+
+    def values(self, field: str) -> List[str]:
+        """
+        Returns the distinct values of `field`, e.g., all SSIDs for `"ssid"`.
+        """
+        self.__sync_keys()
+        return sorted(self.postings.get(field.upper(), {}))
+
+    def select(self, query: str | List[Condition] = "", **equal: str) -> np.ndarray:
+        """
+        Returns the sorted ids of the keys that match every condition of `query` (see
+        `parse_query`) and have every field given in `equal` set to the given value.
+        """
+        self.__sync_keys()
+        conditions = parse_query(query) if isinstance(query, str) else list(query)
+        conditions += [(field.upper(), "=", str(value)) for field, value in equal.items()]
+        selected = None
+        for field, op, value in conditions:
+            postings = self.postings.get(field, {})
+            if op in ("=", "==") and value in postings:
+                ids = set(postings[value])
+            else:
+                ids = set(key_id for field_value, key_ids in postings.items()
+                          if _matches(field_value, op, value) for key_id in key_ids)
+            selected = ids if selected is None else selected & ids
+        if selected is None:
+            return np.arange(len(self.fields))
+        return np.array(sorted(selected), dtype=np.int64)
+
+    def key_mask(self, query: str | List[Condition] = "", **equal: str) -> np.ndarray:
+        """
+        Like `select`, but returns a boolean mask over all key ids.
+        """
+        mask = np.zeros(len(self.store.keys), dtype=np.bool_)
+        mask[self.select(query, **equal)] = True
+        return mask
+
+    def __sync_entries(self):
+        store = self.store
+        state = (store.entry_count, len(store.keys), store.version)
+        if self.__entries != state:
+            entry_key = store.entry_key.array
+            self.__key_order = np.argsort(entry_key, kind="stable")
+            self.__key_bounds = np.searchsorted(
+                entry_key[self.__key_order], np.arange(len(store.keys) + 1))
+            self.__entries = state
+
+    def entries(self, key_ids: Iterable[int]) -> np.ndarray:
+        """
+        Returns the sorted indices of the store entries (values) with any of `key_ids`.
+        """
+        self.__sync_entries()
+        key_ids = np.fromiter(key_ids, dtype=np.int64)
+        if len(key_ids) == 1:
+            # entries are sorted by measurement and the key order is stable
+            return self.__key_order[self.__key_bounds[key_ids[0]]:self.__key_bounds[key_ids[0] + 1]]
+        counts = self.__key_bounds[key_ids + 1] - self.__key_bounds[key_ids]
+        if counts.sum() > self.store.entry_count // 4:
+            # a mask over all entries is cheaper than sorting most of them
+            mask = np.zeros(len(self.store.keys), dtype=np.bool_)
+            mask[key_ids] = True
+            return np.flatnonzero(mask[self.store.entry_key.array])
+        return np.sort(np.concatenate(
+            [self.__key_order[self.__key_bounds[k]:self.__key_bounds[k + 1]] for k in key_ids.tolist()]
+            + [np.empty(0, dtype=np.int64)]))
+
+    def measurements(self, key_ids: Iterable[int]) -> np.ndarray:
+        """
+        Returns the sorted indices of the measurements that have a value for any of `key_ids`.
+        """
+        return np.unique(self.store.entry_measurement.array[self.entries(key_ids)]).astype(np.int64)
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+import re
+import numpy as np
+from lib.dataset import Instrument, MergeFunction, Value
+from lib.instruments.wifi import RSSI
+from lib.keyindex import parse_key, parse_query
+
+print(parse_key("SSID:My Network;MAC:ab:12:34:56:78:cd;FREQUENCY:5.18;CHANNEL:36"))
+assert parse_key("SSID:x;CHANNEL:36,+1;SECURITY:RSN(PSK/AES/AES)")["CHANNEL"] == "36"
+assert parse_key("SSID:x;CHANNEL:6")["BAND"] == "2.4"
+assert parse_key("e0") == {}
+assert parse_query('ssid="a, \\"b\\"", channel>=36 , band = 5') == [
+    ("SSID", "=", "a, \"b\""), ("CHANNEL", ">=", "36"), ("BAND", "=", "5")]
+
+access_points = [("Net A", "ab:cd:00:00:00:01", 2.412, 1), ("Net A", "ab:cd:00:00:00:02", 5.18, 36),
+                 ("Net B", "ab:cd:00:00:00:03", 5.5, 100), ("Net B", "ab:cd:00:00:00:04", 2.437, 6)]
+wifi = Instrument("WiFi", {}, [RSSI], None)
+for n in range(200):
+    wifi.append_measurement_dict({
+        "id": str(n), "note": None, "coordinates": {"x": n, "y": 0, "z": 0},
+        "values": dict((f"SSID:{ssid};MAC:{mac};FREQUENCY:{frequency};CHANNEL:{channel}", Value(RSSI.name, -40 - (n * i) % 50).to_dict())
+                       for i, (ssid, mac, frequency, channel) in enumerate(access_points) if n % (i + 2) == 0)})
+index = wifi.key_index
+print(index.values("ssid"), index.values("band"))
+assert index.select('ssid="Net A", channel>=36').tolist() == [1]
+assert index.select("band=5").tolist() == [1, 2]
+assert index.select(ssid="Net B", band="2.4").tolist() == [3]
+assert len(index.select('ssid="nothing"')) == 0
+
+# the index gives the same tables as the equivalent regular expressions
+for query, expressions in [('ssid="Net A", channel>=36', ["SSID:Net A;", "CHANNEL:(36|100)$"]),
+                           ("band=2.4", ["FREQUENCY:2\\."])]:
+    by_fields = wifi.measurements_as_table_where(query, MergeFunction.average)
+    by_regex = wifi.measurements_as_table(expressions, MergeFunction.average)
+    assert by_fields.rows == by_regex.rows, query
+    print(query, len(by_fields.rows), "rows")
+
+# key ids -> measurements, kept up to date as measurements are appended
+measurements = index.measurements(index.select(mac="ab:cd:00:00:00:04"))
+assert measurements.tolist() == list(range(0, 200, 5))
+wifi.append_measurement_dict({"id": "new", "note": None, "coordinates": {"x": 0, "y": 0, "z": 0},
+                              "values": {"SSID:Net C;CHANNEL:11": Value(RSSI.name, -50).to_dict()}})
+assert index.measurements(index.select(ssid="Net C")).tolist() == [200]
+
+# many tables at once, and one table per group
+queries = [["SSID:Net A"], (["SSID:Net B", "CHANNEL:6"], MergeFunction.average), ["nothing"], ["."]]
+tables = wifi.measurements_as_tables(queries)
+assert tables[2] is None
+for query, table in zip(queries, tables):
+    if table is not None:
+        expressions, merger = query if isinstance(query, tuple) else (query, MergeFunction.max)
+        assert table.rows == wifi.measurements_as_table(expressions, merger).rows
+by_ssid = wifi.measurements_as_tables_by("ssid")
+print(dict((ssid, len(table.rows)) for ssid, table in by_ssid.items()))
+assert by_ssid["Net A"].rows == wifi.measurements_as_table(["SSID:Net A;"]).rows
+by_key = wifi.measurements_as_tables_by("key", MergeFunction.count)
+assert len(by_key) == len(wifi.store.keys)
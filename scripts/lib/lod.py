@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+# Level of Detail
+
+Reduces large point clouds to a point budget before they are plotted. Points are binned into
+cubic voxels and only the lowest and the highest value of every voxel are kept, so every
+occupied region stays visible and no extreme value (e.g., a coverage hole or a hot spot) is
+dropped. The voxel size is chosen as small as the budget allows.
+"""
+
+from typing import *
+import numpy as np
+
+
+# finer grids would not distinguish more points (and their voxel ids would overflow int64 in 3D)
+MAX_CELLS = 1 << 20
+
+
+def unit_coordinates(points: np.ndarray) -> np.ndarray:
+    """
+    Scales `points` into [0, 1] along the longest axis of their bounding box (keeping the aspect
+    ratio).
+    """
+    low = points.min(axis=0)
+    return (points - low) / (float(np.ptp(points, axis=0).max()) or 1.0)
+
+
+def voxel_ids(unit_points: np.ndarray, cells: int) -> np.ndarray:
+    """
+    Returns the id of the voxel every point of `unit_points` (see `unit_coordinates`) falls into
+    when the longest axis is divided into `cells` voxels.
+    """
+    index = np.minimum((unit_points * cells).astype(np.int64), cells - 1)
+    return np.ravel_multi_index(index.T, (cells,) * unit_points.shape[1])
+
+
+def __occupied_voxels(unit_points: np.ndarray, cells: int) -> int:
+    ids = voxel_ids(unit_points, cells)
+    if cells ** unit_points.shape[1] <= 8 * len(unit_points):
+        return int(np.count_nonzero(np.bincount(ids)))
+    return len(np.unique(ids))
+
+
+def __group_firsts(voxels: np.ndarray, key: np.ndarray) -> np.ndarray:
+    """
+    Returns the index of the point with the lowest `key` in every voxel.
+    """
+    order = np.lexsort((key, voxels))
+    sorted_voxels = voxels[order]
+    firsts = np.flatnonzero(np.r_[True, sorted_voxels[1:] != sorted_voxels[:-1]])
+    return order[firsts]
+
+
+def voxel_extremes(points: np.ndarray, values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Returns the sorted indices of at most `max_points` (but at least two) of `points`: the points
+    with the lowest and highest value in every voxel of the finest voxel grid that fits the budget.
+    NaN values count as neither low nor high.
+    """
+    if len(points) <= max_points:
+        return np.arange(len(points))
+    max_voxels = max(1, max_points // 2)
+    dimensions = points.shape[1]
+    points = unit_coordinates(points)
+
+    # the largest number of cells along the longest axis that occupies at most `max_voxels` voxels
+    fits = max(1, int(max_voxels ** (1 / dimensions)))
+    too_many = fits * 2
+    while too_many <= MAX_CELLS and __occupied_voxels(points, too_many) <= max_voxels:
+        fits, too_many = too_many, too_many * 2
+    while too_many - fits > 1 and too_many <= MAX_CELLS:
+        middle = (fits + too_many) // 2
+        if __occupied_voxels(points, middle) <= max_voxels:
+            fits = middle
+        else:
+            too_many = middle
+
+    voxels = voxel_ids(points, fits)
+    lowest = __group_firsts(voxels, np.where(np.isnan(values), np.inf, values))
+    highest = __group_firsts(voxels, np.where(np.isnan(values), np.inf, -values))
+    return np.union1d(lowest, highest)
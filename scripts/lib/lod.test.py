@@ -0,0 +1,21 @@
+#!/usr/bin/python3
+import numpy as np
+from lib.dataset import generate_random_dataset
+from lib.interpolate import table_points
+from lib.lod import voxel_extremes
+
+table = generate_random_dataset(20000, 1).get_instrument(
+    "random_data").measurements_as_table()
+points, values = table_points(table)
+
+for max_points in [10, 1000, 5000]:
+    kept = voxel_extremes(points, values, max_points)
+    # the global extremes always survive
+    assert len(kept) <= max_points
+    assert values.argmin() in kept and values.argmax() in kept
+    print(max_points, "->", len(kept), "points")
+
+# small tables are left alone
+assert len(voxel_extremes(points[:100], values[:100], 1000)) == 100
+# all points at the same location still keep both extremes
+assert voxel_extremes(np.zeros((50, 3)), np.arange(50.0), 10).tolist() == [0, 49]
@@ -0,0 +1,242 @@
+#!/usr/bin/python3
+"""
+# Hot Path Metrics
+
+Opt-in timing spans and counters for finding out where the time of a survey goes: the scan
+subprocess, parsing, merging, serialization or plotting. Nothing is recorded until `enable` is
+called; while disabled, every span is a shared no-op, so the instrumented functions cost one
+flag check more than before.
+
+```python
+from lib import metrics
+
+metrics.enable()
+ds = Dataset.load("recording.json")  # recorded as "dataset.load"
+with metrics.span("my_analysis"):
+    ...
+metrics.count("my_counter", 3)
+metrics.export("metrics.json")  # or "metrics.csv"; see `summary` for the fields
+```
+
+Setting the environment variable `HEATMAPPER_METRICS` to a file path enables metrics for any
+script and exports them to that path when the script exits.
+
+Every span keeps a histogram with power-of-two buckets from 1 µs up, so memory stays constant
+however often a span is entered, and percentiles are estimated from the buckets.
+"""
+
+from typing import *
+import atexit
+import csv
+import functools
+import io
+import json
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+
+ENVIRONMENT_VARIABLE = "HEATMAPPER_METRICS"
+SMALLEST_BUCKET = 1e-6  # s; bucket n holds durations up to SMALLEST_BUCKET * 2 ** n
+BUCKET_COUNT = 32  # up to about 36 minutes; longer durations go into the last bucket
+PERCENTILES = (50, 90, 99)
+CSV_FIELDS = ("name", "kind", "count", "total_s", "mean_s", "min_s", "max_s") \
+    + tuple(f"p{p}_s" for p in PERCENTILES)
+
+enabled = False
+__lock = threading.Lock()
+__histograms: Dict[str, "Histogram"] = {}
+__counters: Dict[str, float] = {}
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * BUCKET_COUNT
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        bucket = 0 if seconds <= SMALLEST_BUCKET else math.ceil(math.log2(seconds / SMALLEST_BUCKET))
+        self.buckets[min(bucket, BUCKET_COUNT - 1)] += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the `q`th percentile, clamped to the
+        observed minimum and maximum.
+        """
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count > 0:
+                return min(max(SMALLEST_BUCKET * 2 ** bucket, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count > 0 else None,
+            "min_s": self.min if self.count > 0 else None,
+            "max_s": self.max,
+            **dict((f"p{p}_s", self.percentile(p)) for p in PERCENTILES),
+            # upper bound of the bucket in seconds -> count, for the buckets that are not empty
+            "histogram": dict((f"{SMALLEST_BUCKET * 2 ** b:g}", c) for b, c in enumerate(self.buckets) if c > 0),
+        }
+
+
+def _key(name: str, label: Optional[str]) -> str:
+    return name if label is None else f"{name}[{label}]"
+
+
+def record(name: str, seconds: float, label: Optional[str] = None):
+    """
+    Adds a duration to the histogram of span `name` (or `name[label]`).
+    """
+    if not enabled:
+        return
+    key = _key(name, label)
+    with __lock:
+        histogram = __histograms.get(key)
+        if histogram is None:
+            histogram = __histograms[key] = Histogram()
+        histogram.add(seconds)
+
+
+class Span:
+    __slots__ = ("name", "label", "start")
+
+    def __init__(self, name: str, label: Optional[str]):
+        self.name = name
+        self.label = label
+
+    def __enter__(self) -> Self:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_exception):
+        # failed calls are timed as well
+        record(self.name, time.perf_counter() - self.start, self.label)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exception):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str, label: Optional[str] = None) -> Span | NullSpan:
+    """
+    Returns a context manager that times its body as span `name`, e.g., with the instrument
+    name as `label`.
+    """
+    if not enabled:
+        return NULL_SPAN
+    return Span(name, label)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorates a function to time every call as span `name`.
+    """
+    def decorate(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return timed_function
+    return decorate
+
+
+def count(name: str, amount: float = 1, label: Optional[str] = None):
+    """
+    Adds `amount` to counter `name` (or `name[label]`).
+    """
+    if not enabled:
+        return
+    key = _key(name, label)
+    with __lock:
+        __counters[key] = __counters.get(key, 0) + amount
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with __lock:
+        __histograms.clear()
+        __counters.clear()
+
+
+def summary() -> dict:
+    """
+    Returns every span with its count, total, mean, minimum, maximum, estimated percentiles
+    and histogram, and every counter.
+    """
+    with __lock:
+        return {
+            "spans": dict((key, h.to_dict()) for key, h in sorted(__histograms.items())),
+            "counters": dict(sorted(__counters.items())),
+        }
+
+
+def to_json() -> str:
+    return json.dumps(summary(), indent=2, sort_keys=True)
+
+
+def to_csv() -> str:
+    """
+    Returns one row per span and counter (counters only fill the `count` column).
+    """
+    s = summary()
+    output = io.StringIO()
+    writer = csv.DictWriter(output, CSV_FIELDS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for key, values in s["spans"].items():
+        writer.writerow({**values, "name": key, "kind": "span"})
+    for key, value in s["counters"].items():
+        writer.writerow({"name": key, "kind": "counter", "count": value})
+    return output.getvalue()
+
+
+def export(path: str) -> str:
+    """
+    Writes the metrics to `path`, as CSV if it ends with `.csv` and as JSON otherwise.
+    """
+    with open(path, "w") as file:
+        file.write(to_csv() if path.endswith(".csv") else to_json())
+    return path
+
+
+if os.environ.get(ENVIRONMENT_VARIABLE):
+    enable()
+    # worker processes (e.g., of `lib.render`) inherit the variable but must not overwrite the file
+    if multiprocessing.parent_process() is None:
+        atexit.register(export, os.environ[ENVIRONMENT_VARIABLE])
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+import csv
+import io
+import json
+import time
+from lib import metrics
+from lib.dataset import Coordinates, Dataset, Instrument, Value, ValueType
+
+test_type = ValueType("test_type", "imaginary test unit", 100, 0)
+INS = Instrument("Test Instrument", {}, [test_type], lambda v: {"k": Value(test_type.name, v)})
+DS = Dataset("Metrics Test Dataset").add_instrument(INS)
+
+# disabled: nothing is recorded
+INS.take_measurement(Coordinates(0, 0, 0), None, 1)
+with metrics.span("test"):
+    pass
+metrics.count("test")
+assert metrics.summary() == {"spans": {}, "counters": {}}
+
+metrics.enable()
+for v in range(10):
+    INS.take_measurement(Coordinates(v, 0, 0), None, v)
+INS.take_measurement(Coordinates(0, 0, 0), None)  # fails
+INS.measurements_as_table(["k"])
+DS.save("metrics-test-dataset.json")
+Dataset.load("metrics-test-dataset.json")
+with metrics.span("test", "label"):
+    time.sleep(0.01)
+metrics.count("test", 2)
+metrics.count("test", 3)
+
+s = metrics.summary()
+print(json.dumps(s["counters"]), list(s["spans"]))
+assert s["spans"]["instrument.take_measurement[Test Instrument]"]["count"] == 11
+assert s["spans"]["instrument.measure[Test Instrument]"]["count"] == 11
+assert s["counters"] == {"instrument.failures[Test Instrument]": 1, "test": 5}
+for name in ("instrument.table", "dataset.save", "dataset.load"):
+    assert s["spans"][name]["count"] == 1, name
+span = s["spans"]["test[label]"]
+assert 0.01 <= span["min_s"] == span["max_s"] == span["p50_s"] == span["p99_s"] < 0.1
+assert sum(span["histogram"].values()) == 1
+
+rows = list(csv.DictReader(io.StringIO(metrics.to_csv())))
+assert {"name": "test", "kind": "counter", "count": "5"}.items() <= rows[-1].items()
+assert json.loads(metrics.to_json()) == json.loads(json.dumps(s))
+
+metrics.reset()
+assert metrics.summary() == {"spans": {}, "counters": {}}
+
+# overhead of a timed function while disabled
+metrics.disable()
+plain = lambda: None
+timed = metrics.timed("overhead")(plain)
+for f in (plain, timed):
+    start = time.perf_counter()
+    for _ in range(1000000):
+        f()
+    print(f"{(time.perf_counter() - start) * 1000:.0f} ns per call")
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+"""
+# Batch Rendering
+
+Renders many tables to image files without opening a window. Every (table, projection) pair is
+drawn onto its own `Figure` (which needs no GUI backend) in a pool of worker processes, so
+rendering scales with the number of CPU cores.
+
+```python
+from lib.dataset import Dataset
+from lib.render import field_filters, render_instrument
+
+instrument = Dataset.load("recording.json").get_instrument("WiFi")
+# one table per access point, each rendered as a top down and a side view
+render_instrument(instrument, "report", field_filters(instrument, "MAC"), projections=["z", "y"])
+```
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import *
+import os
+import re
+from matplotlib.figure import Figure
+from lib import metrics
+from lib.dataset import Instrument, MergedMeasurementTable, MergeFunction
+from lib.visualize import draw_plot_2d, draw_plot_3d
+
+
+# "3d" or the axis flattened for a 2D plot
+PROJECTIONS = ("3d", "x", "y", "z")
+DEFAULT_PROJECTIONS = ("x", "y", "z")
+FORMATS = ("png", "svg")
+DEFAULT_DPI = 150
+
+
+@dataclass
+class RenderJob:
+    label: str
+    table: MergedMeasurementTable
+    projection: str
+    path: str
+    dpi: int = DEFAULT_DPI
+
+
+def file_name(label: str, projection: str, format: str) -> str:
+    """
+    Returns a file name for the rendering of the table `label` in `projection`.
+    """
+    safe_label = re.sub(r"[^A-Za-z0-9._-]+", "_", label).strip("_") or "table"
+    return f"{safe_label}_{projection}.{format}"
+
+
+@metrics.timed("render.render")
+def render(job: RenderJob) -> str:
+    """
+    Renders one job to its file and returns the path.
+    """
+    fig = Figure(figsize=(10, 8))
+    if job.projection == "3d":
+        draw_plot_3d(fig, job.table, job.label)
+    else:
+        draw_plot_2d(fig, job.table, job.projection, job.label)
+    fig.savefig(job.path, dpi=job.dpi)
+    return job.path
+
+
+def field_filters(instrument: Instrument, field: str) -> Dict[str, str]:
+    """
+    Returns a filter expression for every distinct value of `field` in the value keys of
+    `instrument`, e.g., one per access point for `field_filters(wifi, "MAC")` with keys like
+    `SSID:My Network;MAC:ab:12:34:56:78:cd;...`.
+    """
+    filters = {}
+    pattern = re.compile(f"(?:^|;){re.escape(field)}:([^;]*)")
+    for key in instrument.store.keys:
+        match = pattern.search(key)
+        if match is not None:
+            value = match.group(1)
+            filters[value] = f"(^|;){re.escape(field)}:{re.escape(value)}(;|$)"
+    return dict(sorted(filters.items()))
+
+
+def render_tables(
+    tables: Dict[str, MergedMeasurementTable],
+    directory: str,
+    projections: Sequence[str] = DEFAULT_PROJECTIONS,
+    formats: Sequence[str] = ("png",),
+    workers: Optional[int] = None,
+    dpi: int = DEFAULT_DPI
+) -> List[str]:
+    """
+    Renders every table (named by its label) in every projection and format to `directory`,
+    using `workers` processes (all CPU cores by default, none for `workers=0`). Returns the
+    paths of the written files. Tables without rows are skipped.
+    """
+    for projection in projections:
+        if projection not in PROJECTIONS:
+            raise Exception(f"ERROR: Unknown projection \"{projection}\". Use one of {PROJECTIONS}.")
+    for format in formats:
+        if format not in FORMATS:
+            raise Exception(f"ERROR: Unknown format \"{format}\". Use one of {FORMATS}.")
+    os.makedirs(directory, exist_ok=True)
+    jobs = [RenderJob(label, table, projection, os.path.join(directory, file_name(label, projection, format)), dpi)
+            for label, table in tables.items() if len(table.rows) > 0
+            for projection in projections
+            for format in formats]
+    if workers == 0:
+        return [render(job) for job in jobs]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(render, jobs))
+
+
+def render_instrument(
+    instrument: Instrument,
+    directory: str,
+    filters: Dict[str, str | List[str]],
+    merger=MergeFunction.max,
+    **render_options
+) -> List[str]:
+    """
+    Builds one table per filter (a filter expression or a list of them, named by its label) and
+    renders them with `render_tables`. Filters that match no values are skipped. To render one
+    table per SSID, MAC, etc., pass `instrument.measurements_as_tables_by(field)` to
+    `render_tables` instead.
+    """
+    queries = [([fe] if isinstance(fe, str) else fe, merger) for fe in filters.values()]
+    tables = dict((label, table) for label, table in zip(filters, instrument.measurements_as_tables(queries))
+                  if table is not None)
+    return render_tables(tables, directory, **render_options)
@@ -0,0 +1,32 @@
+#!/usr/bin/python3
+import os
+import tempfile
+from lib.dataset import Instrument, Value, generate_random_dataset
+from lib.instruments.wifi import RSSI
+from lib.render import field_filters, file_name, render_instrument
+
+# keys like those of the WiFi instrument
+wifi = Instrument("WiFi", {}, [RSSI], None)
+for n in range(300):
+    wifi.append_measurement_dict({
+        "id": str(n), "note": None, "coordinates": {"x": n % 17, "y": n % 13, "z": n % 3},
+        "values": {
+            f"SSID:Net {n % 2};MAC:ab:cd:00:00:00:0{n % 4};CHANNEL:{1 + n % 4}": Value(RSSI.name, -40 - n % 50).to_dict()
+        }})
+filters = field_filters(wifi, "MAC")
+print(filters)
+assert len(filters) == 4
+assert len(field_filters(wifi, "SSID")) == 2
+assert file_name("Net 1/5GHz", "z", "png") == "Net_1_5GHz_z.png"
+
+with tempfile.TemporaryDirectory() as directory:
+    paths = render_instrument(wifi, directory, {**filters, "missing": "SSID:nothing"},
+                              projections=["z", "3d"], formats=["png", "svg"])
+    print(sorted(os.listdir(directory)))
+    assert len(paths) == 4 * 2 * 2
+    assert all(os.path.getsize(path) > 0 for path in paths)
+
+    # rendering in this process gives the same files
+    random_data = generate_random_dataset(1000, 2).get_instrument("random_data")
+    paths = render_instrument(random_data, directory, {"e0": "e0", "e1": "e1"}, workers=0)
+    assert len(paths) == 2 * 3
@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+"""
+# Concurrent Sampling
+
+A `Sampler` measures with all instruments of a dataset at once: every instrument's measure
+function runs on its own thread, so a sample takes as long as the slowest instrument instead of
+the sum of all of them.
+
+All measurements of a sample share one id, a version 1 UUID that encodes the time the sample was
+triggered (see `sample_time`), so they can be matched up across instruments after saving.
+
+```python
+with Sampler(dataset) as sampler:
+    sample = sampler.sample(Coordinates(0, 0, 0))
+    print(sample.latencies)  # seconds per instrument
+```
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import *
+import datetime
+import random
+import time
+import uuid
+from lib import metrics
+from lib.dataset import Coordinates, Dataset, Measurement
+
+# 100 ns intervals between the start of the Gregorian calendar (used by UUIDs) and the Unix epoch
+UUID_EPOCH_OFFSET = 0x01b21dd213814000
+
+
+@dataclass
+class Sample:
+    id: str  # shared by the measurements of all instruments
+    time: float  # seconds since the epoch, when the sample was triggered
+    coordinates: Coordinates
+    measurements: Dict[str, Measurement]  # by instrument name; failed instruments are missing
+    latencies: Dict[str, float]  # seconds per instrument, including failed ones
+    errors: Dict[str, Exception]
+
+
+def new_sample_id() -> str:
+    """
+    Returns a new version 1 UUID. A random node id is used instead of the MAC address of this
+    machine.
+    """
+    return str(uuid.uuid1(random.getrandbits(48) | (1 << 40)))
+
+
+def sample_time(id: str) -> datetime.datetime:
+    """
+    Returns the time a sample was triggered, given the id of any of its measurements.
+    """
+    seconds = (uuid.UUID(id).time - UUID_EPOCH_OFFSET) / 1e7
+    return datetime.datetime.fromtimestamp(seconds)
+
+
+def _timed(function: Callable, args: Sequence) -> Tuple[Any, Optional[Exception], float]:
+    start = time.perf_counter()
+    try:
+        return function(*args), None, time.perf_counter() - start
+    except Exception as e:
+        return None, e, time.perf_counter() - start
+
+
+class Sampler:
+    def __init__(self, dataset: Dataset, instrument_names: Optional[Iterable[str]] = None, workers: Optional[int] = None):
+        """
+        Samples the instruments `instrument_names` (all instruments of `dataset` by default) with
+        up to `workers` threads (one per instrument by default).
+        """
+        self.dataset = dataset
+        self.instrument_names = list(instrument_names) if instrument_names is not None \
+            else list(dataset.instruments)
+        self.pool = ThreadPoolExecutor(
+            workers or max(1, len(self.instrument_names)), thread_name_prefix="Sampler")
+        self.samples: List[Sample] = []
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exception):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+
+    def sample(self, coordinates: Coordinates, note: str = None, instrument_args: Dict[str, Sequence] = {}) -> Sample:
+        """
+        Measures with all instruments concurrently and appends the measurements (which share
+        `coordinates`, `note` and one id) to their instruments. `instrument_args` holds the
+        arguments of the measure functions by instrument name. Instruments that fail are
+        reported in the `errors` of the sample.
+        """
+        id = new_sample_id()
+        instruments = [self.dataset.get_instrument(name) for name in self.instrument_names]
+        futures = [self.pool.submit(_timed, instrument.do_measure_function, instrument_args.get(instrument.name, ()))
+                   for instrument in instruments]
+        sample = Sample(id, sample_time(id).timestamp(), coordinates, {}, {}, {})
+        # measurements are appended on this thread, since instruments share the dataset's journal
+        for instrument, future in zip(instruments, futures):
+            values, error, latency = future.result()
+            sample.latencies[instrument.name] = latency
+            metrics.record("instrument.measure", latency, instrument.name)
+            if error is not None:
+                sample.errors[instrument.name] = error
+                continue
+            sample.measurements[instrument.name] = instrument.append_measurement(
+                Measurement(id, Coordinates(coordinates.x, coordinates.y, coordinates.z), values, note))
+        self.samples.append(sample)
+        return sample
+
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the mean and maximum latency in seconds and the number of failures of every
+        instrument over all samples taken so far.
+        """
+        summary = {}
+        for name in self.instrument_names:
+            latencies = [s.latencies[name] for s in self.samples if name in s.latencies]
+            summary[name] = {
+                "mean": sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+                "max": max(latencies, default=None),
+                "failures": sum(1 for s in self.samples if name in s.errors),
+            }
+        return summary
@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+import time
+from lib.dataset import Coordinates, Dataset, Instrument, Value, ValueType
+from lib.sampler import Sampler, sample_time
+
+test_type = ValueType("test_type", "imaginary test unit", 100, 0)
+
+
+def slow_instrument(name: str, seconds: float) -> Instrument:
+    def measure(*_args):
+        time.sleep(seconds)
+        return {f"{name}_value": Value(test_type, seconds)}
+    return Instrument(name, {}, [test_type], measure)
+
+
+def failing_measure():
+    raise Exception("sensor unplugged")
+
+
+DS = Dataset("Sampling Test").add_instrument(slow_instrument("a", 0.3)).add_instrument(
+    slow_instrument("b", 0.2)).add_instrument(Instrument("c", {}, [test_type], failing_measure))
+
+with Sampler(DS) as sampler:
+    start = time.time()
+    for x in range(3):
+        sample = sampler.sample(Coordinates(x, 0, 0), "walk")
+    elapsed = time.time() - start
+    print(f"3 samples in {elapsed:.2f}s", sampler.latency_summary())
+    # the slowest instrument's time per sample, not the sum
+    assert elapsed < 3 * 0.3 + 0.3
+
+a, b = DS.get_instrument("a"), DS.get_instrument("b")
+assert len(a.measurements) == len(b.measurements) == 3
+assert len(DS.get_instrument("c").measurements) == 0
+assert a.measurements[-1].id == b.measurements[-1].id == sample.id
+assert a.measurements[-1].coordinates == b.measurements[-1].coordinates == Coordinates(2, 0, 0)
+assert "c" in sample.errors and sample.latencies["c"] < 0.1
+assert abs(sample_time(sample.id).timestamp() - sample.time) < 1e-6
+print(sample_time(sample.id))
@@ -0,0 +1,300 @@
+#!/usr/bin/python3
+"""
+# Spatial Indexing
+
+`KDTree` answers k-nearest, radius and bounding box queries over a fixed set of points.
+`SpatialIndex` keeps a `KDTree` over the coordinates of a `MeasurementStore` up to date: new
+measurements are searched by brute force until enough of them have accumulated to rebuild the
+tree, and changing coordinates in place triggers a rebuild on the next query.
+"""
+
+from typing import *
+import heapq
+import numpy as np
+from lib.store import MeasurementStore
+
+
+DEFAULT_LEAF_SIZE = 32
+# rebuild once the unindexed tail outgrows this fraction of the tree (or `MIN_REBUILD_TAIL`)
+DEFAULT_REBUILD_FRACTION = 0.1
+MIN_REBUILD_TAIL = 1024
+
+
+def _box_min_d2(lo: Sequence[float], hi: Sequence[float], p: Sequence[float]) -> float:
+    d2 = 0.0
+    for l, h, c in zip(lo, hi, p):
+        if c < l:
+            d2 += (l - c) ** 2
+        elif c > h:
+            d2 += (c - h) ** 2
+    return d2
+
+
+def _box_max_d2(lo: Sequence[float], hi: Sequence[float], p: Sequence[float]) -> float:
+    return sum(max(c - l, h - c) ** 2 for l, h, c in zip(lo, hi, p))
+
+
+def _merge_nearest(distances: np.ndarray, indices: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(distances) > k:
+        keep = np.argpartition(distances, k - 1)[:k]
+        distances, indices = distances[keep], indices[keep]
+    return distances, indices
+
+
+class KDTree:
+    def __init__(self, points: np.ndarray, leaf_size: int = DEFAULT_LEAF_SIZE):
+        """
+        Builds a tree over `points` of shape (count, dimensions). Each leaf holds up to
+        `leaf_size` points; inner nodes split their points at the median of their widest axis.
+        """
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        self.dimensions = points.shape[1]
+        order = np.arange(len(points))
+        lows, highs, starts, stops, lefts, rights = [], [], [], [], [], []
+
+        def add_node(start, stop):
+            for column in (lows, highs, lefts, rights):
+                column.append(None)
+            starts.append(start)
+            stops.append(stop)
+            return len(starts) - 1
+
+        stack = [add_node(0, len(points))] if len(points) > 0 else []
+        while stack:
+            node = stack.pop()
+            start, stop = starts[node], stops[node]
+            node_points = points[order[start:stop]]
+            low, high = node_points.min(axis=0), node_points.max(axis=0)
+            lows[node], highs[node] = tuple(low.tolist()), tuple(high.tolist())
+            lefts[node] = rights[node] = -1
+            axis = int(np.argmax(high - low))
+            if stop - start <= leaf_size or high[axis] == low[axis]:
+                continue
+            middle = (start + stop) // 2
+            partition = np.argpartition(
+                node_points[:, axis], middle - start)
+            order[start:stop] = order[start:stop][partition]
+            lefts[node] = add_node(start, middle)
+            rights[node] = add_node(middle, stop)
+            stack.extend((lefts[node], rights[node]))
+
+        self.order = order
+        self.points = points[order]  # leaves are contiguous slices of this array
+        self.lows, self.highs = lows, highs
+        self.starts, self.stops = starts, stops
+        self.lefts, self.rights = lefts, rights
+        self.low_array = np.array(lows, dtype=np.float64).reshape(-1, self.dimensions)
+        self.high_array = np.array(highs, dtype=np.float64).reshape(-1, self.dimensions)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the distances to and indices of the `k` points closest to `point`, closest first.
+        """
+        p = tuple(float(c) for c in point)
+        p_array = np.array(p)
+        distances, indices = np.empty(0), np.empty(0, dtype=np.int64)
+        worst = np.inf
+        heap = [(0.0, 0)] if len(self) > 0 else []
+        while heap:
+            d2, node = heapq.heappop(heap)
+            if d2 > worst:
+                break
+            if self.lefts[node] < 0:
+                start, stop = self.starts[node], self.stops[node]
+                leaf_d2 = ((self.points[start:stop] - p_array) ** 2).sum(axis=1)
+                distances, indices = _merge_nearest(
+                    np.concatenate([distances, leaf_d2]),
+                    np.concatenate([indices, np.arange(start, stop)]), k)
+                if len(distances) == k:
+                    worst = distances.max()
+                continue
+            for child in (self.lefts[node], self.rights[node]):
+                child_d2 = _box_min_d2(self.lows[child], self.highs[child], p)
+                if child_d2 <= worst:
+                    heapq.heappush(heap, (child_d2, child))
+        by_distance = np.argsort(distances, kind="stable")
+        return np.sqrt(distances[by_distance]), self.order[indices[by_distance]]
+
+    def nearest_many(self, points: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Like `nearest` for every row of `points` at once: returns the distances and indices, both of
+        shape (len(points), k), closest first. Every node is visited once by all the queries that
+        need it, so the work is vectorized over the queries instead of looping over them.
+        """
+        points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, self.dimensions)
+        k = min(k, len(self))
+        best_d2 = np.full((len(points), k), np.inf)
+        best = np.zeros((len(points), k), dtype=np.int64)
+        if len(points) == 0 or k == 0:
+            return np.sqrt(best_d2), best
+
+        # 1. every query descends to the nearest leaf (or node with at least k points) and takes its
+        #    k nearest there, which bounds the distance of the true k-th nearest
+        first = np.zeros(len(points), dtype=np.int64)
+        stack = [(0, np.arange(len(points)))]
+        while stack:
+            node, queries = stack.pop()
+            left, right = self.lefts[node], self.rights[node]
+            if left < 0 or min(self.stops[left] - self.starts[left], self.stops[right] - self.starts[right]) < k:
+                first[queries] = node
+                self.__merge_many(node, points, queries, best_d2, best)
+                continue
+            left_first = self.__box_min_d2_many(left, points[queries]) \
+                <= self.__box_min_d2_many(right, points[queries])
+            stack.extend(((left, queries[left_first]), (right, queries[~left_first])))
+
+        # 2. visit the remaining leaves that may hold something closer than the bound
+        starts, stops = np.array(self.starts), np.array(self.stops)
+        stack = [(0, np.arange(len(points)))]
+        while stack:
+            node, queries = stack.pop()
+            start, stop = self.starts[node], self.stops[node]
+            queries = queries[(self.__box_min_d2_many(node, points[queries]) <= best_d2[queries].max(axis=1))
+                              & ~((starts[first[queries]] <= start) & (stop <= stops[first[queries]]))]
+            if len(queries) == 0:
+                continue
+            if self.lefts[node] < 0:
+                self.__merge_many(node, points, queries, best_d2, best)
+            else:
+                stack.extend(((self.lefts[node], queries), (self.rights[node], queries)))
+        by_distance = np.argsort(best_d2, axis=1, kind="stable")
+        distances = np.sqrt(np.take_along_axis(best_d2, by_distance, axis=1))
+        return distances, self.order[np.take_along_axis(best, by_distance, axis=1)]
+
+    def __box_min_d2_many(self, node: int, targets: np.ndarray) -> np.ndarray:
+        below = np.maximum(self.low_array[node] - targets, 0)
+        above = np.maximum(targets - self.high_array[node], 0)
+        return (below ** 2 + above ** 2).sum(axis=1)
+
+    def __merge_many(self, node: int, points: np.ndarray, queries: np.ndarray, best_d2: np.ndarray, best: np.ndarray):
+        """
+        Merges the points of `node` into the k nearest found so far of every query in `queries`.
+        """
+        start, stop = self.starts[node], self.stops[node]
+        node_d2 = ((points[queries, None, :] - self.points[None, start:stop, :]) ** 2).sum(axis=2)
+        d2 = np.concatenate([best_d2[queries], node_d2], axis=1)
+        indices = np.concatenate([best[queries], np.broadcast_to(np.arange(start, stop), node_d2.shape)], axis=1)
+        k = best_d2.shape[1]
+        keep = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        best_d2[queries] = np.take_along_axis(d2, keep, axis=1)
+        best[queries] = np.take_along_axis(indices, keep, axis=1)
+
+    def within_radius(self, point: Sequence[float], radius: float) -> np.ndarray:
+        """
+        Returns the sorted indices of all points at most `radius` away from `point`.
+        """
+        p = tuple(float(c) for c in point)
+        p_array = np.array(p)
+        r2 = radius ** 2
+        found = []
+        stack = [0] if len(self) > 0 else []
+        while stack:
+            node = stack.pop()
+            low, high = self.lows[node], self.highs[node]
+            if _box_min_d2(low, high, p) > r2:
+                continue
+            start, stop = self.starts[node], self.stops[node]
+            if _box_max_d2(low, high, p) <= r2:
+                found.append(np.arange(start, stop))
+            elif self.lefts[node] < 0:
+                d2 = ((self.points[start:stop] - p_array) ** 2).sum(axis=1)
+                found.append(start + np.flatnonzero(d2 <= r2))
+            else:
+                stack.extend((self.lefts[node], self.rights[node]))
+        return self.__original_indices(found)
+
+    def within_box(self, low: Sequence[float], high: Sequence[float]) -> np.ndarray:
+        """
+        Returns the sorted indices of all points inside the axis-aligned box from `low` to `high`.
+        """
+        low, high = tuple(map(float, low)), tuple(map(float, high))
+        low_array, high_array = np.array(low), np.array(high)
+        found = []
+        stack = [0] if len(self) > 0 else []
+        while stack:
+            node = stack.pop()
+            node_low, node_high = self.lows[node], self.highs[node]
+            if any(nh < l or nl > h for nl, nh, l, h in zip(node_low, node_high, low, high)):
+                continue
+            start, stop = self.starts[node], self.stops[node]
+            if all(l <= nl and nh <= h for nl, nh, l, h in zip(node_low, node_high, low, high)):
+                found.append(np.arange(start, stop))
+            elif self.lefts[node] < 0:
+                points = self.points[start:stop]
+                inside = ((points >= low_array) & (points <= high_array)).all(axis=1)
+                found.append(start + np.flatnonzero(inside))
+            else:
+                stack.extend((self.lefts[node], self.rights[node]))
+        return self.__original_indices(found)
+
+    def __original_indices(self, found: List[np.ndarray]) -> np.ndarray:
+        if len(found) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(self.order[np.concatenate(found)])
+
+
+class SpatialIndex:
+    """
+    A spatial index over the (x, y, z) coordinates of the measurements in a `MeasurementStore`.
+    All queries return measurement indices.
+    """
+
+    def __init__(self, store: MeasurementStore, leaf_size: int = DEFAULT_LEAF_SIZE, rebuild_fraction: float = DEFAULT_REBUILD_FRACTION):
+        self.store = store
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.tree: Optional[KDTree] = None
+        self.version = None
+
+    def __points(self, start: int, stop: int) -> np.ndarray:
+        return np.stack([self.store.x.array[start:stop], self.store.y.array[start:stop],
+                         self.store.z.array[start:stop]], axis=1)
+
+    def __sync(self) -> np.ndarray:
+        """
+        Rebuilds the tree if needed and returns the points that are not in it yet.
+        """
+        count = len(self.store)
+        indexed = len(self.tree) if self.tree is not None else 0
+        if self.tree is None or self.version != self.store.version \
+                or count - indexed > max(MIN_REBUILD_TAIL, self.rebuild_fraction * indexed):
+            self.tree = KDTree(self.__points(0, count), self.leaf_size)
+            self.version = self.store.version
+            indexed = count
+        return self.__points(indexed, count)
+
+    def nearest(self, point: Sequence[float], k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the distances to and indices of the `k` measurements closest to `point`.
+        """
+        tail = self.__sync()
+        distances, indices = self.tree.nearest(point, k)
+        if len(tail) > 0:
+            tail_d2 = ((tail - np.asarray(point, dtype=np.float64)) ** 2).sum(axis=1)
+            d2, indices = _merge_nearest(
+                np.concatenate([distances ** 2, tail_d2]),
+                np.concatenate([indices, len(self.tree) + np.arange(len(tail))]), k)
+            by_distance = np.argsort(d2, kind="stable")
+            distances, indices = np.sqrt(d2[by_distance]), indices[by_distance]
+        return distances, indices
+
+    def within_radius(self, point: Sequence[float], radius: float) -> np.ndarray:
+        """
+        Returns the sorted indices of all measurements at most `radius` away from `point`.
+        """
+        tail = self.__sync()
+        tail_d2 = ((tail - np.asarray(point, dtype=np.float64)) ** 2).sum(axis=1)
+        return np.concatenate([self.tree.within_radius(point, radius),
+                               len(self.tree) + np.flatnonzero(tail_d2 <= radius ** 2)])
+
+    def within_box(self, low: Sequence[float], high: Sequence[float]) -> np.ndarray:
+        """
+        Returns the sorted indices of all measurements inside the box from `low` to `high`.
+        """
+        tail = self.__sync()
+        inside = ((tail >= np.asarray(low)) & (tail <= np.asarray(high))).all(axis=1)
+        return np.concatenate([self.tree.within_box(low, high),
+                               len(self.tree) + np.flatnonzero(inside)])
@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+import numpy as np
+from lib.spatial import KDTree, SpatialIndex
+from lib.store import MeasurementStore
+
+rng = np.random.default_rng(0)
+points = rng.random((20000, 3)) * 100
+tree = KDTree(points)
+query = np.array([50.0, 50.0, 50.0])
+brute_force = np.sqrt(((points - query) ** 2).sum(axis=1))
+
+distances, indices = tree.nearest(query, 10)
+assert np.allclose(distances, np.sort(brute_force)[:10])
+assert np.array_equal(tree.within_radius(query, 5), np.flatnonzero(brute_force <= 5))
+inside = ((points >= 40) & (points <= 45)).all(axis=1)
+assert np.array_equal(tree.within_box((40, 40, 40), (45, 45, 45)), np.flatnonzero(inside))
+
+# the index follows appends and in-place coordinate changes
+store = MeasurementStore()
+for i, (x, y, z) in enumerate(points[:2000].tolist()):
+    store.append(str(i), x, y, z, [], None)
+index = SpatialIndex(store)
+print(index.nearest(query, 3))
+store.append("new", 50, 50, 50, [], None)
+assert index.nearest(query)[1][0] == 2000
+store.set_coordinate(2000, "x", 0.0)
+assert index.nearest(query)[1][0] != 2000
+assert 2000 in index.within_box((-1, 49, 49), (1, 51, 51))
+
+# batched queries match one query at a time
+queries = rng.random((500, 3)) * 110 - 5
+distances, indices = tree.nearest_many(queries, 4)
+for query, d, i in zip(queries, distances, indices):
+    expected = tree.nearest(query, 4)
+    assert np.allclose(d, expected[0]) and set(i) == set(expected[1])
+assert tree.nearest_many(queries[:3], 50000)[0].shape == (3, 20000)
@@ -0,0 +1,762 @@
+#!/usr/bin/python3
+"""
+# Columnar Measurement Storage
+
+Measurements are stored column by column instead of as one Python object per measurement:
+
+- `x`, `y`, `z`: one float64 per measurement,
+- `ids`: 16 bytes per measurement whose id is a UUID (see `UuidColumn`),
+- `notes`: one Python string (or `None`) per measurement,
+- `keys`, `type_names`: interned tables of every value key and value type name seen so far,
+- `entry_*`: one row per value in sparse (measurement index, key id, type id, value) form.
+
+Entries are always appended in measurement order, so `entry_measurement` is sorted and the values
+of a single measurement occupy one contiguous range of the entry columns.
+
+Integers are flagged (`coordinate_int_flags`, `entry_is_int`) so that values that were recorded as
+integers are handed back as integers and datasets survive a round trip without changes. Since
+they are stored as float64, only ints and floats (or numpy numbers) are accepted: integers beyond
++-2**53 (`MAX_EXACT_INT`), booleans, which would come back as 1.0 and 0.0, and anything else,
+e.g., `None` or strings, are rejected.
+"""
+
+from typing import *
+import os
+import re
+import numpy as np
+
+
+INITIAL_CAPACITY = 64
+
+X_IS_INT = 1
+Y_IS_INT = 2
+Z_IS_INT = 4
+AXIS_INT_FLAGS = {"x": X_IS_INT, "y": Y_IS_INT, "z": Z_IS_INT}
+# float64 holds every integer up to this magnitude exactly
+MAX_EXACT_INT = 2 ** 53
+
+
+def is_int(value: Any) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+
+def int_flag(value: Any) -> bool:
+    """
+    Returns whether `value` is an integer, raising if it is not a number that can be stored
+    exactly as float64.
+    """
+    # fast paths for the common cases, since this runs for every value appended
+    if type(value) is float:
+        return False
+    if type(value) is int and -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+        return True
+    if isinstance(value, (int, np.integer)):
+        if isinstance(value, bool):
+            raise Exception(f"ERROR: Cannot store the boolean {value} as a number. Convert it to an int first.")
+        if not -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+            raise Exception(f"ERROR: Cannot store {value} exactly. Integers must lie within +-2**53.")
+        return True
+    if isinstance(value, (float, np.floating)):
+        return False
+    if isinstance(value, np.bool_):
+        raise Exception(f"ERROR: Cannot store the boolean {value} as a number. Convert it to an int first.")
+    raise Exception(f"ERROR: Cannot store {value!r} as a number. Values and coordinates must be ints or floats.")
+
+
+def _check_exact(values: np.ndarray):
+    """
+    Like `int_flag` for a whole array.
+    """
+    values = np.asarray(values)
+    if values.dtype == np.bool_:
+        raise Exception("ERROR: Cannot store booleans as numbers. Convert them to ints first.")
+    if not np.issubdtype(values.dtype, np.integer) and not np.issubdtype(values.dtype, np.floating):
+        raise Exception(f"ERROR: Cannot store {values.dtype} arrays as numbers. Values and coordinates must be ints or floats.")
+    if np.issubdtype(values.dtype, np.integer) and values.size > 0 \
+            and (values.max() > MAX_EXACT_INT or values.min() < -MAX_EXACT_INT):
+        raise Exception("ERROR: Cannot store these integers exactly. Integers must lie within +-2**53.")
+
+
+def restore_int(value: float, was_int: bool) -> float | int:
+    return int(value) if was_int else value
+
+
+def segment_starts(groups: np.ndarray) -> np.ndarray:
+    """
+    Returns the indices at which a new run of equal values starts in the sorted array `groups`.
+    """
+    if len(groups) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+
+
+def reduce_groups(ufunc: np.ufunc, values: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    Reduces `values` with `ufunc` per group, where `groups` is the sorted group index of every
+    value. Groups without values are NaN.
+    """
+    result = np.full(group_count, np.nan)
+    starts = segment_starts(groups)
+    if len(starts) > 0:
+        result[groups[starts]] = ufunc.reduceat(values, starts)
+    return result
+
+
+def fold_groups(ufunc: np.ufunc, values: np.ndarray, groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    Like `reduce_groups`, but folds every group strictly from left to right, so that
+    floating point results are identical to a scalar `acc = ufunc(x, acc)` loop.
+    """
+    result = np.full(group_count, np.nan)
+    starts = segment_starts(groups)
+    if len(starts) == 0:
+        return result
+    sizes = np.diff(np.append(starts, len(values)))
+    # largest groups first, so the groups still being folded are always a prefix
+    order = np.argsort(-sizes, kind="stable")
+    starts, sizes = starts[order], sizes[order]
+    accumulators = values[starts].copy()
+    for offset in range(1, int(sizes[0])):
+        active = np.searchsorted(-sizes, -offset, side="left")
+        accumulators[:active] = ufunc(
+            values[starts[:active] + offset], accumulators[:active])
+    result[groups[starts]] = accumulators
+    return result
+
+
+def count_groups(groups: np.ndarray, group_count: int) -> np.ndarray:
+    """
+    Counts the values per group. Groups without values are NaN.
+    """
+    counts = np.bincount(groups, minlength=group_count).astype(np.float64)
+    counts[counts == 0] = np.nan
+    return counts
+
+
+def quantile_groups(values: np.ndarray, groups: np.ndarray, group_count: int, q: float) -> np.ndarray:
+    """
+    Computes the `q`-th quantile (0 <= q <= 1) of every group, interpolating linearly between
+    the closest ranks like `numpy.quantile` does. Groups without values are NaN.
+    """
+    result = np.full(group_count, np.nan)
+    starts = segment_starts(groups)
+    if len(starts) == 0:
+        return result
+    ordered = values[np.lexsort((values, groups))]
+    sizes = np.diff(np.append(starts, len(values)))
+    positions = (sizes - 1) * q
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    low_values = ordered[starts + lower]
+    high_values = ordered[starts + upper]
+    result[groups[starts]] = low_values + \
+        (high_values - low_values) * (positions - lower)
+    return result
+
+
+class Column:
+    """
+    A growable, contiguous numpy array with amortized O(1) appends.
+    """
+
+    def __init__(self, dtype: Any, data: Optional[np.ndarray] = None):
+        if data is None:
+            self._data = np.empty(INITIAL_CAPACITY, dtype=dtype)
+            self.length = 0
+        else:
+            self._data = data
+            self.length = len(data)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __reserve(self, additional: int):
+        needed = self.length + additional
+        if needed <= len(self._data) and self._data.flags.writeable:
+            return
+        capacity = max(INITIAL_CAPACITY, len(self._data))
+        while capacity < needed:
+            capacity *= 2
+        data = np.empty(capacity, dtype=self._data.dtype)
+        data[:self.length] = self._data[:self.length]
+        self._data = data
+
+    def append(self, value: Any):
+        self.__reserve(1)
+        self._data[self.length] = value
+        self.length += 1
+
+    def extend(self, values: np.ndarray):
+        values = np.asarray(values, dtype=self._data.dtype)
+        self.__reserve(len(values))
+        self._data[self.length:self.length + len(values)] = values
+        self.length += len(values)
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        A view of the used part of the column. The view is invalidated by the next append.
+        """
+        return self._data[:self.length]
+
+
+class PackedStrings(Sequence):
+    """
+    A read-mostly sequence of strings (or `None`s) packed into one UTF-8 byte array, e.g.,
+    memory-mapped from a file. Strings are decoded on access; the first change unpacks
+    all of them into a regular list.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, is_null: Optional[np.ndarray] = None):
+        self.blob = blob
+        self.offsets = offsets
+        self.is_null = is_null
+        self._list: Optional[List[Optional[str]]] = None
+
+    def pack(strings: Sequence[Optional[str]]) -> Self:
+        encoded = [b"" if s is None else s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        is_null = np.fromiter((s is None for s in strings),
+                              dtype=np.bool_, count=len(strings))
+        return PackedStrings(blob, offsets, is_null)
+
+    def __len__(self) -> int:
+        if self._list is not None:
+            return len(self._list)
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if self._list is not None:
+            return self._list[index]
+        if index < 0:
+            index += len(self)
+        if self.is_null is not None and self.is_null[index]:
+            return None
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __unpack(self) -> List[Optional[str]]:
+        if self._list is None:
+            self._list = [self[i] for i in range(len(self))]
+        return self._list
+
+    def __setitem__(self, index: int, value: Optional[str]):
+        self.__unpack()[index] = value
+
+    def append(self, value: Optional[str]):
+        self.__unpack().append(value)
+
+    def extend(self, values: Iterable[Optional[str]]):
+        self.__unpack().extend(values)
+
+
+StringColumn = List[Optional[str]] | PackedStrings
+
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# position of the two hex digits of every byte in a UUID string
+UUID_BYTE_POSITIONS = np.array([0, 2, 4, 6, 9, 11, 14, 16, 19, 21, 24, 26, 28, 30, 32, 34])
+UUID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+UUID_DTYPE = np.dtype("V16")
+UUID_CHUNK_SIZE = 65536
+
+
+def format_uuids(raw: np.ndarray) -> List[str]:
+    """
+    Formats the UUIDs in the rows of the uint8 array `raw` (n x 16) as canonical strings.
+    """
+    text = np.full((len(raw), 36), ord("-"), dtype=np.uint8)
+    text[:, UUID_BYTE_POSITIONS] = HEX_DIGITS[raw >> 4]
+    text[:, UUID_BYTE_POSITIONS + 1] = HEX_DIGITS[raw & 0x0f]
+    joined = text.tobytes().decode("ascii")
+    return [joined[i:i + 36] for i in range(0, len(joined), 36)]
+
+
+class UuidColumn(Sequence):
+    """
+    A sequence of ids that stores canonical (lower case) UUID strings as 16 bytes each instead of
+    as Python strings of about 90 bytes. Any other id (or `None`) is kept as it is in `others`, so
+    every id reads back exactly as it was stored.
+    """
+
+    def __init__(self):
+        self.bytes = Column(UUID_DTYPE)
+        self.others: Dict[int, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.bytes)
+
+    def __encode(self, index: int, id: Optional[str]) -> bytes:
+        if isinstance(id, str) and len(id) == 36 and UUID_PATTERN.fullmatch(id) is not None:
+            self.others.pop(index, None)
+            return bytes.fromhex(id.replace("-", ""))
+        self.others[index] = id
+        return bytes(16)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        if index < 0:
+            index += len(self)
+        if index in self.others:
+            return self.others[index]
+        h = self.bytes.array[index].tobytes().hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+    def __setitem__(self, index: int, id: Optional[str]):
+        if index < 0:
+            index += len(self)
+        self.bytes.array[index] = self.__encode(index, id)
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        for start in range(0, len(self), UUID_CHUNK_SIZE):
+            yield from self.strings(np.arange(start, min(start + UUID_CHUNK_SIZE, len(self))))
+
+    def append(self, id: Optional[str]):
+        self.bytes.append(self.__encode(len(self), id))
+
+    def extend(self, ids: Iterable[Optional[str]]):
+        for id in ids:
+            self.append(id)
+
+    def extend_from(self, other: Self, indices: np.ndarray):
+        """
+        Appends the ids of `other` at the sorted `indices`.
+        """
+        start = len(self)
+        self.bytes.extend(other.bytes.array[indices])
+        for index, id in other.others.items():
+            position = int(np.searchsorted(indices, index))
+            if position < len(indices) and indices[position] == index:
+                self.others[start + position] = id
+
+    def extend_bytes(self, raw: np.ndarray):
+        """
+        Appends the UUIDs in the rows of the uint8 array `raw` (n x 16).
+        """
+        self.bytes.extend(np.ascontiguousarray(raw, dtype=np.uint8).view(UUID_DTYPE).ravel())
+
+    def mask(self, ids: Iterable[Optional[str]]) -> np.ndarray:
+        """
+        Returns a boolean array that is `True` where the id is one of `ids`.
+        """
+        wanted = set(ids)
+        canonical = [bytes.fromhex(id.replace("-", "")) for id in wanted
+                     if isinstance(id, str) and UUID_PATTERN.fullmatch(id) is not None]
+        mask = np.isin(self.bytes.array.view("S16"), np.array(canonical, dtype="S16"))
+        for index, id in self.others.items():
+            mask[index] = id in wanted
+        return mask
+
+    def strings(self, indices: np.ndarray) -> List[Optional[str]]:
+        """
+        Returns the ids at `indices` as a Python list.
+        """
+        ids = format_uuids(self.bytes.array[indices].view(np.uint8).reshape(-1, 16))
+        if len(self.others) > 0:
+            for n, index in enumerate(indices.tolist()):
+                if index in self.others:
+                    ids[n] = self.others[index]
+        return ids
+
+# name and little-endian dtype of every numeric column in the columnar file format
+FILE_COLUMNS = {
+    "x": "<f8",
+    "y": "<f8",
+    "z": "<f8",
+    "coordinate_int_flags": "|u1",
+    "entry_measurement": "<i8",
+    "entry_key": "<i4",
+    "entry_type": "<i4",
+    "entry_value": "<f8",
+    "entry_is_int": "|b1",
+}
+
+
+def _map_array(directory: str, name: str, dtype: str, length: int, mmap: bool) -> np.ndarray:
+    path = os.path.join(directory, name + ".bin")
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    if mmap:
+        # copy-on-write: changes stay in memory and never touch the file
+        return np.memmap(path, dtype=dtype, mode="c", shape=(length,))
+    return np.fromfile(path, dtype=dtype, count=length)
+
+
+class MeasurementStore:
+    def __init__(self):
+        self.x = Column(np.float64)
+        self.y = Column(np.float64)
+        self.z = Column(np.float64)
+        self.coordinate_int_flags = Column(np.uint8)
+        self.ids: UuidColumn | StringColumn = UuidColumn()
+        self.notes: StringColumn = []
+
+        self.keys: List[str] = []
+        self.key_ids: Dict[str, int] = {}
+        self.type_names: List[str] = []
+        self.type_ids: Dict[str, int] = {}
+
+        self.entry_measurement = Column(np.int64)
+        self.entry_key = Column(np.int32)
+        self.entry_type = Column(np.int32)
+        self.entry_value = Column(np.float64)
+        self.entry_is_int = Column(np.bool_)
+
+        # incremented whenever stored data is changed in place (appends do not count)
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def entry_count(self) -> int:
+        return len(self.entry_value)
+
+    def intern_key(self, key: str) -> int:
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self.keys.append(key)
+            self.key_ids[key] = key_id
+        return key_id
+
+    def intern_type(self, type_name: str) -> int:
+        type_id = self.type_ids.get(type_name)
+        if type_id is None:
+            type_id = len(self.type_names)
+            self.type_names.append(type_name)
+            self.type_ids[type_name] = type_id
+        return type_id
+
+    def append(
+        self,
+        id: str,
+        x: float,
+        y: float,
+        z: float,
+        values: Iterable[Tuple[str, str, float]],
+        note: Optional[str]
+    ) -> int:
+        """
+        Appends one measurement, given its `values` as (key, type name, value) triples,
+        and returns its index.
+        """
+        index = len(self.ids)
+        coordinate_flags = (X_IS_INT if int_flag(x) else 0) \
+            | (Y_IS_INT if int_flag(y) else 0) \
+            | (Z_IS_INT if int_flag(z) else 0)
+        entry_count = len(self.entry_measurement)
+        try:
+            for key, type_name, value in values:
+                value_is_int = int_flag(value)
+                self.entry_measurement.append(index)
+                self.entry_key.append(self.intern_key(key))
+                self.entry_type.append(self.intern_type(type_name))
+                self.entry_value.append(value)
+                self.entry_is_int.append(value_is_int)
+        except BaseException:
+            # drop the entries appended so far, so the store stays consistent
+            for column in (self.entry_measurement, self.entry_key, self.entry_type, self.entry_value, self.entry_is_int):
+                column.length = entry_count
+            raise
+        self.x.append(x)
+        self.y.append(y)
+        self.z.append(z)
+        self.coordinate_int_flags.append(coordinate_flags)
+        self.ids.append(id)
+        self.notes.append(note)
+        return index
+
+    def save_columns(self, directory: str) -> dict:
+        """
+        Writes every column to a raw little-endian `.bin` file in `directory` and returns the
+        header needed to map them again with `load_columns`.
+        """
+        return save_columns_of_stores(directory, [self])
+
+    def load_columns(directory: str, header: dict, mmap: bool = True) -> Self:
+        """
+        Opens the columns written by `save_columns`. With `mmap`, the files are memory-mapped
+        (copy-on-write), so opening takes the same time regardless of their size.
+        """
+        store = MeasurementStore()
+        count, entry_count = header["count"], header["entry_count"]
+        for name, dtype in FILE_COLUMNS.items():
+            length = count if name in (
+                "x", "y", "z", "coordinate_int_flags") else entry_count
+            setattr(store, name, Column(dtype, _map_array(
+                directory, name, dtype, length, mmap)))
+        for name in ("ids", "notes"):
+            offsets = _map_array(directory, name + ".offsets",
+                                 "<i8", count + 1, mmap)
+            blob = _map_array(directory, name, "|u1",
+                              int(offsets[-1]) if count > 0 else 0, mmap)
+            is_null = _map_array(directory, name + ".is_null",
+                                 "|b1", count, mmap)
+            setattr(store, name, PackedStrings(blob, offsets, is_null))
+        for key in header["keys"]:
+            store.intern_key(key)
+        for type_name in header["type_names"]:
+            store.intern_type(type_name)
+        return store
+
+    def extend_dense(
+        self,
+        ids: Sequence[str] | np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        z: np.ndarray,
+        keys: Sequence[str],
+        type_names: Sequence[str],
+        values: np.ndarray,
+        notes: Optional[Sequence[Optional[str]]] = None
+    ):
+        """
+        Appends `len(ids)` measurements at once, where every measurement has a value for every
+        key: `values[measurement, key]` is of type `type_names[key]`. Integer arrays are stored
+        as integers. `ids` may also be UUIDs in binary form, as an n x 16 uint8 array.
+        """
+        count, key_count = values.shape
+        for array in (x, y, z, values):
+            _check_exact(array)
+        start = len(self)
+        key_ids = np.array([self.intern_key(key) for key in keys], dtype=np.int64)
+        type_ids = np.array([self.intern_type(name) for name in type_names], dtype=np.int64)
+        self.entry_measurement.extend(np.repeat(np.arange(start, start + count), key_count))
+        self.entry_key.extend(np.tile(key_ids, count))
+        self.entry_type.extend(np.tile(type_ids, count))
+        self.entry_value.extend(values.ravel())
+        self.entry_is_int.extend(np.full(count * key_count, np.issubdtype(values.dtype, np.integer)))
+        flags = 0
+        for axis, coordinates in (("x", x), ("y", y), ("z", z)):
+            getattr(self, axis).extend(coordinates)
+            if np.issubdtype(np.asarray(coordinates).dtype, np.integer):
+                flags |= AXIS_INT_FLAGS[axis]
+        self.coordinate_int_flags.extend(np.full(count, flags))
+        if isinstance(ids, np.ndarray) and isinstance(self.ids, UuidColumn):
+            self.ids.extend_bytes(ids)
+        else:
+            self.ids.extend(format_uuids(ids) if isinstance(ids, np.ndarray) else ids)
+        self.notes.extend(notes if notes is not None else [None] * count)
+
+    def extend_store(
+        self,
+        other: Self,
+        indices: Optional[np.ndarray] = None,
+        offset: Tuple[float, float, float] = (0, 0, 0)
+    ):
+        """
+        Appends the measurements of `other` at the sorted `indices` (all by default), with
+        `offset` added to their x, y and z coordinates. Integer coordinates stay integers if
+        the offset along their axis is an integer.
+        """
+        start = len(self)
+        selected = np.ones(len(other), dtype=np.bool_) if indices is None else np.zeros(len(other), dtype=np.bool_)
+        if indices is not None:
+            selected[indices] = True
+        new_index = np.cumsum(selected) - 1 + start
+        entries = selected[other.entry_measurement.array]
+        key_map = np.array([self.intern_key(key) for key in other.keys] + [0], dtype=np.int64)
+        type_map = np.array([self.intern_type(name) for name in other.type_names] + [0], dtype=np.int64)
+        self.entry_measurement.extend(new_index[other.entry_measurement.array[entries]])
+        self.entry_key.extend(key_map[other.entry_key.array[entries]])
+        self.entry_type.extend(type_map[other.entry_type.array[entries]])
+        self.entry_value.extend(other.entry_value.array[entries])
+        self.entry_is_int.extend(other.entry_is_int.array[entries])
+        flags = other.coordinate_int_flags.array[selected]
+        for (axis, flag), delta in zip(AXIS_INT_FLAGS.items(), offset):
+            getattr(self, axis).extend(getattr(other, axis).array[selected] + delta)
+            if not is_int(delta):
+                flags = flags & ~np.uint8(flag)
+        self.coordinate_int_flags.extend(flags)
+        if isinstance(self.ids, UuidColumn) and isinstance(other.ids, UuidColumn):
+            self.ids.extend_from(other.ids, np.flatnonzero(selected))
+        elif indices is None:
+            self.ids.extend(other.ids)
+        else:
+            self.ids.extend(other.ids[i] for i in np.flatnonzero(selected).tolist())
+        if indices is None:
+            self.notes.extend(other.notes)
+        else:
+            self.notes.extend(other.notes[i] for i in np.flatnonzero(selected).tolist())
+
+    def entry_range(self, index: int) -> Tuple[int, int]:
+        """
+        Returns the [start, stop) range of the entries belonging to the measurement at `index`.
+        """
+        start, stop = np.searchsorted(
+            self.entry_measurement.array, [index, index + 1])
+        return int(start), int(stop)
+
+    def values(self, index: int) -> List[Tuple[str, str, float]]:
+        """
+        Returns the values of the measurement at `index` as (key, type name, value) triples.
+        """
+        start, stop = self.entry_range(index)
+        keys = self.entry_key.array[start:stop].tolist()
+        types = self.entry_type.array[start:stop].tolist()
+        values = self.entry_value.array[start:stop].tolist()
+        ints = self.entry_is_int.array[start:stop].tolist()
+        return [(self.keys[k], self.type_names[t], restore_int(v, i))
+                for k, t, v, i in zip(keys, types, values, ints)]
+
+    def coordinate_lists(self, indices: np.ndarray) -> Tuple[List[float | int], List[float | int], List[float | int]]:
+        """
+        Returns the x, y and z coordinates of the measurements at `indices` as Python lists.
+        """
+        flags = self.coordinate_int_flags.array[indices]
+        lists = []
+        for axis, flag in AXIS_INT_FLAGS.items():
+            values = getattr(self, axis).array[indices]
+            was_int = (flags & flag) != 0
+            if not was_int.any():
+                lists.append(values.tolist())
+            elif was_int.all():
+                lists.append(values.astype(np.int64).tolist())
+            else:
+                mixed = values.astype(object)
+                mixed[was_int] = values[was_int].astype(np.int64).astype(object)
+                lists.append(mixed.tolist())
+        return tuple(lists)
+
+    def id_list(self, indices: np.ndarray) -> List[str]:
+        """
+        Returns the ids of the measurements at `indices` as a Python list.
+        """
+        ids = self.ids
+        if isinstance(ids, UuidColumn):
+            return ids.strings(indices)
+        return [ids[i] for i in indices.tolist()]
+
+    def get_coordinate(self, index: int, axis: str) -> float | int:
+        value = float(getattr(self, axis).array[index])
+        return restore_int(value, bool(self.coordinate_int_flags.array[index] & AXIS_INT_FLAGS[axis]))
+
+    def set_coordinate(self, index: int, axis: str, value: float):
+        value_is_int = int_flag(value)
+        getattr(self, axis).array[index] = value
+        flags = self.coordinate_int_flags.array
+        if value_is_int:
+            flags[index] |= AXIS_INT_FLAGS[axis]
+        else:
+            flags[index] &= ~AXIS_INT_FLAGS[axis] & 0xFF
+        self.version += 1
+
+    def coordinate_arrays(self, indices: np.ndarray | slice = slice(None)) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns copies of the x, y and z coordinates and the integer flags of the measurements at
+        `indices`.
+        """
+        return tuple(column.array[indices].copy()
+                     for column in (self.x, self.y, self.z, self.coordinate_int_flags))
+
+    def set_coordinate_arrays(
+        self,
+        indices: np.ndarray | slice,
+        x: np.ndarray,
+        y: np.ndarray,
+        z: np.ndarray,
+        int_flags: np.ndarray
+    ):
+        """
+        Overwrites the coordinates and integer flags of the measurements at `indices` at once.
+        """
+        for column, values in zip((self.x, self.y, self.z, self.coordinate_int_flags), (x, y, z, int_flags)):
+            column.array[indices] = values
+        self.version += 1
+
+    def select(
+        self,
+        note: Optional[str] = None,
+        ids: Optional[Iterable[str]] = None,
+        predicate: Optional[Callable[[Optional[str], Optional[str]], bool]] = None
+    ) -> np.ndarray:
+        """
+        Returns the sorted indices of the measurements whose note matches the regular expression
+        `note`, whose id is one of `ids` and for which `predicate(id, note)` is true (every
+        criterion that is given must hold).
+        """
+        mask = np.ones(len(self), dtype=np.bool_)
+        if note is not None:
+            pattern = re.compile(note)
+            matches: Dict[Optional[str], bool] = {}  # notes repeat, so each is matched once
+
+            def matches_note(n: Optional[str]) -> bool:
+                if n not in matches:
+                    matches[n] = n is not None and pattern.search(n) is not None
+                return matches[n]
+            mask &= np.fromiter((matches_note(n) for n in self.notes), dtype=np.bool_, count=len(self))
+        if ids is not None:
+            if isinstance(self.ids, UuidColumn):
+                mask &= self.ids.mask(ids)
+            else:
+                wanted = set(ids)
+                mask &= np.fromiter((id in wanted for id in self.ids), dtype=np.bool_, count=len(self))
+        if predicate is not None:
+            candidates = np.flatnonzero(mask)
+            notes = [self.notes[i] for i in candidates.tolist()]
+            mask[candidates] = [predicate(id, n) for id, n in zip(self.id_list(candidates), notes)]
+        return np.flatnonzero(mask)
+
+    def set_note(self, index: int, note: Optional[str]):
+        self.notes[index] = note
+        self.version += 1
+
+    def set_id(self, index: int, id: str):
+        self.ids[index] = id
+        self.version += 1
+
+
+def save_columns_of_stores(directory: str, stores: Iterable[MeasurementStore]) -> dict:
+    """
+    Writes the measurements of all `stores` one after another to `directory`, like
+    `MeasurementStore.save_columns` would for one store holding all of them, but with only one
+    store in memory at a time (e.g., when `stores` is a generator). Returns the header.
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = [*FILE_COLUMNS] + [name + suffix for name in ("ids", "notes")
+                               for suffix in ("", ".offsets", ".is_null")]
+    paths = dict((name, os.path.join(directory, name + ".bin")) for name in names)
+    files = dict((name, open(path + ".tmp", "wb")) for name, path in paths.items())
+    combined = MeasurementStore()  # interns the keys and types of all stores
+    count, entry_count = 0, 0
+    string_sizes = {"ids": 0, "notes": 0}
+    try:
+        for name in string_sizes:
+            np.zeros(1, dtype="<i8").tofile(files[name + ".offsets"])
+        for store in stores:
+            key_map = np.array([combined.intern_key(key) for key in store.keys], dtype=np.int64)
+            type_map = np.array([combined.intern_type(name) for name in store.type_names], dtype=np.int64)
+            columns = {
+                "entry_measurement": store.entry_measurement.array + count,
+                "entry_key": key_map[store.entry_key.array] if len(key_map) > 0 else store.entry_key.array,
+                "entry_type": type_map[store.entry_type.array] if len(type_map) > 0 else store.entry_type.array,
+            }
+            for name, dtype in FILE_COLUMNS.items():
+                np.ascontiguousarray(columns.get(name, getattr(store, name).array),
+                                     dtype=dtype).tofile(files[name])
+            for name in string_sizes:
+                strings = getattr(store, name)
+                packed = strings if isinstance(strings, PackedStrings) and strings._list is None \
+                    else PackedStrings.pack(strings)
+                np.ascontiguousarray(packed.blob, dtype="|u1").tofile(files[name])
+                np.ascontiguousarray(packed.offsets[1:] + string_sizes[name],
+                                     dtype="<i8").tofile(files[name + ".offsets"])
+                is_null = packed.is_null if packed.is_null is not None \
+                    else np.zeros(len(packed), dtype=np.bool_)
+                np.ascontiguousarray(is_null, dtype="|b1").tofile(files[name + ".is_null"])
+                string_sizes[name] += int(packed.offsets[-1])
+            count += len(store)
+            entry_count += store.entry_count
+    finally:
+        for file in files.values():
+            file.close()
+    # replacing instead of overwriting keeps files that are currently memory-mapped intact
+    for name, path in paths.items():
+        os.replace(path + ".tmp", path)
+    return {
+        "count": count,
+        "entry_count": entry_count,
+        "keys": combined.keys,
+        "type_names": combined.type_names,
+    }
+
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+import numpy as np
+from lib.store import MeasurementStore, save_columns_of_stores
+
+store = MeasurementStore()
+store.append("a", 0, 1.5, 2, [("k1", "t", 10), ("k2", "t", -3.5)], None)
+store.append("b", 1, 2, 3, [], "no values")
+store.append("c", 3.25, 2, 1, [("k2", "t", 7.0)], None)
+
+assert len(store) == 3
+assert store.entry_count == 3
+assert store.keys == ["k1", "k2"]
+assert store.values(0) == [("k1", "t", 10), ("k2", "t", -3.5)]
+assert store.values(1) == []
+assert store.get_coordinate(0, "x") == 0 and isinstance(store.get_coordinate(0, "x"), int)
+
+version = store.version
+store.set_coordinate(2, "x", 4)
+assert store.get_coordinate(2, "x") == 4 and isinstance(store.get_coordinate(2, "x"), int)
+assert store.version == version + 1
+
+print(store.x.array, store.y.array, store.z.array)
+print(store.entry_measurement.array, store.entry_key.array, store.entry_value.array)
+
+# columnar files
+import tempfile
+directory = tempfile.mkdtemp()
+header = store.save_columns(directory)
+loaded = MeasurementStore.load_columns(directory, header)
+assert [loaded.values(i) for i in range(3)] == [store.values(i) for i in range(3)]
+assert list(loaded.ids) == ["a", "b", "c"] and list(loaded.notes) == [None, "no values", None]
+loaded.append("d", 0, 0, 0, [("k3", "t", 1.0)], None)
+assert len(loaded) == 4 and loaded.keys == ["k1", "k2", "k3"]
+print(header)
+
+# bulk appends
+dense = MeasurementStore()
+dense.extend_dense(["d0", "d1"], [0.5, 1.5], [0, 1], [2, 3], ["k1", "k3"], ["t", "t"],
+                   np.array([[1, 2], [3, 4]]))
+assert dense.values(1) == [("k1", "t", 3), ("k3", "t", 4)]
+assert dense.get_coordinate(1, "y") == 1 and isinstance(dense.get_coordinate(1, "y"), int)
+combined = MeasurementStore()
+combined.extend_store(store)
+combined.extend_store(dense)
+assert len(combined) == 5 and combined.keys == ["k1", "k2", "k3"]
+assert combined.values(4) == dense.values(1) and combined.values(0) == store.values(0)
+subset = MeasurementStore()
+subset.extend_store(combined, np.array([1, 4]), (1, 0.5, 0))
+assert list(subset.ids) == ["b", "d1"] and subset.values(1) == dense.values(1) and subset.values(0) == []
+assert subset.get_coordinate(1, "x") == 2.5 and subset.get_coordinate(0, "x") == 2
+assert isinstance(subset.get_coordinate(0, "x"), int) and not isinstance(subset.get_coordinate(0, "y"), int)
+
+# stores written one after another read back as one
+header = save_columns_of_stores(directory, [store, dense])
+loaded = MeasurementStore.load_columns(directory, header)
+assert [loaded.values(i) for i in range(5)] == [combined.values(i) for i in range(5)]
+assert list(loaded.ids) == ["a", "b", "c", "d0", "d1"]
+print(header)
+
+# binary ids
+from lib.store import UuidColumn
+ids = UuidColumn()
+canonical = "0b5d6c1e-8c2f-4c8e-9f3a-2d1e4b6a7c90"
+ids.extend([canonical, canonical.upper(), "not a uuid", None])
+assert list(ids) == [canonical, canonical.upper(), "not a uuid", None]
+assert ids[-4] == canonical and list(ids.others) == [1, 2, 3]
+ids[2] = canonical
+ids[0] = "a"
+assert list(ids) == ["a", canonical.upper(), canonical, None] and sorted(ids.others) == [0, 1, 3]
+copied = UuidColumn()
+copied.extend_from(ids, np.array([1, 2]))
+assert list(copied) == [canonical.upper(), canonical]
+
+# values that float64 cannot hold exactly and anything but numbers are rejected, and leave the
+# store unchanged
+exact = MeasurementStore()
+exact.append("big", 0, np.float32(0.5), np.int16(3), [("k", "t", 2 ** 53), ("l", "t", -2 ** 53)], None)
+assert exact.values(0) == [("k", "t", 2 ** 53), ("l", "t", -2 ** 53)]
+assert exact.get_coordinate(0, "y") == 0.5 and exact.get_coordinate(0, "z") == 3
+for values, x in (([("k", "t", 1), ("l", "t", True)], 0), ([("k", "t", 2 ** 53 + 1)], 0), ([], np.bool_(False)),
+                  ([("k", "t", 1.5)], -2 ** 60), ([("k", "t", 1), ("l", "t", None)], 0),
+                  ([("k", "t", "5")], 0), ([], "1"), ([], None)):
+    try:
+        exact.append("bad", x, 0, 0, values, None)
+        assert False
+    except Exception as e:
+        print(e)
+assert len(exact) == 1 and exact.entry_count == 2
+for values in (np.ones((1, 1), dtype=np.bool_), np.full((1, 1), 2 ** 62), np.array([["5"]]), np.array([[None]])):
+    try:
+        exact.extend_dense(["bad"], np.zeros(1), np.zeros(1), np.zeros(1), ["k"], ["t"], values)
+        assert False
+    except Exception as e:
+        print(e)
+assert len(exact) == 1
+for value in (None, "1", True):
+    try:
+        exact.set_coordinate(0, "x", value)
+        assert False
+    except Exception as e:
+        print(e)
+assert exact.get_coordinate(0, "x") == 0
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+"""
+# Coordinate Transforms
+
+Builds 4 x 4 affine matrices (in homogeneous coordinates) and applies them to the coordinate
+columns of a `MeasurementStore` all at once, e.g., to re-georeference a survey:
+
+```python
+instrument.transform(rotation(90, "z", origin=(10, 10, 0)) @ scaling(0.5))
+instrument.translate(0, 0, 1.5, instrument.select(note="^floor 2"))
+instrument.undo_transform()
+```
+
+`respace_path` moves the measurements of a walked path onto straight lines between anchor
+points whose true coordinates are known (e.g., the corners of a corridor).
+"""
+
+from typing import *
+import math
+import numpy as np
+from lib.store import AXIS_INT_FLAGS
+
+
+Point = Tuple[float, float, float]
+AXES = ("x", "y", "z")
+
+
+def affine(linear: Sequence[Sequence[float]] = np.eye(3), offset: Point = (0, 0, 0)) -> np.ndarray:
+    """
+    Returns the matrix of `p -> linear @ p + offset`.
+    """
+    matrix = np.eye(4)
+    matrix[:3, :3] = linear
+    matrix[:3, 3] = offset
+    return matrix
+
+
+def translation(dx: float = 0, dy: float = 0, dz: float = 0) -> np.ndarray:
+    return affine(offset=(dx, dy, dz))
+
+
+def __about(matrix: np.ndarray, origin: Point) -> np.ndarray:
+    """
+    Returns `matrix` applied about `origin` instead of (0, 0, 0).
+    """
+    return translation(*origin) @ matrix @ translation(*(-c for c in origin))
+
+
+def scaling(factor: float | Point, origin: Point = (0, 0, 0)) -> np.ndarray:
+    """
+    Scales by `factor`, or by (x, y, z) factors, about `origin`.
+    """
+    factors = np.broadcast_to(np.asarray(factor, dtype=np.float64), (3,))
+    return __about(affine(np.diag(factors)), origin)
+
+
+def rotation(degrees: float, axis: str = "z", origin: Point = (0, 0, 0)) -> np.ndarray:
+    """
+    Rotates counterclockwise (looking from the positive end of `axis` towards `origin`) by
+    `degrees` about the line through `origin` parallel to `axis`. Multiples of 90 degrees are
+    exact.
+    """
+    if degrees % 90 == 0:
+        cos, sin = [(1, 0), (0, 1), (-1, 0), (0, -1)][int(degrees // 90) % 4]
+    else:
+        cos, sin = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    a, b = [AXES.index(other) for other in AXES if other != axis] if axis != "y" else (2, 0)
+    linear = np.eye(3)
+    linear[a, a], linear[a, b], linear[b, a], linear[b, b] = cos, -sin, sin, cos
+    return __about(affine(linear), origin)
+
+
+def apply(
+    matrix: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    z: np.ndarray,
+    int_flags: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the transformed coordinates and integer flags (see `lib.store`). A coordinate stays
+    an integer if the row of its axis holds whole numbers only and every axis it depends on was
+    an integer, like it would in Python arithmetic on integers.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape == (3, 4):
+        matrix = np.vstack([matrix, [0, 0, 0, 1]])
+    if matrix.shape != (4, 4):
+        raise Exception(f"ERROR: An affine transform needs a 4 x 4 or 3 x 4 matrix, not {matrix.shape}.")
+    points = np.stack([x, y, z])
+    moved = matrix[:3, :3] @ points + matrix[:3, 3:]
+    flags = np.zeros_like(int_flags)
+    for row, flag in enumerate(AXIS_INT_FLAGS.values()):
+        if not np.all(np.mod(matrix[row], 1) == 0):
+            continue
+        needed = sum(f for column, f in enumerate(AXIS_INT_FLAGS.values()) if matrix[row, column] != 0)
+        flags |= np.where((int_flags & needed) == needed, flag, 0).astype(flags.dtype)
+    return moved[0], moved[1], moved[2], flags
+
+
+def respace_path(
+    x: np.ndarray,
+    y: np.ndarray,
+    z: np.ndarray,
+    anchors: Dict[int, Point],
+    by_distance: bool = True
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns the coordinates of a path of points (in walking order) with every anchor (position in
+    the path -> true coordinates) moved to its true coordinates and the points between two
+    anchors spread along the straight line between them. Points keep their share of the
+    segment's original length if `by_distance` (or are spread evenly if it is `False`, or the
+    segment had no length). Points before the first and after the last anchor are not moved.
+    """
+    positions = np.array(sorted(anchors), dtype=np.int64)
+    if len(positions) < 2:
+        raise Exception("ERROR: Re-spacing a path needs at least two anchors.")
+    if positions[0] < 0 or positions[-1] >= len(x):
+        raise Exception("ERROR: Anchor positions must lie on the path.")
+    targets = np.array([anchors[p] for p in positions.tolist()], dtype=np.float64)
+    points = np.stack([x, y, z], axis=1)
+    inside = np.arange(positions[0], positions[-1] + 1)
+    segment = np.minimum(np.searchsorted(positions, inside, side="right") - 1, len(positions) - 2)
+    start, stop = positions[segment], positions[segment + 1]
+
+    # fraction of the way from the segment's first to its last anchor
+    fraction = (inside - start) / (stop - start)
+    if by_distance:
+        steps = np.linalg.norm(np.diff(points, axis=0), axis=1)
+        walked = np.concatenate([[0.0], np.cumsum(steps)])
+        length = walked[stop] - walked[start]
+        has_length = length > 0
+        fraction[has_length] = (walked[inside] - walked[start])[has_length] / length[has_length]
+
+    moved = points.copy()
+    moved[inside] = targets[segment] + fraction[:, None] * (targets[segment + 1] - targets[segment])
+    return moved[:, 0], moved[:, 1], moved[:, 2]
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+import time
+import numpy as np
+from lib.dataset import Coordinates, Dataset, Instrument, Measurement, Value, ValueType, generate_random_dataset
+from lib.transform import affine, apply, respace_path, rotation, scaling, translation
+
+# matrices
+x, y, z = np.array([1.0, 0.0]), np.array([0.0, 2.0]), np.array([0.0, 0.0])
+flags = np.zeros(2, dtype=np.uint8)
+moved = apply(rotation(90, "z"), x, y, z, flags)
+assert np.array_equal(moved[0], [0, -2]) and np.array_equal(moved[1], [1, 0])
+moved = apply(rotation(90, "x"), x, y, z, flags)
+assert np.array_equal(moved[1], [0, 0]) and np.array_equal(moved[2], [0, 2])
+moved = apply(rotation(45, "z", origin=(1, 0, 0)), x, y, z, flags)
+assert np.allclose(moved[0], [1, 1 - 3 / np.sqrt(2)]) and np.allclose(moved[1], [0, 1 / np.sqrt(2)])
+moved = apply(scaling((2, 3, 1), origin=(1, 1, 0)) @ translation(1, 0, 0), x, y, z, flags)
+assert np.array_equal(moved[0], [3, 1]) and np.array_equal(moved[1], [-2, 4])
+assert np.array_equal(apply(affine()[:3], x, y, z, flags)[0], x)
+
+# integer coordinates stay integers under whole number transforms
+flags = np.array([7, 1], dtype=np.uint8)  # x, y and z are integers / only x is
+assert apply(translation(1, 2, 3), x, y, z, flags)[3].tolist() == [7, 1]
+assert apply(translation(0.5, 0, 0), x, y, z, flags)[3].tolist() == [6, 0]
+assert apply(rotation(90, "z"), x, y, z, flags)[3].tolist() == [7, 2]  # x' = -y, y' = x
+assert apply(rotation(30, "z"), x, y, z, flags)[3].tolist() == [4, 0]
+
+# paths
+xs = np.array([0.0, 1, 2, 4, 5, 6, 7])
+zeros = np.zeros(7)
+px, py, pz = respace_path(xs, zeros, zeros, {1: (0, 0, 0), 3: (0, 6, 0), 5: (3, 6, 0)})
+assert px.tolist() == [0, 0, 0, 0, 1.5, 3, 7]
+assert py.tolist() == [0, 0, 2, 6, 6, 6, 0]
+py = respace_path(xs, zeros, zeros, {1: (0, 0, 0), 3: (0, 6, 0)}, by_distance=False)[1]
+assert py.tolist() == [0, 0, 3, 6, 0, 0, 0]
+
+# instruments
+ds = Dataset("Transforms")
+ins = Instrument("Test Instrument", {}, [ValueType("RSSI", "dBm", -30, -90)], None)
+ds.add_instrument(ins)
+for i in range(4):
+    ins.append_measurement(Measurement(
+        f"00000000-0000-0000-0000-00000000000{i}", Coordinates(i, 0, 1),
+        {"a": Value("RSSI", -50 - i)}, "corridor" if i < 3 else "room"))
+table = ins.measurements_as_table(["a"])
+assert ins.scale(2, indices=ins.select(note="^corridor$")) == 3
+assert [m.coordinates.x for m in ins.measurements] == [0, 2, 4, 3]
+assert isinstance(ins.measurements[1].coordinates.x, int)
+assert [row[1] for row in ins.measurements_as_table(["a"]).rows] == [0, 2, 4, 3]
+assert ins.spatial_index.nearest((4, 0, 1))[1].tolist() == [2]
+
+assert ins.rotate(90, "z") == 4
+assert [m.coordinates.y for m in ins.measurements] == [0, 2, 4, 3]
+assert ins.undo_transform() and ins.undo_transform()
+assert ins.measurements_as_table(["a"]).rows == table.rows
+assert not ins.undo_transform()
+
+assert len(ins.select(ids=["00000000-0000-0000-0000-000000000002", "not-an-id"])) == 1
+assert ins.select(predicate=lambda id, note: id.endswith("3") or note == "nothing").tolist() == [3]
+
+ins.respace_path({0: Coordinates(0, 0, 1), 2: (0, 10, 1)}, indices=ins.select(note="corridor"))
+assert [m.coordinates.y for m in ins.measurements] == [0, 5, 10, 0]
+assert not isinstance(ins.measurements[1].coordinates.y, int)
+ins.undo_transform()
+
+# datasets
+assert ds.translate(0, 0, 1.5, note="room") == 1
+assert [m.coordinates.z for m in ins.measurements] == [1, 1, 1, 2.5]
+ds.undo_transform()
+assert ins.measurements_as_table(["a"]).rows == table.rows
+
+# a million measurements
+big = generate_random_dataset(1_000_000, 1, seed=0)
+start = time.perf_counter()
+big.transform(rotation(30, "z", origin=(50, 50, 0)) @ scaling(0.5) @ translation(1, 2, 3))
+print(f"transformed 1M measurements in {(time.perf_counter() - start) * 1000:.1f} ms")
+big.undo_transform()
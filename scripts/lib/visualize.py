@@ -1,10 +1,19 @@
 #!/usr/bin/python3
 from dataclasses import dataclass
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
+from lib import metrics
 from lib.dataset import MergedMeasurementTable, ValueType
+from lib.interpolate import AXES, PLANES, interpolate, table_points
+from lib.lod import voxel_extremes
 from typing import *
 
+# point budgets of the scatter plots; larger tables are reduced with `lib.lod.voxel_extremes`
+DEFAULT_MAX_POINTS_3D = 20000
+DEFAULT_MAX_POINTS_2D = 50000
+
+
 def __get_cmap(value_type: ValueType) -> str:
     # higher is better mode
     if value_type.best_possible_value >= value_type.worst_possible_value:
@@ -14,34 +23,64 @@ def __get_cmap(value_type: ValueType) -> str:
         return "Spectral_r"
 
 
-def __figure_name(dimension_type: str, name: Optional[str], table: MergedMeasurementTable):
+def __figure_name(dimension_type: str, name: Optional[str], table: MergedMeasurementTable, shown_points: Optional[int] = None):
     filter_expressions = ", ".join([("\"" + fe + "\"") for fe in table.filter_expressions])
     return f"{dimension_type} Plot of " \
         + (f"{table.value_type.name} in {table.value_type.unit}"
            + f" filtered by {filter_expressions}"
-           if name is None else f"\"name\"")
+           if name is None else f"\"{name}\"") \
+        + (f" (showing {shown_points} of {len(table.rows)} points)"
+           if shown_points is not None and shown_points < len(table.rows) else "")
 
 
-def show_plot_3d(
+def __level_of_detail(table: MergedMeasurementTable, axes: Sequence[str], max_points: Optional[int]) -> List:
+    """
+    Returns the rows of `table`, reduced to at most `max_points` rows (keeping the lowest and
+    highest values of every region) unless `max_points` is `None`.
+    """
+    if max_points is None or len(table.rows) <= max_points:
+        return table.rows
+    columns = np.array([row[1:] for row in table.rows], dtype=np.float64)
+    points = columns[:, [AXES.index(axis) for axis in axes]]
+    return [table.rows[i] for i in voxel_extremes(points, columns[:, 3], max_points).tolist()]
+
+
+@metrics.timed("visualize.draw_plot_3d")
+def draw_plot_3d(
+    fig: Figure,
     table: MergedMeasurementTable,
     name: str = None,
+    max_points: Optional[int] = DEFAULT_MAX_POINTS_3D
 ):
     """
-    Displays a dataset in 3D space using matplotlib.
-
-    The points will be colored based on the best and worst possible values.
+    Draws a dataset in 3D space onto `fig` (see `show_plot_3d`).
     """
-    _ids, x_vals, y_vals, z_vals, values = zip(*table.rows)
+    rows = __level_of_detail(table, AXES, max_points)
+    _ids, x_vals, y_vals, z_vals, values = zip(*rows)
 
-    # graph
-    fig = plt.figure()
-    fig.suptitle(__figure_name("3D", name, table))
+    fig.suptitle(__figure_name("3D", name, table, len(rows)))
     ax = fig.add_subplot(projection='3d')
     ax.scatter(x_vals, y_vals, z_vals, c=values, cmap=__get_cmap(table.value_type))
     ax.set_aspect("equal")
     ax.set_xlabel("X (m)")
     ax.set_ylabel("Y (m)")
     ax.set_zlabel("Z (m)")
+
+
+def show_plot_3d(
+    table: MergedMeasurementTable,
+    name: str = None,
+    max_points: Optional[int] = DEFAULT_MAX_POINTS_3D
+):
+    """
+    Displays a dataset in 3D space using matplotlib.
+
+    The points will be colored based on the best and worst possible values.
+    Tables with more than `max_points` rows are downsampled for a responsive plot: only the
+    lowest and highest value of every small region is drawn. Set `max_points` to `None` to draw
+    every row.
+    """
+    draw_plot_3d(plt.figure(), table, name, max_points)
     plt.show()
 
 
@@ -55,20 +94,19 @@ class Axis:
 DEFAULT_FLATTENING_AXIS = Axis.Z
 
 
-def show_plot_2d(
+@metrics.timed("visualize.draw_plot_2d")
+def draw_plot_2d(
+    fig: Figure,
     table: MergedMeasurementTable,
     ignore_axis: str = DEFAULT_FLATTENING_AXIS,
-    name: str = None
+    name: str = None,
+    max_points: Optional[int] = DEFAULT_MAX_POINTS_2D
 ):
     """
-    Displays a dataset in 2D space using matplotlib.
-    flattening the x-axis gives a straight-on view;
-    flattening the y-axis gives a left to right view;
-    Flattening the z-axis gives a top down view.
-
-    The points will be colored based on the best and worst possible values.
+    Draws a dataset flattened along `ignore_axis` onto `fig` (see `show_plot_2d`).
     """
-    _ids, x_vals, y_vals, z_vals, values = zip(*table.rows)
+    rows = __level_of_detail(table, PLANES[ignore_axis], max_points)
+    _ids, x_vals, y_vals, z_vals, values = zip(*rows)
     # default: flatten Axis.Z
     xy2d = [x_vals, y_vals]
     if ignore_axis == Axis.X:
@@ -77,17 +115,129 @@ def show_plot_2d(
         xy2d = [x_vals, z_vals]
 
     # graph
-    scatter = plt.scatter(*xy2d, c=values, cmap=__get_cmap(table.value_type))
-    plt.grid(True)
+    ax = fig.add_subplot()
+    scatter = ax.scatter(*xy2d, c=values, cmap=__get_cmap(table.value_type))
+    ax.grid(True)
+    ax.axis('equal')
+
+    fig.colorbar(
+        scatter,
+        orientation='vertical',
+        label=f"{table.value_type.name} in {table.value_type.unit}",
+        ticks=__colorbar_ticks(table.value_type)
+    )
+    fig.suptitle(__figure_name(
+        f"2D ({ignore_axis} flattened)", name, table, len(rows)))
+    horizontal, vertical = PLANES[ignore_axis]
+    ax.set_xlabel(f"{horizontal.upper()} (m)")
+    ax.set_ylabel(f"{vertical.upper()} (m)")
+
+
+def show_plot_2d(
+    table: MergedMeasurementTable,
+    ignore_axis: str = DEFAULT_FLATTENING_AXIS,
+    name: str = None,
+    max_points: Optional[int] = DEFAULT_MAX_POINTS_2D
+):
+    """
+    Displays a dataset in 2D space using matplotlib.
+    flattening the x-axis gives a straight-on view;
+    flattening the y-axis gives a left to right view;
+    Flattening the z-axis gives a top down view.
+
+    The points will be colored based on the best and worst possible values.
+    Tables with more than `max_points` rows are downsampled like in `show_plot_3d`
+    (within the flattened plane).
+    """
+    draw_plot_2d(plt.figure(), table, ignore_axis, name, max_points)
+    plt.show()
+
+
+def __colorbar_ticks(value_type: ValueType):
+    return np.linspace(value_type.best_possible_value, value_type.worst_possible_value, 20)
+
+
+def __value_limits(value_type: ValueType) -> Tuple[float, float]:
+    return (min(value_type.best_possible_value, value_type.worst_possible_value),
+            max(value_type.best_possible_value, value_type.worst_possible_value))
+
+
+def show_heatmap_2d(
+    table: MergedMeasurementTable,
+    ignore_axis: str = DEFAULT_FLATTENING_AXIS,
+    name: str = None,
+    method: str = "idw",
+    resolution: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    show_points: bool = True,
+    **method_options
+):
+    """
+    Displays a continuous heat map of a dataset, interpolated onto a regular 2D grid
+    (see `lib.interpolate` for the available methods and their options).
+
+    The cells will be colored based on the best and worst possible values.
+    """
+    grid = interpolate(table, method, ignore_axis, resolution,
+                       max_distance, **method_options)
+    vmin, vmax = __value_limits(table.value_type)
+
+    image = plt.imshow(
+        grid.values.T,
+        origin="lower",
+        extent=[*grid.extent(0), *grid.extent(1)],
+        cmap=__get_cmap(table.value_type),
+        vmin=vmin,
+        vmax=vmax,
+        interpolation="nearest"
+    )
+    if show_points:
+        points, _values = table_points(table, grid.axes)
+        plt.scatter(points[:, 0], points[:, 1], s=2, c="black")
     plt.axis('equal')
 
     plt.colorbar(
-        scatter,
+        image,
         orientation='vertical',
         label=f"{table.value_type.name} in {table.value_type.unit}",
-        ticks=np.linspace(table.value_type.best_possible_value, table.value_type.worst_possible_value, 20)
+        ticks=__colorbar_ticks(table.value_type)
     )
-    plt.suptitle(__figure_name(f"2D ({ignore_axis} flattened)", name, table))
-    plt.xlabel("X (m)")
-    plt.ylabel("Y (m)")
+    plt.suptitle(__figure_name(
+        f"2D Heat Map ({ignore_axis} flattened, {method})", name, table))
+    plt.xlabel(f"{grid.axes[0].upper()} (m)")
+    plt.ylabel(f"{grid.axes[1].upper()} (m)")
+    plt.show()
+
+
+def show_heatmap_3d(
+    table: MergedMeasurementTable,
+    name: str = None,
+    method: str = "idw",
+    resolution: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    alpha: float = 0.2,
+    **method_options
+):
+    """
+    Displays a continuous heat map of a dataset, interpolated onto a regular 3D grid, by drawing
+    every grid cell as a translucent point.
+
+    The cells will be colored based on the best and worst possible values.
+    """
+    grid = interpolate(table, method, None, resolution,
+                       max_distance, **method_options)
+    points = grid.points()
+    values = grid.values.ravel()
+    known = ~np.isnan(values)
+    vmin, vmax = __value_limits(table.value_type)
+
+    fig = plt.figure()
+    fig.suptitle(__figure_name(f"3D Heat Map ({method})", name, table))
+    ax = fig.add_subplot(projection='3d')
+    ax.scatter(points[known, 0], points[known, 1], points[known, 2], c=values[known],
+               cmap=__get_cmap(table.value_type), vmin=vmin, vmax=vmax, alpha=alpha, marker="s")
+    ax.set_aspect("equal")
+    ax.set_xlabel("X (m)")
+    ax.set_ylabel("Y (m)")
+    ax.set_zlabel("Z (m)")
     plt.show()
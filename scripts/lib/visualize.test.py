@@ -1,5 +1,5 @@
 #!/usr/bin/python3
-from lib.visualize import show_plot_3d, show_plot_2d, Axis
+from lib.visualize import show_plot_3d, show_plot_2d, show_heatmap_2d, show_heatmap_3d, Axis
 from lib.dataset import generate_random_dataset, MergeFunction, ValueType
 
 ds1 = generate_random_dataset(500, 1)
@@ -11,6 +11,9 @@ table = ins1.measurements_as_table()
 show_plot_2d(table, Axis.Z)
 show_plot_2d(table, Axis.X)
 show_plot_2d(table, Axis.Y)
+show_heatmap_2d(table, Axis.Z)
+show_heatmap_2d(table, Axis.Z, method="rbf")
+show_heatmap_3d(table, method="nearest", resolution=10)
 
 # The value function is based on Coulomb's law.
 ds2 = generate_random_dataset(1000, 3, (lambda d: (
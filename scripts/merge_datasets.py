@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+"""
+Merges the recordings of a survey (e.g., one per floor and session) into one dataset. Append
+`@x,y,z` to a path to offset its coordinates, e.g., by the height of its floor:
+
+```sh
+python3 scripts/merge_datasets.py building.json ground-floor.json first-floor.json@0,0,3.5
+```
+"""
+import argparse
+from typing import *
+from lib.dataset import Coordinates, Dataset
+
+parser = argparse.ArgumentParser(description="Merges many datasets into one.")
+parser.add_argument("destination", help="path of the merged dataset (JSON or .columns)")
+parser.add_argument("sources", nargs="+", metavar="source[@x,y,z]")
+parser.add_argument("--name", help="name of the merged dataset (default: that of the first source)")
+parser.add_argument("--workers", type=int, default=None,
+                    help="number of worker processes (default: one per CPU core, 0 loads in this process)")
+args = parser.parse_args()
+
+
+def number(text: str) -> int | float:
+    # integer offsets keep integer coordinates integers
+    return int(text) if text.strip().lstrip("-").isdigit() else float(text)
+
+
+def split_source(source: str) -> Tuple[str, Optional[Coordinates]]:
+    """
+    Splits `source` into a path and an offset, if the part after its last `@` is one. Paths
+    that merely contain an `@` (e.g., `scans@office.json`) are kept as they are.
+    """
+    path, at, offset = source.rpartition("@")
+    if at == "":
+        return source, None
+    try:
+        x, y, z = (number(c) for c in offset.split(","))
+    except ValueError:
+        return source, None
+    return path, Coordinates(x, y, z)
+
+
+paths, offsets = [], []
+for source in args.sources:
+    path, offset = split_source(source)
+    paths.append(path)
+    offsets.append(offset)
+
+merged = Dataset.load_many(paths, offsets=offsets, workers=args.workers, name=args.name)
+merged.save(args.destination)
+for name, instrument in merged.instruments.items():
+    print(f"{name}: {len(instrument.measurements)} measurements")
+print(f"Merged {len(paths)} datasets into {args.destination}.")
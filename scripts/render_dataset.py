@@ -0,0 +1,17 @@
+#!/usr/bin/python3
+"""
+Renders plots of a dataset to image files without opening any windows, e.g., one top down and one
+side view per access point:
+
+```sh
+python3 scripts/render_dataset.py recording.json report --by MAC --projections z y
+```
+
+Use `--filter` (repeatable) to render the table of a single filter expression instead, and
+`--format svg` for vector graphics. Same as `heatmapper.py render`.
+"""
+import sys
+import heatmapper
+
+if __name__ == "__main__":
+    heatmapper.main(["render", *sys.argv[1:]])
@@ -1,14 +1,29 @@
 #!/usr/bin/python3
+import os
+import sys
 from lib.dataset import Dataset, Coordinates
 from lib.instruments.wifi import WifiInstrument, NoScanDataException
+from lib.journal import journal_path
+
+NAME = "Simple WiFi Recording"
 
 
 if __name__ == "__main__":
     INS = WifiInstrument("wlan0")
-    DS = Dataset("Simple WiFi Recording").add_instrument(INS)
+    path = Dataset.make_safe_file_name(NAME) + ".json"
+    if os.path.exists(path) or os.path.exists(journal_path(path)):
+        # continue the recording, including what a crashed session left in the journal
+        DS = Dataset.load(path).replace_instrument(INS)
+    else:
+        DS = Dataset(NAME).add_instrument(INS)
+    # every measurement is appended to a journal right away; on exit the journal is compacted
+    DS.enable_journal(path)
     DS.enable_save_on_terminate()
+    # `--background`: scan continuously, so measurements use the freshest scan without waiting
+    if "--background" in sys.argv[1:]:
+        INS.start_background_scanning()
 
-    i = 0
+    i = len(INS.measurements)
     while True:
         note = input(
             "Waiting for <enter> to take next measurement. Enter a note for the next measurement here: ")